@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Decode throughput for Hardcover documents.
+
+Compares the per-object path used before (json.loads + BookDoc(**doc) for
+every file) with the batch TypeAdapter path in flows.models, with and
+without the slim projection.
+
+Run with:
+    python benchmarks/bench_bookdoc.py --docs 20000
+"""
+
+import argparse
+import json
+import time
+
+from flows.models import BookDoc, decode_books
+
+
+def synthetic_doc(i: int) -> dict:
+    return {
+        "id": i,
+        "title": f"Title {i}",
+        "isbns": [f"978{i:010d}", f"{i:010d}"],
+        "rating": 3.9,
+        "ratings_count": i % 5000,
+        "publication_date": "2021-03-04",
+        "description": "blurb " * 80,
+        "contributions": [{"author": {"name": f"Author {i}"}}],
+        "image": {"url": f"https://example.invalid/{i}.jpg", "width": 300},
+        "tags": ["fantasy", "romance", "dragons"],
+    }
+
+
+def timed(label: str, fn, n: int) -> None:
+    t0 = time.perf_counter()
+    books = fn()
+    elapsed = time.perf_counter() - t0
+    size = sum(len(b.model_dump_json()) for b in books)
+    print(f"{label:<24}{n / elapsed:>12,.0f} docs/s   {size / n:>8,.0f} bytes/doc out")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=20_000)
+    args = ap.parse_args()
+
+    blobs = [json.dumps(synthetic_doc(i)).encode() for i in range(args.docs)]
+    array = b"[" + b",".join(blobs) + b"]"
+
+    timed(
+        "per-object BookDoc",
+        lambda: [BookDoc(**json.loads(b)) for b in blobs],
+        args.docs,
+    )
+    timed("batch full", lambda: decode_books(array, slim=False), args.docs)
+    timed("batch slim", lambda: decode_books(array, slim=True), args.docs)
+
+
+if __name__ == "__main__":
+    main()
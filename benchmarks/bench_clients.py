@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Client throughput against the local API stand in.
+
+Starts gle.standin on a free port with the given latency, error rate and
+rate limit, points the Hardcover client at it and looks up synthetic
+isbns from a thread pool. Reports lookups per second and how many were
+answered with 429 or 500. --client-rate turns on the shared client side
+limiter (gle.ratelimit) with that quota, which should bring the 429s to
+zero. Needs no network access.
+
+Run with:
+    python benchmarks/bench_clients.py --requests 2000 --workers 8 --latency-ms 40
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from flows import hardcover_client
+from gle.standin import StandInConfig, serve
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2_000)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--error-rate", type=float, default=0.01)
+    ap.add_argument("--rate-limit", type=float, help="Stand in requests per second")
+    ap.add_argument("--burst", type=int, default=10)
+    ap.add_argument(
+        "--client-rate", default="off", help='Client quota, e.g. "10/1" (default off)'
+    )
+    args = ap.parse_args()
+
+    config = StandInConfig(
+        cassette_dir=Path(tempfile.mkdtemp()),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        seed=0,
+    )
+    server = serve(config, port=0)
+    os.environ[hardcover_client.URL_ENV] = f"{server.url}/v1/graphql"
+    os.environ.setdefault("HARDCOVER_AUTH_TOKEN", "bench")
+    os.environ["HARDCOVER_RATE_LIMIT"] = args.client_rate
+    os.environ["GLE_RATELIMIT_DB"] = str(config.cassette_dir / "ratelimit.sqlite")
+
+    def lookup(i: int) -> str:
+        try:
+            hardcover_client.fetch_document(f"978{i:010d}")
+            return "ok"
+        except requests.HTTPError as exc:
+            return str(exc.response.status_code)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as pool:
+        outcomes = Counter(pool.map(lookup, range(args.requests)))
+    elapsed = time.perf_counter() - t0
+    server.shutdown()
+
+    print(f"{args.requests / elapsed:>10,.0f} lookups/s with {args.workers} workers")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"{outcome:>10}  {count:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Title and surname normalization throughput.
+
+Compares the per-row Python functions the matcher used before (a regex
+per title and split()[-1] per author, applied through pandas .map) with
+the column at a time DuckDB macros in gle.normalize.
+
+Run with:
+    python benchmarks/bench_normalize.py --rows 500000
+"""
+
+import argparse
+import random
+import re
+import time
+
+import duckdb
+import pandas as pd
+
+from gle.normalize import surname_keys, title_keys
+
+_rx_title = re.compile(r"^\s*(?P<body>.*?)(?:\s*[:(].*)?$")
+
+
+def clean_title(title):
+    if not title:
+        return ""
+    match = _rx_title.match(title)
+    return match.group("body").strip().lower() if match else ""
+
+
+def surname(full):
+    value = full or ""
+    return value.split()[-1].lower() if value.split() else ""
+
+
+TITLES = [
+    "The Hunger Games (The Hunger Games, #1)",
+    "Les Misérables: A Novel",
+    "Dune Messiah, Book 2",
+    "Pride & Prejudice",
+    "A Game of Thrones (A Song of Ice and Fire, #1)",
+]
+AUTHORS = [
+    "J.R.R. Tolkien",
+    "Martin Luther King, Jr.",
+    "John le Carré",
+    "Stephen King and Owen King",
+    "J.K. Rowling/Mary GrandPré",
+]
+
+
+def timed(label: str, fn, n: int) -> None:
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<28}{n / elapsed:>14,.0f} rows/s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--threads", type=int, help="DuckDB threads (default all)")
+    args = ap.parse_args()
+
+    con = duckdb.connect()
+    if args.threads:
+        con.execute(f"set threads = {args.threads}")
+    threads = con.execute("select current_setting('threads')").fetchone()[0]
+    print(f"DuckDB threads: {threads}")
+
+    rng = random.Random(0)
+    titles = pd.Series([rng.choice(TITLES) for _ in range(args.rows)])
+    authors = pd.Series([rng.choice(AUTHORS) for _ in range(args.rows)])
+
+    timed("per-row clean_title", lambda: titles.map(clean_title), args.rows)
+    timed("column title_keys", lambda: title_keys(titles, con), args.rows)
+    timed("per-row surname", lambda: authors.map(surname), args.rows)
+    timed("column surname_keys", lambda: surname_keys(authors, con), args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Throughput and latency benchmark for gle.scoring.
+
+Builds a synthetic feature matrix with --rows isbns, then reports
+
+• batch throughput in rows per second for the baseline model
+• single isbn latency percentiles through the shared lookup path
+
+Run with:
+    python benchmarks/bench_scoring.py --rows 2000000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from gle.scoring import (
+    BASELINE_MODEL,
+    FEATURE_COLUMNS,
+    ISBN_DTYPE,
+    META_NAME,
+    FeatureMatrix,
+    score_isbn,
+    score_matrix,
+)
+
+
+def write_synthetic_matrix(out_dir: Path, rows: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    isbns = np.char.add(b"978", np.char.zfill(np.arange(rows).astype("S10"), 10))
+    np.save(out_dir / "isbn13.npy", isbns.astype(ISBN_DTYPE))
+    for name in FEATURE_COLUMNS:
+        values = rng.random(rows, dtype=np.float32) * 20
+        values[rng.random(rows) < 0.9] = np.nan  # most isbns never charted
+        np.save(out_dir / f"{name}.npy", values)
+    meta = {"rows": rows, "columns": list(FEATURE_COLUMNS), "as_of": None}
+    (out_dir / META_NAME).write_text(json.dumps(meta), encoding="utf-8")
+    return isbns
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--batch-size", type=int, default=65_536)
+    ap.add_argument("--lookups", type=int, default=10_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix_dir = Path(tmp) / "matrix"
+        isbns = write_synthetic_matrix(matrix_dir, args.rows)
+        matrix = FeatureMatrix(matrix_dir)
+
+        t0 = time.perf_counter()
+        score_matrix(matrix, BASELINE_MODEL, args.batch_size)
+        elapsed = time.perf_counter() - t0
+        print(f"batch   {args.rows:,} rows in {elapsed:.2f}s")
+        print(f"        {args.rows / elapsed:,.0f} rows/s")
+
+        rng = np.random.default_rng(1)
+        picks = isbns[rng.integers(0, args.rows, args.lookups)]
+        timings = np.empty(args.lookups)
+        for i, isbn in enumerate(picks):
+            t0 = time.perf_counter()
+            score_isbn(matrix, BASELINE_MODEL, isbn.decode())
+            timings[i] = time.perf_counter() - t0
+        p50, p99 = np.percentile(timings, [50, 99]) * 1e6
+        print(f"single  p50 {p50:.1f}µs  p99 {p99:.1f}µs  over {args.lookups:,} isbns")
+
+
+if __name__ == "__main__":
+    main()
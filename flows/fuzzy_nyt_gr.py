@@ -2,18 +2,27 @@
 """
 NYT ⇄ Goodreads fuzzy matcher (two-stage)
 
+Stage 0  exact join through the isbn_work edition index (if built)
+Keys     bulk SQL cascade on normalized keys, each tier only sees leftovers
+         exact (title, surname) → unique title → unique (title, surname) prefix
 Stage 1  author-surname(+prefix) filter + RapidFuzz token-sort
 Stage 2  title-only fallback           + RapidFuzz WRatio
 
+Titles and surnames are compared as gle.normalize keys (diacritics, leading
+articles, series suffixes and "Jr." / initials folded away).
+
 Extras
 ──────
 --use-series   search goodreads.series as well
 --show-misses  list NYT titles with zero GR candidates
+--changed-only only ISBNs that entered a list or were newly seen since the
+               last run (NYT change feed, consumer "fuzzy")
+--resume       continue an interrupted run from its checkpoint journal
+               (data/interim/checkpoints/fuzzy.jsonl) instead of rescoring
 """
 # ── std-lib ──────────────────────────────────────────────────────
 import argparse
 import pathlib
-import re
 import time
 from typing import Dict, List
 
@@ -22,175 +31,375 @@ import duckdb
 import pandas as pd
 from rapidfuzz import fuzz, process
 
-# ── CLI ---------------------------------------------------------
-cli = argparse.ArgumentParser()
-cli.add_argument("--threshold", type=int, default=85)
-cli.add_argument("--max-cands", type=int, default=2_000)
-cli.add_argument("--title-threshold", type=int, default=94)
-cli.add_argument("--use-series", action="store_true")
-cli.add_argument("--show-misses", action="store_true")
-args = cli.parse_args()
-
-
-# ── helpers -----------------------------------------------------
-def surname(full: str | None) -> str:
-    value = full or ""
-    return value.split()[-1].lower()
-
-
-_rx_title = re.compile(
-    r"^\s*(?P<body>.*?)(?:\s*[:(].*)?$",
-    re.VERBOSE,
+from gle.checkpoint import Journal
+from gle.normalize import install_macros
+from gle.nyt_changes import (
+    advance_watermark,
+    latest_seq,
+    pending_changes,
+    pending_isbns,
 )
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+from gle.work_index import WORK_MATCH_SQL, has_work_table
 
+DB = pathlib.Path("data/green_light.duckdb")
+CONSUMER = "fuzzy"
 
-def clean_title(title: str | None) -> str:
-    if not title:
-        return ""
+CASCADE_TIERS = ("exact", "title_key", "prefix")
+PREFIX_CHARS = 12  # title key chars in the prefix tier (surname uses 5)
 
-    match = _rx_title.match(title)
-    if not match:
-        return ""
+# One statement for the whole cascade. Goodreads keys are computed once;
+# ambiguous title / prefix keys (more than one rated row) fall through.
+CASCADE_SQL = """
+WITH gr AS MATERIALIZED (
+    SELECT book_id, average_rating, ratings_count,
+           {title_key}  AS t_key,
+           {author_key} AS s_key
+    FROM   goodreads
+    WHERE  average_rating IS NOT NULL
+),
+nyt AS (
+    SELECT DISTINCT isbn13, t_key, s_key
+    FROM   {source}
+    WHERE  t_key <> ''
+),
+exact AS (
+    SELECT n.isbn13, g.book_id, g.average_rating, g.ratings_count,
+           'exact' AS stage
+    FROM   nyt n
+    JOIN   gr  g USING (t_key, s_key)
+    WHERE  n.s_key <> ''
+    QUALIFY row_number() OVER (
+              PARTITION BY n.isbn13
+              ORDER BY g.ratings_count DESC NULLS LAST,
+                       g.average_rating DESC NULLS LAST,
+                       g.book_id
+            ) = 1
+),
+title_only AS (
+    SELECT n.isbn13, g.book_id, g.average_rating, g.ratings_count,
+           'title_key' AS stage
+    FROM   nyt n
+    JOIN  (SELECT t_key,
+                  first(book_id)        AS book_id,
+                  first(average_rating) AS average_rating,
+                  first(ratings_count)  AS ratings_count
+           FROM   gr
+           GROUP  BY t_key
+           HAVING count(*) = 1) g USING (t_key)
+    WHERE  n.isbn13 NOT IN (SELECT isbn13 FROM exact)
+    QUALIFY row_number() OVER (PARTITION BY n.isbn13 ORDER BY g.book_id) = 1
+),
+prefix AS (
+    SELECT n.isbn13, g.book_id, g.average_rating, g.ratings_count,
+           'prefix' AS stage
+    FROM   nyt n
+    JOIN  (SELECT left(t_key, {prefix}) AS t_pre,
+                  left(s_key, 5)        AS s_pre,
+                  first(book_id)        AS book_id,
+                  first(average_rating) AS average_rating,
+                  first(ratings_count)  AS ratings_count
+           FROM   gr
+           WHERE  s_key <> ''
+           GROUP  BY ALL
+           HAVING count(*) = 1) g
+      ON   g.t_pre = left(n.t_key, {prefix})
+     AND   g.s_pre = left(n.s_key, 5)
+    WHERE  n.s_key <> ''
+      AND  n.isbn13 NOT IN (SELECT isbn13 FROM exact)
+      AND  n.isbn13 NOT IN (SELECT isbn13 FROM title_only)
+    QUALIFY row_number() OVER (PARTITION BY n.isbn13 ORDER BY g.book_id) = 1
+)
+SELECT isbn13         AS nyt_isbn13,
+       book_id,
+       average_rating AS avg_rating,
+       ratings_count,
+       100            AS score,
+       stage
+FROM  (SELECT * FROM exact
+       UNION ALL SELECT * FROM title_only
+       UNION ALL SELECT * FROM prefix)
+"""
 
-    body = match.group("body")
-    return body.strip().lower()
 
+# ── CLI ---------------------------------------------------------
+def build_parser() -> argparse.ArgumentParser:
+    cli = argparse.ArgumentParser(description="NYT ⇄ Goodreads fuzzy matcher")
+    cli.add_argument("--threshold", type=int, default=85)
+    cli.add_argument("--max-cands", type=int, default=2_000)
+    cli.add_argument("--title-threshold", type=int, default=94)
+    cli.add_argument("--use-series", action="store_true")
+    cli.add_argument("--show-misses", action="store_true")
+    cli.add_argument("--changed-only", action="store_true")
+    cli.add_argument("--resume", action="store_true")
+    cli.add_argument("--checkpoint-every", type=int, default=200)
+    return cli
 
-# ── DB ----------------------------------------------------------
-DB = pathlib.Path("data/green_light.duckdb")
-con = duckdb.connect(DB, read_only=False)
 
-nyt = con.sql(
+# ── building blocks (shared with fuzzy_tune.py) ------------------
+def load_unmatched(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    install_macros(con)
+    return con.sql(
+        """
+        SELECT isbn13, title, author,
+               title_key(title)    AS t_key,
+               surname_key(author) AS s_key
+        FROM   green_light.nyt_raw
+        WHERE  isbn13 NOT IN (SELECT isbn13 FROM goodreads)
     """
-    SELECT isbn13, title, author
-    FROM   green_light.nyt_raw
-    WHERE  isbn13 NOT IN (SELECT isbn13 FROM goodreads)
-"""
-).df()
+    ).df()
 
-if nyt.empty:
-    print("✓ Nothing left to match – all NYT ISBNs are in goodreads.")
-    con.close()
-    exit()
 
-# ── Stage 1 -----------------------------------------------------
-t0 = time.time()
-matches: List[Dict] = []
-no_cand: list[str] = []
+def fetch_candidates(
+    con: duckdb.DuckDBPyConnection,
+    sname: str | None,
+    use_series: bool,
+    max_cands: int,
+) -> pd.DataFrame | None:
+    """Stage-1 pool for one surname key (None = no usable surname).
 
-for _, n in nyt.iterrows():
-    sname = surname(n.author)
+    Most-rated first, so a smaller max_cands keeps a prefix of a larger
+    one and score ties go to the better known edition.
+    Expects the gle.normalize macros on `con` (see load_unmatched).
+    """
     if not sname:
-        continue
+        return None
     s5 = sname[:5]
 
-    cond_sql = ["authors ILIKE '%' || ? || '%'", "authors ILIKE '%' || ? || '%'"]
+    cond_sql = [
+        "gle_fold(authors) LIKE '%' || ? || '%'",
+        "gle_fold(authors) LIKE '%' || ? || '%'",
+    ]
     params = [sname, s5]
 
-    if args.use_series:
+    if use_series:
         cond_sql += [
-            "series ILIKE '%' || ? || '%'",
-            "series ILIKE '%' || ? || '%'",
-            "(authors = '' AND series ILIKE '%' || ? || '%')",
+            "gle_fold(series) LIKE '%' || ? || '%'",
+            "gle_fold(series) LIKE '%' || ? || '%'",
+            "(authors = '' AND gle_fold(series) LIKE '%' || ? || '%')",
         ]
         params += [sname, s5, sname]
 
     where_clause = " OR ".join(cond_sql)
-    params.append(args.max_cands)  # LIMIT
+    params.append(max_cands)  # LIMIT
 
-    cand = con.execute(
+    return con.execute(
         f"""
-        SELECT isbn13, title, average_rating, ratings_count, book_id
+        SELECT isbn13, title, average_rating, ratings_count, book_id,
+               title_key(title) AS c_title
         FROM   goodreads
         WHERE  ({where_clause})
           AND  (average_rating IS NOT NULL OR authors = '')
+        ORDER  BY ratings_count DESC NULLS LAST, book_id, isbn13
         LIMIT  ?
     """,
         params,
     ).df()
 
-    if cand.empty:  # ← fixed
-        no_cand.append(n.title)
-        continue
 
-    cand["c_title"] = cand["title"].map(clean_title)
-    best = process.extractOne(
-        clean_title(n.title), cand["c_title"], scorer=fuzz.token_sort_ratio
-    )
-    if best and best[1] >= args.threshold:
-        g = cand.loc[cand["c_title"] == best[0]].iloc[0]
-        matches.append(
-            dict(
-                nyt_isbn13=n.isbn13,
-                book_id=g.book_id,
-                avg_rating=g.average_rating,
-                ratings_count=g.ratings_count,
-                score=best[1],
-                stage="surname",
-            )
-        )
-
-# ── Stage 2 ------------------------------------------------------
-remaining = nyt[~nyt["isbn13"].isin([m["nyt_isbn13"] for m in matches])]
-if not remaining.empty:
-    gr_all = con.sql(
+def load_title_pool(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """Stage-2 pool: every rated Goodreads title."""
+    install_macros(con)
+    return con.sql(
         """
-        SELECT isbn13, title, average_rating, ratings_count, book_id
+        SELECT isbn13, title, average_rating, ratings_count, book_id,
+               title_key(title) AS c_title
         FROM   goodreads
         WHERE  average_rating IS NOT NULL
     """
     ).df()
-    gr_all["c_title"] = gr_all["title"].map(clean_title)
 
-    for _, n in remaining.iterrows():
-        best = process.extractOne(
-            clean_title(n.title), gr_all["c_title"], scorer=fuzz.WRatio
+
+def best_row(t_key: str, pool: pd.DataFrame, scorer) -> tuple | None:
+    """(goodreads row, score) of the first best-scoring pool title key."""
+    best = process.extractOne(t_key, pool["c_title"], scorer=scorer)
+    if not best:
+        return None
+    return pool.loc[pool["c_title"] == best[0]].iloc[0], best[1]
+
+
+def goodreads_key_exprs(con: duckdb.DuckDBPyConnection) -> Dict[str, str]:
+    """Stored ingest keys when present, else the same macros on the fly."""
+    cols = {
+        r[0]
+        for r in con.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'goodreads'"
+        ).fetchall()
+    }
+    if {"title_key", "author_key"} <= cols:
+        return dict(
+            title_key="coalesce(title_key, '')", author_key="coalesce(author_key, '')"
         )
-        if best and best[1] >= args.title_threshold:
-            g = gr_all.loc[gr_all["c_title"] == best[0]].iloc[0]
-            matches.append(
-                dict(
-                    nyt_isbn13=n.isbn13,
-                    book_id=g.book_id,
-                    avg_rating=g.average_rating,
-                    ratings_count=g.ratings_count,
-                    score=best[1],
-                    stage="title",
-                )
+    return dict(title_key="title_key(title)", author_key="surname_key(authors)")
+
+
+def key_cascade(con: duckdb.DuckDBPyConnection, nyt: pd.DataFrame) -> pd.DataFrame:
+    """Resolve what exact keys can, in bulk – one row per resolved NYT isbn13."""
+    install_macros(con)
+    con.register("nyt_pending", nyt)
+    try:
+        return con.sql(
+            CASCADE_SQL.format(
+                source="nyt_pending", prefix=PREFIX_CHARS, **goodreads_key_exprs(con)
             )
+        ).df()
+    finally:
+        con.unregister("nyt_pending")
 
-# ── summary & upsert -------------------------------------------
-elapsed = time.time() - t0
-stage_ct = (
-    pd.DataFrame(matches)
-    .stage.value_counts()
-    .reindex(["surname", "title"])
-    .fillna(0)
-    .astype(int)
-    .to_dict()
-)
 
-print(
-    f"✓ {len(matches)} matches "
-    f"(surname {stage_ct.get('surname',0)} | title {stage_ct.get('title',0)}) "
-    f"in {elapsed:,.1f}s"
-)
+def match_record(nyt_isbn13: str, g, score: float, stage: str) -> Dict:
+    return dict(
+        nyt_isbn13=nyt_isbn13,
+        book_id=g.book_id,
+        avg_rating=g.average_rating,
+        ratings_count=g.ratings_count,
+        score=score,
+        stage=stage,
+    )
 
-if matches:
-    con.register("m_stage", pd.DataFrame(matches))
-    con.execute(
-        """
-        INSERT INTO goodreads (book_id, isbn13, average_rating, ratings_count)
-        SELECT book_id, nyt_isbn13, avg_rating, ratings_count
-        FROM   m_stage
-        ON CONFLICT DO NOTHING
-    """
+
+# ── main ----------------------------------------------------------
+@profiled
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+
+    # ── DB ------------------------------------------------------
+    con = duckdb.connect(DB, read_only=False)
+
+    nyt = load_unmatched(con)
+
+    if args.changed_only:
+        top = latest_seq(con)
+        delta = pending_isbns(pending_changes(con, CONSUMER, ["entered", "new"]))
+        nyt = nyt[nyt["isbn13"].isin(delta)]
+        print(f"• {len(delta)} changed ISBNs, {nyt['isbn13'].nunique()} unmatched")
+
+    if nyt.empty:
+        if args.changed_only:
+            advance_watermark(con, CONSUMER, top)
+        print("✓ Nothing left to match – all NYT ISBNs are in goodreads.")
+        con.close()
+        return
+
+    # ── checkpoint journal -------------------------------------
+    # every finished ISBN is journaled; --resume skips them and restores
+    # their matches, so an interrupted run never scores anything twice
+    options = {
+        k: getattr(args, k)
+        for k in ("threshold", "title_threshold", "max_cands", "use_series")
+    }
+    options["changed_only"] = args.changed_only
+    journal = Journal(
+        CONSUMER, options, resume=args.resume, batch_size=args.checkpoint_every
     )
-    print("✓ Ratings inserted into goodreads")
+    print(f"• {journal.describe()}")
+
+    t0 = time.time()
+    matches: List[Dict] = journal.items("matches")
+    no_cand: list[str] = journal.items("no_cand")
+
+    if "bulk" not in journal.marks:
+        bulk: List[Dict] = []
+
+        # ── Stage 0 ---------------------------------------------
+        # another edition of the same work is already in goodreads
+        if has_work_table(con):
+            con.register("nyt_unmatched", nyt)
+            work = con.sql(WORK_MATCH_SQL.format(source="nyt_unmatched")).df()
+            con.unregister("nyt_unmatched")
+            bulk += work.to_dict("records")
+
+        # ── exact-key cascade ----------------------------------
+        # only the rows no tier can resolve reach the RapidFuzz scorers
+        rest = nyt[~nyt["isbn13"].isin([m["nyt_isbn13"] for m in bulk])]
+        if not rest.empty:
+            bulk += key_cascade(con, rest).to_dict("records")
+
+        journal.mark("bulk", matches=bulk)
+
+    nyt = nyt[~nyt["isbn13"].isin([m["nyt_isbn13"] for m in matches])]
+
+    # ── Stage 1 -------------------------------------------------
+    for _, n in nyt.iterrows():
+        key = f"surname:{n.isbn13}"
+        if key in journal:
+            continue
+        cand = fetch_candidates(con, n.s_key, args.use_series, args.max_cands)
+        if cand is None:
+            journal.record(key)
+            continue
+
+        if cand.empty:  # ← fixed
+            journal.record(key, no_cand=[n.title])
+            continue
+
+        best = best_row(n.t_key, cand, fuzz.token_sort_ratio)
+        found = []
+        if best and best[1] >= args.threshold:
+            found.append(match_record(n.isbn13, *best, stage="surname"))
+        journal.record(key, matches=found)
+
+    # ── Stage 2 --------------------------------------------------
+    remaining = nyt[~nyt["isbn13"].isin([m["nyt_isbn13"] for m in matches])]
+    remaining = remaining[[f"title:{i}" not in journal for i in remaining.isbn13]]
+    if not remaining.empty:
+        gr_all = load_title_pool(con)
+
+        for _, n in remaining.iterrows():
+            best = best_row(n.t_key, gr_all, fuzz.WRatio)
+            found = []
+            if best and best[1] >= args.title_threshold:
+                found.append(match_record(n.isbn13, *best, stage="title"))
+            journal.record(f"title:{n.isbn13}", matches=found)
+    journal.flush()
+
+    # ── summary & upsert ---------------------------------------
+    elapsed = time.time() - t0
+    stage_ct = (
+        pd.DataFrame(matches, columns=["stage"])
+        .stage.value_counts()
+        .reindex(["work", *CASCADE_TIERS, "surname", "title"])
+        .fillna(0)
+        .astype(int)
+        .to_dict()
+    )
+
+    print(
+        f"✓ {len(matches)} matches "
+        f"(work {stage_ct.get('work',0)} | "
+        f"exact {stage_ct.get('exact',0)} | "
+        f"title key {stage_ct.get('title_key',0)} | "
+        f"prefix {stage_ct.get('prefix',0)} | "
+        f"surname {stage_ct.get('surname',0)} | title {stage_ct.get('title',0)}) "
+        f"in {elapsed:,.1f}s"
+    )
+
+    if matches:
+        con.register("m_stage", pd.DataFrame(matches))
+        con.execute(
+            """
+            INSERT INTO goodreads (book_id, isbn13, average_rating, ratings_count)
+            SELECT book_id, nyt_isbn13, avg_rating, ratings_count
+            FROM   m_stage
+            ON CONFLICT DO NOTHING
+        """
+        )
+        bump_table_versions(con, "goodreads")
+        print("✓ Ratings inserted into goodreads")
+
+    if args.changed_only:
+        advance_watermark(con, CONSUMER, top)
+    journal.finish()
+
+    if args.show_misses and no_cand:
+        print("\nNYT titles with no GR candidates:")
+        for t in no_cand:
+            print(" •", t)
+
+    con.close()
 
-if args.show_misses and no_cand:
-    print("\nNYT titles with no GR candidates:")
-    for t in no_cand:
-        print(" •", t)
 
-con.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+"""
+Threshold tuning harness for fuzzy_nyt_gr.py (dry run – never writes)
+
+1  Build once, cache as Parquet under data/interim/fuzzy_cache/
+   • keys     rows Stage 0 (isbn_work, if built) and the exact-key cascade
+              resolve (threshold independent)
+   • stage 1  every surname candidate of every gold NYT row, with its
+              position in the candidate list and its raw token-sort score
+   • stage 2  the best WRatio title over the whole rated catalogue
+   stage 1 and 2 only cover the rows the cascade left over.
+2  Sweep --threshold × --title-threshold × --max-cands in memory against a
+   labelled gold CSV and report precision, recall and runtime per setting.
+
+Gold file
+─────────
+CSV with columns  nyt_isbn13,book_id   (empty book_id = no true match)
+"""
+# ── std-lib ──────────────────────────────────────────────────────
+import argparse
+import hashlib
+import itertools
+import json
+import pathlib
+import time
+
+# ── 3rd-party ───────────────────────────────────────────────────
+import duckdb
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+from flows.fuzzy_nyt_gr import (
+    DB,
+    best_row,
+    fetch_candidates,
+    key_cascade,
+    load_title_pool,
+)
+from gle.normalize import install_macros
+from gle.profiling import profiled
+from gle.work_index import WORK_MATCH_SQL, has_work_table
+
+CACHE_DIR = pathlib.Path("data/interim/fuzzy_cache")
+# bump when the stage 1 candidate order changes, "pos" depends on it
+CACHE_FORMAT = 3
+
+
+# ── CLI ---------------------------------------------------------
+def int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    cli = argparse.ArgumentParser(description="Sweep fuzzy matcher thresholds")
+    cli.add_argument("--gold", type=pathlib.Path, required=True)
+    cli.add_argument("--threshold", type=int_list, default=[80, 85, 90])
+    cli.add_argument("--title-threshold", type=int_list, default=[90, 94, 97])
+    cli.add_argument("--max-cands", type=int_list, default=[500, 1_000, 2_000])
+    cli.add_argument("--use-series", action="store_true")
+    cli.add_argument("--cache-dir", type=pathlib.Path, default=CACHE_DIR)
+    cli.add_argument("--refresh", action="store_true", help="rebuild the cache")
+    cli.add_argument("--out", type=pathlib.Path, help="also write results as CSV")
+    return cli
+
+
+# ── gold ----------------------------------------------------------
+def load_gold(path: pathlib.Path) -> pd.DataFrame:
+    gold = pd.read_csv(path, dtype={"nyt_isbn13": str})
+    gold["book_id"] = pd.to_numeric(gold["book_id"], errors="coerce").astype("Int64")
+    return gold.drop_duplicates("nyt_isbn13")[["nyt_isbn13", "book_id"]]
+
+
+# ── cache -------------------------------------------------------
+def cache_key(db: pathlib.Path, use_series: bool, max_cands: int, isbns) -> str:
+    stat = db.stat()
+    blob = json.dumps(
+        [
+            CACHE_FORMAT,
+            stat.st_mtime_ns,
+            stat.st_size,
+            use_series,
+            max_cands,
+            sorted(isbns),
+        ]
+    )
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+
+def build_cache(
+    con: duckdb.DuckDBPyConnection,
+    isbns: list[str],
+    use_series: bool,
+    max_cands: int,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Stage 0 and cascade hits plus raw scores for every candidate – no thresholds."""
+    install_macros(con)
+    nyt = con.execute(
+        """
+        SELECT DISTINCT ON (isbn13) isbn13,
+               title_key(title)    AS t_key,
+               surname_key(author) AS s_key
+        FROM   green_light.nyt_raw
+        WHERE  isbn13 IN (SELECT unnest(?::VARCHAR[]))
+    """,
+        [isbns],
+    ).df()
+
+    # same order as fuzzy_nyt_gr.main: work index first, then the cascade
+    found = []
+    if has_work_table(con):
+        con.register("nyt_unmatched", nyt)
+        found.append(con.sql(WORK_MATCH_SQL.format(source="nyt_unmatched")).df())
+        con.unregister("nyt_unmatched")
+        nyt = nyt[~nyt["isbn13"].isin(found[-1]["nyt_isbn13"])]
+    if not nyt.empty:
+        found.append(key_cascade(con, nyt))
+    keys = (
+        pd.concat([f[["nyt_isbn13", "book_id"]] for f in found], ignore_index=True)
+        if found
+        else pd.DataFrame(columns=["nyt_isbn13", "book_id"])
+    )
+    nyt = nyt[~nyt["isbn13"].isin(keys["nyt_isbn13"])]
+
+    stage1 = []
+    for _, n in nyt.iterrows():
+        cand = fetch_candidates(con, n.s_key, use_series, max_cands)
+        if cand is None or cand.empty:
+            continue
+        scores = process.cdist(
+            [n.t_key],
+            cand["c_title"],
+            scorer=fuzz.token_sort_ratio,
+            dtype=np.float64,
+        )[0]
+        stage1.append(
+            pd.DataFrame(
+                {
+                    "nyt_isbn13": n.isbn13,
+                    "pos": np.arange(len(cand)),
+                    "book_id": cand["book_id"].to_numpy(),
+                    "score": scores,
+                }
+            )
+        )
+
+    pool = load_title_pool(con)
+    stage2 = []
+    for _, n in nyt.iterrows():
+        best = best_row(n.t_key, pool, fuzz.WRatio)
+        if best:
+            stage2.append((n.isbn13, best[0].book_id, best[1]))
+
+    s1 = (
+        pd.concat(stage1, ignore_index=True)
+        if stage1
+        else pd.DataFrame(columns=["nyt_isbn13", "pos", "book_id", "score"])
+    )
+    s2 = pd.DataFrame(stage2, columns=["nyt_isbn13", "book_id", "score"])
+    return keys, s1, s2
+
+
+CACHE_FILES = ("keys", "stage1", "stage2")
+
+
+def load_or_build(args, isbns: list[str]) -> tuple[pd.DataFrame, ...]:
+    key = cache_key(DB, args.use_series, max(args.max_cands), isbns)
+    cache = args.cache_dir / key
+    if cache.exists() and not args.refresh:
+        print(f"• cache hit  {cache}")
+        return tuple(pd.read_parquet(cache / f"{name}.parquet") for name in CACHE_FILES)
+
+    t0 = time.time()
+    con = duckdb.connect(DB, read_only=True)
+    try:
+        frames = build_cache(con, isbns, args.use_series, max(args.max_cands))
+    finally:
+        con.close()
+    cache.mkdir(parents=True, exist_ok=True)
+    for name, frame in zip(CACHE_FILES, frames):
+        frame.to_parquet(cache / f"{name}.parquet", index=False)
+    print(f"• cache built in {time.time()-t0:,.1f}s  → {cache}")
+    return frames
+
+
+# ── sweep -------------------------------------------------------
+def predict(
+    stage1: pd.DataFrame,
+    stage2: pd.DataFrame,
+    threshold: int,
+    title_threshold: int,
+    max_cands: int,
+    keys: pd.DataFrame | None = None,
+) -> pd.Series:
+    """nyt_isbn13 → book_id exactly as fuzzy_nyt_gr.py would pick them."""
+    s1 = stage1[stage1["pos"] < max_cands]
+    # extractOne keeps the first best candidate → highest score, lowest pos
+    s1 = s1.sort_values(
+        ["nyt_isbn13", "score", "pos"], ascending=[True, False, True]
+    ).drop_duplicates("nyt_isbn13")
+    s1 = s1[s1["score"] >= threshold]
+
+    s2 = stage2[
+        ~stage2["nyt_isbn13"].isin(s1["nyt_isbn13"])
+        & (stage2["score"] >= title_threshold)
+    ]
+    picked = pd.concat([keys, s1, s2])
+    return picked.set_index("nyt_isbn13")["book_id"].astype("Int64")
+
+
+def evaluate(
+    stage1: pd.DataFrame,
+    stage2: pd.DataFrame,
+    gold: pd.DataFrame,
+    threshold: int,
+    title_threshold: int,
+    max_cands: int,
+    keys: pd.DataFrame | None = None,
+) -> dict:
+    t0 = time.perf_counter()
+    pred = predict(stage1, stage2, threshold, title_threshold, max_cands, keys)
+    truth = gold.set_index("nyt_isbn13")["book_id"]
+    pred = pred[pred.index.isin(truth.index)]
+
+    correct = int((pred == truth.reindex(pred.index)).fillna(False).sum())
+    positives = int(truth.notna().sum())
+    return dict(
+        threshold=threshold,
+        title_threshold=title_threshold,
+        max_cands=max_cands,
+        matched=len(pred),
+        correct=correct,
+        precision=correct / len(pred) if len(pred) else float("nan"),
+        recall=correct / positives if positives else float("nan"),
+        ms=(time.perf_counter() - t0) * 1000,
+    )
+
+
+def sweep(stage1, stage2, gold, thresholds, title_thresholds, max_cands, keys=None):
+    grid = itertools.product(thresholds, title_thresholds, max_cands)
+    return pd.DataFrame([evaluate(stage1, stage2, gold, *p, keys) for p in grid])
+
+
+# ── main ----------------------------------------------------------
+@profiled
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+
+    gold = load_gold(args.gold)
+    keys, stage1, stage2 = load_or_build(args, gold["nyt_isbn13"].tolist())
+    print(f"• {len(keys)} gold rows resolved by the exact-key cascade")
+
+    t0 = time.time()
+    results = sweep(
+        stage1,
+        stage2,
+        gold,
+        args.threshold,
+        args.title_threshold,
+        args.max_cands,
+        keys,
+    )
+    results["f1"] = (
+        2
+        * results["precision"]
+        * results["recall"]
+        / (results["precision"] + results["recall"])
+    )
+    print(f"✓ {len(results)} settings in {time.time()-t0:,.2f}s\n")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    best = results.sort_values("f1", ascending=False).iloc[0]
+    print(
+        f"\nbest F1 {best.f1:.3f}: --threshold {best.threshold} "
+        f"--title-threshold {best.title_threshold} --max-cands {best.max_cands}"
+    )
+    if args.out:
+        results.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,87 +7,119 @@ Load the 23 Goodreads *book-chunk* CSVs into DuckDB (`goodreads` table).
 • Keeps the optional Series column (any spelling ‘Series’ or ‘series’);
   if it isn’t present in the files we still create an empty string column.
 • De-duplicates – one row per ISBN-13 (most ratings → best rating → lowest id)
+• Stores gle.normalize match keys (title_key, author_key) next to the text
 • Adds indexes:  UNIQUE(isbn13)  +  authors  +  series
+• Writes an ingest manifest (chunk checksums → version) and bumps the
+  `goodreads` entry in table_versions; the shared Arrow catalogue
+  (`gle catalogue export`) is versioned by that entry, so later writers
+  such as the fuzzy matcher make it stale too
+• --snapshot records the load as a Goodreads rating version
+  (gle.rating_history): only changed rows are kept, with validity intervals
 Schema
 ──────
 book_id · isbn13 · title · authors · series · average_rating · ratings_count
+· title_key · author_key
 """
 # ── stdlib ─────────────────────────────────────────────────────────────
 import argparse
 import csv
 import glob
 import pathlib
-import re
 import sys
 import time
 
 # ── 3rd-party ──────────────────────────────────────────────────────────
 import duckdb
 
-# ── CLI ────────────────────────────────────────────────────────────────
-cli = argparse.ArgumentParser()
-cli.add_argument(
-    "--reset", action="store_true", help="drop the table before (re)loading"
-)
-args = cli.parse_args()
+from gle.catalogue import DEFAULT_MANIFEST_PATH, write_ingest_manifest
+
+# ── helper UDF  (ISBN-10 → ISBN-13) ───────────────────────────────────
+from gle.isbn import isbn10_to13
+from gle.normalize import install_macros
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+from gle.rating_history import record_version
+from gle.resources import ResourceProfile, SpillMonitor, format_bytes, peak_rss_bytes
 
 # ── paths ──────────────────────────────────────────────────────────────
 HERE = pathlib.Path(__file__).resolve().parent
 RAW_DIR = HERE.parent / "data" / "raw" / "goodreads"
 DB_FILE = HERE.parent / "data" / "green_light.duckdb"
+MANIFEST_FILE = HERE.parent / DEFAULT_MANIFEST_PATH
 
-FILES = sorted(
-    fp for fp in glob.glob(str(RAW_DIR / "book*csv")) if "-" in pathlib.Path(fp).stem
-)
-if not FILES:
-    sys.exit("❌  no book-chunk CSVs found under data/raw/goodreads")
 
-# ── find (or not) a Series column name ────────────────────────────────
-with open(FILES[0], newline="", encoding="utf-8", errors="ignore") as f:
-    header = next(csv.reader(f))
-header_lower = [h.lower() for h in header]
-if "series" in header_lower:
-    SERIES_COL = header[header_lower.index("series")]
-elif "series." in header_lower:
-    SERIES_COL = header[header_lower.index("series.")]
-else:
-    SERIES_COL = None  # not present at all
-
-# expression used in SQL ↓↓↓
-if SERIES_COL:
-    SERIES_EXPR = f"COALESCE(\"{SERIES_COL}\", '') AS series_raw"
-else:  # create an empty column so schema is stable
-    SERIES_EXPR = "''::VARCHAR                AS series_raw"
+# ── CLI ────────────────────────────────────────────────────────────────
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
 
 
-# ── helper UDF  (ISBN-10 → ISBN-13) ───────────────────────────────────
-def isbn10_to13(isbn10: str | None) -> str | None:
-    if not isbn10:
-        return None
-    d = re.sub(r"[^0-9Xx]", "", isbn10)
-    if len(d) != 10:
-        return None
-    body = "978" + d[:9]
-    chk = (10 - sum((1, 3)[i & 1] * int(x) for i, x in enumerate(body)) % 10) % 10
-    return body + str(chk)
+def build_parser() -> argparse.ArgumentParser:
+    cli = argparse.ArgumentParser(description="Load Goodreads book-chunk CSVs")
+    cli.add_argument(
+        "--reset", action="store_true", help="drop the table before (re)loading"
+    )
+    cli.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="stage rows on disk and dedup per ISBN hash partition with arg_max",
+    )
+    cli.add_argument(
+        "--partitions",
+        type=positive_int,
+        default=16,
+        help="hash partitions for --out-of-core (more = less memory per step)",
+    )
+    cli.add_argument("--memory-limit", help="DuckDB memory_limit, e.g. 2GB")
+    cli.add_argument("--threads", type=int, help="DuckDB worker threads")
+    cli.add_argument("--temp-dir", type=pathlib.Path, help="DuckDB spill directory")
+    cli.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="keep this dump as a rating version (changed rows only)",
+    )
+    cli.add_argument(
+        "--dump-date", help="day the dump was taken, for --snapshot (default today)"
+    )
+    return cli
 
 
-# ── ingest ────────────────────────────────────────────────────────────
-print(f"=== Goodreads ingest started  ({len(FILES)} chunks) ===")
-t0 = time.time()
-con = duckdb.connect(DB_FILE)
-con.create_function("isbn10_to13", isbn10_to13)
+def find_chunks(raw_dir: pathlib.Path = RAW_DIR) -> list[str]:
+    return sorted(
+        fp
+        for fp in glob.glob(str(raw_dir / "book*csv"))
+        if "-" in pathlib.Path(fp).stem
+    )
 
-if args.reset:
-    con.execute("DROP TABLE IF EXISTS goodreads")
-    print("• table dropped (--reset)")
 
-sql = f"""
-CREATE OR REPLACE TABLE goodreads AS
+# ── find (or not) a Series column name ────────────────────────────────
+def series_expr(first_file: str) -> str:
+    with open(first_file, newline="", encoding="utf-8", errors="ignore") as f:
+        header = next(csv.reader(f))
+    header_lower = [h.lower() for h in header]
+    if "series" in header_lower:
+        series_col = header[header_lower.index("series")]
+    elif "series." in header_lower:
+        series_col = header[header_lower.index("series.")]
+    else:
+        series_col = None  # not present at all
+
+    # expression used in SQL ↓↓↓
+    if series_col:
+        return f"COALESCE(\"{series_col}\", '') AS series_raw"
+    # create an empty column so schema is stable
+    return "''::VARCHAR                AS series_raw"
+
+
+CLEANED_SQL = """
 WITH raw AS (
     SELECT *
     FROM read_csv_auto(
-            ?, header=TRUE, union_by_name=TRUE, sample_size=-1)
+            ?, header=TRUE, union_by_name=TRUE, sample_size=-1,
+            types={{'ISBN': 'VARCHAR'}})   -- all-digit chunks would sniff BIGINT
 ),
 mapped AS (
     SELECT
@@ -95,7 +127,7 @@ mapped AS (
         "ISBN"                                      AS isbn_raw,
         "Name"                                      AS title,
         regexp_replace("Authors", '\\\\.$', '')      AS authors,
-        {SERIES_EXPR},                               -- ← dynamic!
+        {series_expr},                               -- ← dynamic!
         "Rating"::DOUBLE                            AS average_rating,
         "CountsOfReview"::INTEGER                   AS ratings_count
     FROM raw
@@ -111,37 +143,167 @@ cleaned AS (
         END                                   AS isbn13
     FROM mapped
     WHERE isbn_raw IS NOT NULL
-),
-dedup AS (
-    SELECT *
-    FROM   cleaned
-    WHERE  isbn13 IS NOT NULL
-      AND  length(isbn13)=13
-    QUALIFY row_number() OVER (
-              PARTITION BY isbn13
-              ORDER BY ratings_count DESC NULLS LAST,
-                       average_rating DESC NULLS LAST,
-                       book_id
-            ) = 1
 )
 SELECT  book_id, isbn13, title, authors, series,
-        average_rating, ratings_count
-FROM dedup;
+        average_rating, ratings_count,
+        title_key(title)      AS title_key,
+        surname_key(authors)  AS author_key
+FROM   cleaned
+WHERE  isbn13 IS NOT NULL
+  AND  length(isbn13)=13
 """
-con.execute(sql, [FILES])
 
-# ── indexes / constraints ──────────────────────────────────────────────
-con.execute(
-    "CREATE UNIQUE INDEX IF NOT EXISTS goodreads_isbn13_uidx " "ON goodreads(isbn13);"
-)
-con.execute(
-    "CREATE INDEX IF NOT EXISTS goodreads_authors_idx " "ON goodreads(authors);"
-)
-con.execute("CREATE INDEX IF NOT EXISTS goodreads_series_idx " "ON goodreads(series);")
+# default: one window sort over the full union of all chunks
+INGEST_SQL = """
+CREATE OR REPLACE TABLE goodreads AS
+SELECT *
+FROM ({cleaned}) AS cleaned
+QUALIFY row_number() OVER (
+          PARTITION BY isbn13
+          ORDER BY ratings_count DESC NULLS LAST,
+                   average_rating DESC NULLS LAST,
+                   book_id
+        ) = 1;
+"""
 
-print(
-    f"✓ Goodreads rows ingested: "
-    f"{con.sql('SELECT COUNT(*) FROM goodreads').fetchone()[0]:,}"
-)
-print(f"🕒  finished in {time.time()-t0:.1f}s")
-con.close()
+# ── out-of-core mode ──────────────────────────────────────────────────
+# Cleaned rows are staged on disk, then each ISBN hash partition is reduced
+# with arg_max. The struct key reproduces the window ORDER BY above:
+# non-null beats null, then higher ratings_count / average_rating, then the
+# lowest book_id.
+STAGE_SQL = """
+CREATE OR REPLACE TABLE goodreads_stage AS
+SELECT *, hash(isbn13) % {partitions} AS part
+FROM ({cleaned}) AS cleaned;
+"""
+
+ARGMAX_SQL = """
+INSERT INTO goodreads
+SELECT unnest(best)
+FROM (
+    SELECT arg_max(
+             struct_pack(book_id, isbn13, title, authors, series,
+                         average_rating, ratings_count, title_key, author_key),
+             struct_pack(
+                 rc_known := ratings_count IS NOT NULL,
+                 rc       := coalesce(ratings_count, 0),
+                 ar_known := average_rating IS NOT NULL,
+                 ar       := coalesce(average_rating, 0),
+                 id_known := book_id IS NOT NULL,
+                 neg_id   := -coalesce(book_id, 0)
+             )
+           ) AS best
+    FROM   goodreads_stage
+    WHERE  part = ?
+    GROUP  BY isbn13
+);
+"""
+
+
+def load_goodreads(
+    con: duckdb.DuckDBPyConnection,
+    files: list[str],
+    out_of_core: bool = False,
+    partitions: int = 16,
+) -> None:
+    """(Re)build `goodreads` from the chunk files – one row per ISBN-13."""
+    install_macros(con)
+    cleaned = CLEANED_SQL.format(series_expr=series_expr(files[0]))
+
+    if not out_of_core:
+        con.execute(INGEST_SQL.format(cleaned=cleaned), [files])
+        return
+
+    con.execute(STAGE_SQL.format(cleaned=cleaned, partitions=partitions), [files])
+    con.execute(
+        "CREATE OR REPLACE TABLE goodreads AS "
+        "SELECT * EXCLUDE (part) FROM goodreads_stage LIMIT 0"
+    )
+    for part in range(partitions):
+        con.execute(ARGMAX_SQL, [part])
+    con.execute("DROP TABLE goodreads_stage")
+
+
+def ingest(
+    con: duckdb.DuckDBPyConnection,
+    files: list[str],
+    out_of_core: bool = False,
+    partitions: int = 16,
+    snapshot: bool = False,
+    dump_date: str | None = None,
+    manifest_file: pathlib.Path = MANIFEST_FILE,
+):
+    """
+    Load the chunks, index the table, write the ingest manifest and, with
+    `snapshot`, record a rating version. Returns (rows, manifest, version).
+    """
+    load_goodreads(con, files, out_of_core, partitions)
+
+    # ── indexes / constraints ──────────────────────────────────────────
+    con.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS goodreads_isbn13_uidx "
+        "ON goodreads(isbn13);"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS goodreads_authors_idx " "ON goodreads(authors);"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS goodreads_series_idx " "ON goodreads(series);"
+    )
+
+    bump_table_versions(con, "goodreads")
+    rows = con.sql("SELECT COUNT(*) FROM goodreads").fetchone()[0]
+    manifest = write_ingest_manifest(map(pathlib.Path, files), rows, manifest_file)
+    version = record_version(con, dump_date, manifest.version) if snapshot else None
+    return rows, manifest, version
+
+
+# ── ingest ────────────────────────────────────────────────────────────
+@profiled
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+
+    files = find_chunks()
+    if not files:
+        sys.exit("❌  no book-chunk CSVs found under data/raw/goodreads")
+
+    print(f"=== Goodreads ingest started  ({len(files)} chunks) ===")
+    t0 = time.time()
+    con = duckdb.connect(DB_FILE)
+    ResourceProfile(
+        memory_limit=args.memory_limit,
+        threads=args.threads,
+        temp_directory=args.temp_dir,
+        preserve_insertion_order=not args.out_of_core,
+    ).apply(con)
+    con.create_function("isbn10_to13", isbn10_to13)
+
+    if args.reset:
+        con.execute("DROP TABLE IF EXISTS goodreads")
+        print("• table dropped (--reset)")
+
+    with SpillMonitor(con) as spill:
+        rows, manifest, v = ingest(
+            con,
+            files,
+            out_of_core=args.out_of_core,
+            partitions=args.partitions,
+            snapshot=args.snapshot,
+            dump_date=args.dump_date,
+        )
+    print(f"✓ Goodreads rows ingested: {rows:,}  (ingest {manifest.version})")
+    if v is not None:
+        print(
+            f"🗂  rating version {v.version} ({v.dump_date}): "
+            f"{v.changed:,} new or changed · {v.removed:,} removed"
+        )
+    print(f"🕒  finished in {time.time()-t0:.1f}s")
+    print(
+        f"📈  peak memory {format_bytes(peak_rss_bytes())} "
+        f"· peak spill {format_bytes(spill.peak)}"
+    )
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 # flows/hardcover_client.py
+import argparse
 import os
 from functools import lru_cache
 from pathlib import Path
@@ -6,14 +7,13 @@ from pathlib import Path
 import requests
 from dotenv import load_dotenv
 
-from .models import BookDoc
+from gle.profiling import profiled
+from gle.ratelimit import limiter_for
 
-load_dotenv(Path(".env"))
+from .models import BookDoc, decode_documents
 
-TOKEN = os.environ["HARDCOVER_AUTH_TOKEN"]
-AUTH = TOKEN if TOKEN.lower().startswith("bearer ") else f"Bearer {TOKEN}"
-HEADERS = {"Authorization": AUTH}
 URL = "https://api.hardcover.app/v1/graphql"
+URL_ENV = "HARDCOVER_URL"  # point at a local stand-in (gle standin)
 
 # ⬇️  no subselection under `stats` – bring the two numbers up a level
 QUERY = """
@@ -25,10 +25,38 @@ query ($isbn: String!) {
 """
 
 
-@lru_cache(maxsize=4096)
-def fetch_book(isbn: str) -> BookDoc | None:
+class HardcoverAuthError(RuntimeError):
+    """Missing or rejected HARDCOVER_AUTH_TOKEN – retrying cannot help."""
+
+
+@lru_cache(maxsize=1)
+def auth_headers() -> dict[str, str]:
+    """Read HARDCOVER_AUTH_TOKEN on first use, not at import time."""
+    load_dotenv(Path(".env"))
+    token = os.getenv("HARDCOVER_AUTH_TOKEN")
+    if not token:
+        raise HardcoverAuthError(
+            "Environment variable HARDCOVER_AUTH_TOKEN is required but not set. "
+            "Create a dot env file with HARDCOVER_AUTH_TOKEN or export it in your shell."
+        )
+    auth = token if token.lower().startswith("bearer ") else f"Bearer {token}"
+    return {"Authorization": auth}
+
+
+def graphql_url() -> str:
+    return os.getenv(URL_ENV) or URL
+
+
+def fetch_document(isbn: str) -> dict | None:
+    """Raw Hardcover search document for one ISBN, every field included."""
     payload = {"query": QUERY, "variables": {"isbn": isbn}}
-    resp = requests.post(URL, json=payload, headers=HEADERS, timeout=10)
+    headers = auth_headers()
+    # shared per-token quota: blocks instead of tripping 429s (gle.ratelimit)
+    resp = limiter_for("hardcover", headers["Authorization"]).call(
+        lambda: requests.post(graphql_url(), json=payload, headers=headers, timeout=10)
+    )
+    if resp.status_code in (401, 403):
+        raise HardcoverAuthError(f"Hardcover rejected the token ({resp.status_code})")
     resp.raise_for_status()
     data = resp.json()
 
@@ -39,4 +67,34 @@ def fetch_book(isbn: str) -> BookDoc | None:
     # { "found": 1, "facet_counts": [], "hits": [ { "document": { … } } ] }
     search_blob = data["data"]["search"]["results"]
     hits = (search_blob or {}).get("hits", [])
-    return BookDoc(**hits[0]["document"]) if hits else None
+    return hits[0]["document"] if hits else None
+
+
+@lru_cache(maxsize=4096)
+def fetch_book(isbn: str) -> BookDoc | None:
+    # slim model: the cache only holds the fields the pipeline reads
+    doc = fetch_document(isbn)
+    return decode_documents([doc])[0] if doc else None
+
+
+@profiled
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Fetch Hardcover metadata by ISBN")
+    ap.add_argument("--isbn", required=True, help="ISBN-13 to look up")
+    ap.add_argument("--outfile", type=Path, help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+
+    book = fetch_book(args.isbn)
+    if book is None:
+        print(f"No Hardcover match for {args.isbn}")
+        return
+    if args.outfile:
+        args.outfile.parent.mkdir(parents=True, exist_ok=True)
+        args.outfile.write_text(book.json())
+        print(f"✓ Saved {args.outfile}")
+    else:
+        print(book.json())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,69 @@
 """
 hardcover_probe.py
 ------------------
-• Reads unique ISBN-13s from NYT JSON files (data/raw/nyt).
+• Spends a per-run request budget (--n) on the most valuable ISBNs first:
+  gle.probe_schedule ranks everything not yet probed by how recently it was
+  on a list, its NYT rank and whether Goodreads already has it; misses are
+  retried after a cooldown at lower priority. --order date keeps the old
+  file-date order over the NYT JSON files (data/raw/nyt).
 • Looks each ISBN up with Hardcover’s client wrapper.
-• Writes every hit to data/raw/hardcover/{isbn}.json.
-• Reports join hit-rate.
+• Writes every hit to data/raw/hardcover/{isbn}.json (slim fields only).
+• --keep-full also keeps the untouched document, gzip-compressed, under
+  data/raw/hardcover/full/{isbn}.json.gz.
+• --changed-only probes just the ISBNs the NYT change feed has newly seen
+  since the last run (consumer "hardcover_probe"), skipping ones already
+  probed, and advances the mark once every one of them has been probed.
+• Pacing comes from the shared Hardcover rate limiter (gle.ratelimit), so
+  parallel probes and flows stay inside one quota; --delay only adds to it.
+• Progress goes to a checkpoint journal (data/interim/checkpoints/
+  hardcover_probe.jsonl) every --checkpoint-every ISBNs; --resume skips what
+  an interrupted run already looked up and keeps its counters, which still
+  count against --n.
+• Reports hits per request spent; every probe is logged to the DuckDB table
+  hardcover_probe_log so the next run skips it. Failed lookups (network
+  errors, 429s past the retries) are not logged as misses, so they stay at
+  full priority for the next run; a missing or rejected token aborts.
+• DuckDB is only opened to rank and to log, never across the slow probe
+  loop, so other writers and readers are not locked out meanwhile.
 """
 
+import argparse
+import gzip
+import itertools
 import json
 import time
 from pathlib import Path
 
+import duckdb
 from dotenv import load_dotenv
 
-from flows.hardcover_client import fetch_book
+from flows.hardcover_client import HardcoverAuthError, fetch_book, fetch_document
 from flows.models import BookDoc  # same package                   # <-- Pydantic model
-
-load_dotenv(".env")
+from flows.models import decode_documents
+from gle.checkpoint import Journal
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.nyt_changes import (
+    advance_watermark,
+    latest_seq,
+    pending_changes,
+    pending_isbns,
+)
+from gle.probe_schedule import ensure_log, rank_pending, record_probes
+from gle.profiling import profiled
+from gle.snapshot_manifest import iter_snapshot_payloads
 
 # -------------------------- config -----------------------------------------
 NYT_DIR = Path("data/raw/nyt")
 HC_DIR = Path("data/raw/hardcover")
-HC_DIR.mkdir(parents=True, exist_ok=True)
+HC_FULL_DIR = HC_DIR / "full"
+CONSUMER = "hardcover_probe"
 
 
 # -------------------------- helpers ----------------------------------------
 def iter_nyt_isbns(limit: int = 1000):
     """Yield up to `limit` distinct ISBN-13s in date-order."""
     seen = set()
-    for fp in sorted(NYT_DIR.glob("*.json")):
-        data = json.loads(fp.read_text())
+    for _, data in iter_snapshot_payloads(NYT_DIR):
         for lst in data["results"]["lists"]:
             for book in lst["books"]:
                 isbn = book["primary_isbn13"]
@@ -45,39 +79,193 @@ def query_hardcover(isbn: str) -> BookDoc | None:
     return fetch_book(isbn)
 
 
+def save_full(isbn: str, doc: dict) -> Path:
+    """Side-store the complete Hardcover document, gzip-compressed."""
+    HC_FULL_DIR.mkdir(parents=True, exist_ok=True)
+    path = HC_FULL_DIR / f"{isbn}.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        json.dump(doc, fh, separators=(",", ":"))
+    return path
+
+
 # -------------------------- main -------------------------------------------
-def main(n: int = 1000, delay: float = 0.4):
-    hits = misses = 0
-    for idx, isbn in enumerate(iter_nyt_isbns(n), 1):
+def probe(
+    n: int = 1000,
+    delay: float = 0.0,
+    keep_full: bool = False,
+    isbns: list[str] | None = None,
+    resume: bool = False,
+    checkpoint_every: int = 50,
+):
+    load_dotenv(".env")
+    HC_DIR.mkdir(parents=True, exist_ok=True)
+
+    options = {"n": n, "keep_full": keep_full, "scheduled": isbns is not None}
+    journal = Journal(CONSUMER, options, resume=resume, batch_size=checkpoint_every)
+    print(journal.describe())
+
+    hits = journal.counters.get("hits", 0)
+    misses = journal.counters.get("misses", 0)
+    errors = 0
+    if isbns is None:
+        source = iter_nyt_isbns(n)
+    else:
+        # a resumed run already spent part of the budget on what it journaled
+        todo = (isbn for isbn in isbns if isbn not in journal)
+        source = itertools.islice(todo, max(n - hits - misses, 0))
+    for idx, isbn in enumerate(source, 1):
+        if isbn in journal:
+            continue
+        hit = False
         try:
-            book = query_hardcover(isbn)
+            if keep_full:
+                doc = fetch_document(isbn)
+                book = decode_documents([doc])[0] if doc else None
+                if doc:
+                    save_full(isbn, doc)
+            else:
+                book = query_hardcover(isbn)
             if book:
-                hits += 1
+                hit = True
                 # Pydantic serialises itself, so no json.dumps() needed.
                 (HC_DIR / f"{isbn}.json").write_text(book.json())
-            else:
-                misses += 1
+        except HardcoverAuthError:
+            raise
         except Exception as exc:
+            # not a miss: left out of the journal and the log, retried next run
             print(f"[warn] {isbn} ? {exc}")
-            misses += 1
+            errors += 1
+            continue
+        hits += hit
+        misses += not hit
+        journal.record(
+            isbn, counters={"hits" if hit else "misses": 1}, probed=[[isbn, hit]]
+        )
 
         if idx % 100 == 0:
             print(f"Progress {idx}/{n} — hit-rate: {hits/idx:.1%}")
-        time.sleep(delay)  # polite pacing
+        if delay:
+            time.sleep(delay)  # extra pause on top of the shared rate limit
 
-    total = hits + misses
+    outcomes = dict(journal.items("probed"))
+    journal.finish()
+    total = hits + misses + errors
+    if not total:
+        print("Nothing to probe.")
+        return outcomes
     print("\n=== Hardcover join-probe summary ===")
-    print(f"Total looked-up  : {total}")
+    print(f"Requests spent   : {total} of {n}")
     print(f"Matches (hits)   : {hits}")
     print(f"No match (misses): {misses}")
-    print(f"Hit-rate         : {hits/total:.1%}")
+    print(f"Failed (retried) : {errors}")
+    print(f"Hits per request : {hits/total:.2f}")
+    return outcomes
 
 
-if __name__ == "__main__":
-    import argparse
+@profiled
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Probe Hardcover for NYT ISBN-13s")
+    ap.add_argument(
+        "--n", type=int, default=1000, help="request budget (ISBNs to probe)"
+    )
+    ap.add_argument(
+        "--order",
+        choices=("priority", "date"),
+        default="priority",
+        help="highest value ISBNs first, or NYT file-date order",
+    )
+    ap.add_argument(
+        "--delay",
+        type=float,
+        default=0.0,
+        help="extra sleep seconds (HARDCOVER_RATE_LIMIT sets the quota)",
+    )
+    ap.add_argument(
+        "--keep-full",
+        action="store_true",
+        help="also store the full document gzip-compressed under full/",
+    )
+    ap.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="only ISBNs newly seen in the NYT change feed since the last run",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run from its checkpoint journal",
+    )
+    ap.add_argument(
+        "--checkpoint-every", type=int, default=50, help="ISBNs per journal batch"
+    )
+    ap.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    args = ap.parse_args(argv)
+    resume = dict(resume=args.resume, checkpoint_every=args.checkpoint_every)
 
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--n", type=int, default=1000, help="ISBNs to probe")
-    ap.add_argument("--delay", type=float, default=0.4, help="sleep seconds")
-    args = ap.parse_args()
-    main(args.n, args.delay)
+    if args.order == "date" and not args.changed_only:
+        outcomes = probe(args.n, args.delay, args.keep_full, **resume)
+        if args.duckdb.exists():
+            con = duckdb.connect(str(args.duckdb))
+            record_probes(con, outcomes)
+            con.close()
+        return
+
+    # rank, then let go of the database while the rate-limited probe runs
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        only = None
+        top = None
+        if args.changed_only:
+            top = latest_seq(con)
+            only = pending_isbns(pending_changes(con, CONSUMER, ["new"]))
+            print(f"{len(only)} newly seen ISBNs since the last probe")
+
+        isbns = only
+        if args.order == "priority":
+            ranked = rank_pending(con, only=only)
+            isbns = [
+                s.isbn13 for s in ranked if not (HC_DIR / f"{s.isbn13}.json").exists()
+            ]
+            if ranked or only is not None:
+                print(
+                    f"{len(isbns)} ISBNs pending, top {min(args.n, len(isbns))} by priority"
+                )
+            else:
+                print("No NYT weeks in DuckDB yet – probing in file-date order")
+                isbns = None
+        else:
+            # feed order; like the ranking, skip hits on disk and logged probes
+            ensure_log(con)
+            logged = {
+                row[0]
+                for row in con.execute(
+                    "SELECT isbn13 FROM hardcover_probe_log"
+                ).fetchall()
+            }
+            isbns = [
+                isbn
+                for isbn in only
+                if isbn not in logged and not (HC_DIR / f"{isbn}.json").exists()
+            ]
+            print(f"{len(isbns)} not probed yet, first {min(args.n, len(isbns))}")
+    finally:
+        con.close()
+
+    outcomes = probe(args.n, args.delay, args.keep_full, isbns, **resume)
+
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        record_probes(con, outcomes)
+        # failed lookups keep the feed position so the next run sees them again
+        if (
+            args.changed_only
+            and len(isbns) <= args.n
+            and all(isbn in outcomes for isbn in isbns)
+        ):
+            advance_watermark(con, CONSUMER, top)
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
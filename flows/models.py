@@ -1,7 +1,8 @@
 from datetime import date
-from typing import List, Optional
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 
 class Image(BaseModel):
@@ -26,3 +27,36 @@ class BookDoc(BaseModel):
 
     class Config:
         extra = "allow"  # ignore fields we don’t list
+
+
+class SlimBookDoc(BookDoc):
+    # same fields as BookDoc, but everything else Hardcover sends is dropped
+    class Config:
+        extra = "ignore"
+
+
+# ── batch decoding ------------------------------------------------------
+# One TypeAdapter call validates a whole list, and validate_json parses the
+# bytes in pydantic-core directly – no json.loads() + dict round trip.
+BOOKS = TypeAdapter(List[BookDoc])
+SLIM_BOOKS = TypeAdapter(List[SlimBookDoc])
+
+
+def _adapter(slim: bool) -> TypeAdapter:
+    return SLIM_BOOKS if slim else BOOKS
+
+
+def decode_books(raw: Union[bytes, str], slim: bool = True) -> List[BookDoc]:
+    """Validate a JSON array of Hardcover documents in one pass."""
+    return _adapter(slim).validate_json(raw)
+
+
+def decode_documents(docs: Iterable[dict], slim: bool = True) -> List[BookDoc]:
+    """Validate already parsed documents (e.g. search hits) in one pass."""
+    return _adapter(slim).validate_python(list(docs))
+
+
+def load_book_files(paths: Iterable[Path], slim: bool = True) -> List[BookDoc]:
+    """Read many data/raw/hardcover/*.json files and decode them together."""
+    blobs = [Path(p).read_bytes().strip() for p in paths]
+    return decode_books(b"[" + b",".join(blobs) + b"]", slim=slim)
@@ -14,11 +14,14 @@ from argparse import ArgumentParser
 from dotenv import load_dotenv
 
 from gle.ingest_nyt import (
+    DEFAULT_RAW_DIR,
     NytIngestConfig,
     ingest_one_monday,
     ingest_range,
     last_monday_utc,
 )
+from gle.profiling import profiled
+from gle.snapshot_manifest import rebuild_manifest
 
 
 def get_required_env(name: str) -> str:
@@ -52,23 +55,39 @@ def parse_args() -> ArgumentParser:
         "--end",
         help="Range mode last monday inclusive in YYYY minus MM minus DD format",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Fetch again even if the manifest already holds an intact snapshot",
+    )
+    parser.add_argument(
+        "--rebuild-manifest",
+        action="store_true",
+        help="Record existing snapshot files missing from the manifest and exit",
+    )
 
     return parser
 
 
-def main() -> None:
+@profiled
+def main(argv: list[str] | None = None) -> None:
     load_dotenv()
 
+    parser = parse_args()
+    args = parser.parse_args(argv)
+
+    if args.rebuild_manifest:
+        adopted = rebuild_manifest(DEFAULT_RAW_DIR)
+        print(f"Recorded {len(adopted)} existing snapshots in the manifest")
+        return
+
     api_key = get_required_env("NYT_API_KEY")
     config = NytIngestConfig(api_key=api_key)
 
-    parser = parse_args()
-    args = parser.parse_args()
-
     if args.start and args.end:
-        ingest_range(config, args.start, args.end)
+        ingest_range(config, args.start, args.end, force=args.force)
     else:
-        ingest_one_monday(config, args.date)
+        ingest_one_monday(config, args.date, force=args.force)
 
 
 if __name__ == "__main__":
@@ -14,6 +14,7 @@ You can trigger it ad-hoc:
 …or schedule it inside Prefect Cloud/Server later (the CI job already
 takes care of weekly GitHub Actions artefacts).
 """
+import argparse
 import pathlib
 import sys
 from pathlib import Path
@@ -23,7 +24,13 @@ from prefect import flow, task
 sys.path.append(str(pathlib.Path(__file__).parent.parent))
 
 # Local module (the updated script you just refactored)
-from flows.nyt_ingest import ingest_range, last_monday_utc
+from flows.nyt_ingest import (
+    NytIngestConfig,
+    get_required_env,
+    ingest_range,
+    last_monday_utc,
+)
+from gle.profiling import profiled
 
 RAW_DIR = Path(__file__).parents[1] / "data" / "raw" / "nyt"
 
@@ -33,7 +40,8 @@ def fetch_latest() -> Path:
     """Call the existing ingest utility for exactly one Monday."""
     monday_iso = last_monday_utc().strftime("%Y-%m-%d")
     print(f"▶ Fetching NYT snapshot for {monday_iso}")
-    ingest_range(monday_iso, monday_iso)  # one-day “range”
+    config = NytIngestConfig(api_key=get_required_env("NYT_API_KEY"), raw_dir=RAW_DIR)
+    ingest_range(config, monday_iso, monday_iso)  # one-day “range”
     out = RAW_DIR / f"{monday_iso}.json"
     if not out.exists():
         raise FileNotFoundError(out)
@@ -50,6 +58,13 @@ def pull_latest_nyt() -> None:  # no return needed; side-effect only
     fetch_latest()
 
 
+@profiled
+def main(argv: list[str] | None = None) -> None:
+    """CLI shim so `gle nyt-flow` can run the flow like the other scripts."""
+    argparse.ArgumentParser(description="Pull the latest NYT snapshot").parse_args(argv)
+    pull_latest_nyt()
+
+
 # Allow `python flows/nytimes_flow.py` to run the flow directly
 if __name__ == "__main__":
-    pull_latest_nyt()
+    main()
@@ -0,0 +1,364 @@
+"""
+raw_watch.py
+------------
+• Long-running watch over data/raw/{nyt,hardcover,goodreads}: new or changed
+  files are queued and loaded into DuckDB in micro-batches through the
+  incremental loaders
+    nyt        → manifest adoption + gle.nyt_features.sync_features
+    hardcover  → upsert of the slim documents into `hardcover_books`
+    goodreads  → goodreads_ingest.ingest (the chunks dedup across each other,
+                 so any change reloads all of them; --snapshot keeps versions)
+• Debounce: a batch runs once nothing changed for --debounce seconds, when
+  the oldest queued file has waited --max-delay seconds, or when --max-batch
+  files are queued. Half-written files simply change again and are re-queued.
+• Loaded files are remembered in `raw_watch_files` (size + mtime), so a
+  restart only picks up what landed while the watcher was down. A file that
+  fails to load is skipped until it changes.
+• The database is opened per batch only, so other processes can query it
+  between batches. While another process holds it the batch stays queued
+  and is retried on the next poll.
+• Queue depth, ingest lag (file landed → queryable) and the last batch are
+  printed per batch and written to data/interim/raw_watch_status.json.
+"""
+
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import duckdb
+
+from flows.goodreads_ingest import MANIFEST_FILE, find_chunks, ingest
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.isbn import isbn10_to13
+from gle.nyt_features import DEFAULT_EXPORT_DIR, sync_features
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+from gle.snapshot_manifest import is_iso_date, rebuild_manifest
+
+# -------------------------- config -----------------------------------------
+RAW_DIR = Path("data/raw")
+STATUS_FILE = Path("data/interim/raw_watch_status.json")
+SOURCES = ("nyt", "hardcover", "goodreads")
+
+WATCH_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS raw_watch_files (
+    path      VARCHAR PRIMARY KEY,
+    source    VARCHAR NOT NULL,
+    size      BIGINT  NOT NULL,
+    mtime_ns  BIGINT  NOT NULL,
+    loaded_at TIMESTAMP NOT NULL
+);
+"""
+
+HARDCOVER_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS hardcover_books (
+    isbn13           VARCHAR PRIMARY KEY,
+    id               BIGINT,
+    title            VARCHAR,
+    rating           DOUBLE,
+    ratings_count    BIGINT,
+    publication_date VARCHAR,
+    loaded_at        TIMESTAMP NOT NULL
+);
+"""
+
+HARDCOVER_UPSERT_SQL = """
+INSERT OR REPLACE INTO hardcover_books
+SELECT regexp_extract(filename, '([^/\\\\]+)\\.json$', 1),
+       id, title, rating, ratings_count,
+       strftime(publication_date, '%Y-%m-%d'),
+       now()::TIMESTAMP
+FROM read_json(?, filename = TRUE, columns = {
+    'id': 'BIGINT', 'title': 'VARCHAR', 'rating': 'DOUBLE',
+    'ratings_count': 'BIGINT', 'publication_date': 'DATE'
+})
+"""
+
+
+# -------------------------- helpers ----------------------------------------
+def source_files(raw_dir: Path = RAW_DIR) -> dict[str, list[Path]]:
+    """The files each loader reads, per source."""
+    nyt_dir = raw_dir / "nyt"
+    return {
+        "nyt": sorted(p for p in nyt_dir.glob("*.json") if is_iso_date(p.stem)),
+        "hardcover": sorted((raw_dir / "hardcover").glob("*.json")),
+        "goodreads": [Path(f) for f in find_chunks(raw_dir / "goodreads")],
+    }
+
+
+def load_hardcover(con: duckdb.DuckDBPyConnection, paths: list[Path]) -> int:
+    con.execute(HARDCOVER_SCHEMA_SQL)
+    con.execute(HARDCOVER_UPSERT_SQL, [[str(p) for p in paths]])
+    bump_table_versions(con, "hardcover_books")
+    return len(paths)
+
+
+@dataclass(frozen=True)
+class Queued:
+    source: str
+    path: Path
+    size: int
+    mtime_ns: int
+    queued_at: float
+
+
+# -------------------------- watcher ----------------------------------------
+class RawWatcher:
+    """Polls the raw directories and micro-batches changes into DuckDB."""
+
+    def __init__(
+        self,
+        db_file: Path = DEFAULT_DUCKDB_PATH,
+        raw_dir: Path = RAW_DIR,
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        max_batch: int = 1000,
+        snapshot: bool = False,
+        export_dir: Path | None = DEFAULT_EXPORT_DIR,
+        goodreads_manifest: Path = MANIFEST_FILE,
+        status_file: Path | None = STATUS_FILE,
+        clock=time.time,
+    ):
+        self.db_file = db_file
+        self.raw_dir = raw_dir
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.snapshot = snapshot
+        self.export_dir = export_dir
+        self.goodreads_manifest = goodreads_manifest
+        self.status_file = status_file
+        self.clock = clock
+
+        self.pending: dict[str, Queued] = {}
+        self.failed: dict[str, tuple[int, int]] = {}
+        self.last_change: float | None = None
+        self.totals = {"batches": 0, "files": 0, "errors": 0, "busy": 0}
+        self.last_batch: dict | None = None
+
+        con = duckdb.connect(str(db_file))
+        try:
+            con.execute(WATCH_SCHEMA_SQL)
+            self.known = {
+                path: (size, mtime_ns)
+                for path, size, mtime_ns in con.execute(
+                    "SELECT path, size, mtime_ns FROM raw_watch_files"
+                ).fetchall()
+            }
+        finally:
+            con.close()
+
+    # ── queue ─────────────────────────────────────────────────────────────
+    def scan(self) -> int:
+        """Queue files that are new or changed since they were loaded."""
+        now = self.clock()
+        changed = 0
+        for source, paths in source_files(self.raw_dir).items():
+            for path in paths:
+                try:
+                    st = path.stat()
+                except FileNotFoundError:  # renamed away mid-scan
+                    continue
+                key = str(path)
+                sig = (st.st_size, st.st_mtime_ns)
+                queued = self.pending.get(key)
+                if sig in (
+                    self.known.get(key),
+                    self.failed.get(key),
+                    queued and (queued.size, queued.mtime_ns),
+                ):
+                    continue
+                self.pending[key] = Queued(
+                    source, path, *sig, queued.queued_at if queued else now
+                )
+                self.last_change = now
+                changed += 1
+        return changed
+
+    def due(self) -> bool:
+        if not self.pending:
+            return False
+        now = self.clock()
+        oldest = min(q.queued_at for q in self.pending.values())
+        return (
+            now - self.last_change >= self.debounce
+            or now - oldest >= self.max_delay
+            or len(self.pending) >= self.max_batch
+        )
+
+    # ── load ──────────────────────────────────────────────────────────────
+    def _load(self, con: duckdb.DuckDBPyConnection, source: str, paths: list[Path]):
+        if source == "nyt":
+            rebuild_manifest(self.raw_dir / "nyt")  # adopt artefact downloads
+            return len(sync_features(con, self.raw_dir / "nyt", self.export_dir))
+        if source == "hardcover":
+            return load_hardcover(con, paths)
+        con.create_function("isbn10_to13", isbn10_to13)
+        chunks = [str(p) for p in source_files(self.raw_dir)["goodreads"]]
+        rows, _, _ = ingest(
+            con,
+            chunks,
+            snapshot=self.snapshot,
+            manifest_file=self.goodreads_manifest,
+        )
+        return rows
+
+    def flush(self) -> dict | None:
+        """Load everything queued, one loader call per source.
+
+        Returns None, with the queue untouched, while another process holds
+        the database.
+        """
+        started = self.clock()
+        try:
+            con = duckdb.connect(str(self.db_file))
+        except duckdb.IOException as exc:
+            print(f"[warn] database busy, {len(self.pending)} files stay queued: {exc}")
+            self.totals["busy"] += 1
+            return None
+        batch = list(self.pending.values())
+        self.pending.clear()
+        loaded, counts, errors = [], {}, []
+
+        try:
+            for source in SOURCES:
+                items = [q for q in batch if q.source == source]
+                if not items:
+                    continue
+                try:
+                    counts[source] = self._load(con, source, [q.path for q in items])
+                    loaded += items
+                except Exception as exc:  # keep watching the other sources
+                    print(f"[warn] {source}: {exc}")
+                    errors.append(f"{source}: {exc}")
+                    for q in items:
+                        self.failed[str(q.path)] = (q.size, q.mtime_ns)
+            if loaded:
+                con.executemany(
+                    "INSERT OR REPLACE INTO raw_watch_files "
+                    "VALUES (?, ?, ?, ?, now()::TIMESTAMP)",
+                    [[str(q.path), q.source, q.size, q.mtime_ns] for q in loaded],
+                )
+        finally:
+            con.close()
+
+        done = self.clock()
+        for q in loaded:
+            self.known[str(q.path)] = (q.size, q.mtime_ns)
+            self.failed.pop(str(q.path), None)
+        lags = sorted(done - q.mtime_ns / 1e9 for q in loaded)
+        self.totals["batches"] += 1
+        self.totals["files"] += len(loaded)
+        self.totals["errors"] += len(errors)
+        self.last_batch = {
+            "finished_at": datetime.fromtimestamp(done, timezone.utc).isoformat(
+                timespec="seconds"
+            ),
+            "files": {s: sum(q.source == s for q in loaded) for s in SOURCES},
+            "loaded": counts,
+            "errors": errors,
+            "seconds": round(done - started, 3),
+            "lag_p50_s": round(lags[len(lags) // 2], 3) if lags else None,
+            "lag_max_s": round(lags[-1], 3) if lags else None,
+        }
+        return self.last_batch
+
+    # ── status ────────────────────────────────────────────────────────────
+    def status(self) -> dict:
+        now = self.clock()
+        oldest = min((q.mtime_ns / 1e9 for q in self.pending.values()), default=None)
+        return {
+            "queue_depth": len(self.pending),
+            "queued": {
+                s: sum(q.source == s for q in self.pending.values()) for s in SOURCES
+            },
+            "oldest_pending_s": round(now - oldest, 3) if oldest is not None else None,
+            "failed": len(self.failed),
+            "last_batch": self.last_batch,
+            **self.totals,
+        }
+
+    def write_status(self) -> None:
+        if self.status_file is None:
+            return
+        self.status_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.status_file.with_name(self.status_file.name + ".part")
+        tmp.write_text(json.dumps(self.status(), indent=2), encoding="utf-8")
+        tmp.replace(self.status_file)
+
+    def run(self, poll: float = 1.0, once: bool = False) -> None:
+        while True:
+            self.scan()
+            if self.pending and (once or self.due()):
+                b = self.flush()
+            else:
+                b = None
+            if b is not None:  # None also while the database is busy
+                files = " · ".join(f"{s} {n}" for s, n in b["files"].items() if n)
+                print(
+                    f"📥  batch {self.totals['batches']}: {files or 'nothing'} "
+                    f"in {b['seconds']:.1f}s · lag p50 {b['lag_p50_s']}s "
+                    f"max {b['lag_max_s']}s · queue {len(self.pending)}"
+                    + (f" · ⚠️ {len(b['errors'])} failed" if b["errors"] else "")
+                )
+            self.write_status()
+            if once:
+                return
+            time.sleep(poll)
+
+
+# -------------------------- main -------------------------------------------
+@profiled
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(
+        description="Watch data/raw and micro-batch new files into DuckDB"
+    )
+    ap.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    ap.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    ap.add_argument("--poll", type=float, default=1.0, help="seconds between scans")
+    ap.add_argument(
+        "--debounce", type=float, default=2.0, help="quiet seconds before a batch"
+    )
+    ap.add_argument(
+        "--max-delay",
+        type=float,
+        default=30.0,
+        help="longest a queued file waits during a steady stream",
+    )
+    ap.add_argument("--max-batch", type=int, default=1000)
+    ap.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="keep every Goodreads reload as a rating version",
+    )
+    ap.add_argument(
+        "--no-export", action="store_true", help="skip the NYT feature parquet"
+    )
+    ap.add_argument("--status-file", type=Path, default=STATUS_FILE)
+    ap.add_argument(
+        "--once", action="store_true", help="load what is pending now and exit"
+    )
+    args = ap.parse_args(argv)
+
+    watcher = RawWatcher(
+        db_file=args.duckdb,
+        raw_dir=args.raw_dir,
+        debounce=args.debounce,
+        max_delay=args.max_delay,
+        max_batch=args.max_batch,
+        snapshot=args.snapshot,
+        export_dir=None if args.no_export else DEFAULT_EXPORT_DIR,
+        status_file=args.status_file,
+    )
+    print(f"👀  watching {args.raw_dir}/{{{','.join(SOURCES)}}} (Ctrl-C to stop)")
+    try:
+        watcher.run(args.poll, once=args.once)
+    except KeyboardInterrupt:
+        print(f"\n✓ stopped after {watcher.totals['batches']} batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,27 @@ preparation, feature engineering, and modeling.
 
 High level modules
 
-gle.ingest_nyt      New York Times books list ingestion
+gle.cli                 Unified gle command line entry point
+gle.gate0_check         Gate zero data sufficiency check
+gle.ingest_nyt          New York Times books list ingestion
+gle.snapshot_manifest   Manifest of fetched New York Times snapshots
+gle.nyt_features        Incremental per ISBN New York Times features
+gle.nyt_changes         Week over week list changes with consumer watermarks
+gle.isbn                ISBN normalization helpers
+gle.normalize           Column at a time title and surname match keys
+gle.work_index          ISBN to work id edition clustering
+gle.rating_history      Versioned Goodreads ratings stored as changed rows
+gle.catalogue           Memory mapped Arrow export of the Goodreads catalogue
+gle.probe_schedule      Priority order of Hardcover probes under a budget
+gle.checkpoint          Crash safe progress journal for long running jobs
+gle.ratelimit           Cross process API quota shared per key
+gle.standin             Local record and replay stand in for the external APIs
+gle.lookup              ISBN lookup service over a read only snapshot
+gle.joined_export       Week partitioned Parquet export of the joined sources
+gle.query_cache         Table version aware cache of read query results
+gle.resources           DuckDB resource profiles and memory reporting
+gle.profiling           Sampled stacks and DuckDB plans of --profile runs
+gle.scoring             Batch and single ISBN green light scoring
 """
 
 from importlib.metadata import PackageNotFoundError, version
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import duckdb
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.normalize import install_macros
+from gle.profiling import profiled
+from gle.snapshot_manifest import sha256_file
+
+DEFAULT_MANIFEST_PATH = Path("data/processed/goodreads/ingest_manifest.json")
+DEFAULT_CATALOGUE_PATH = Path("data/processed/goodreads/catalogue.arrow")
+
+VERSION_KEY = b"goodreads_version"
+
+GOODREADS_VERSION_SQL = """
+select v.version, v.bumped_at, (select count(*) from goodreads)
+from table_versions v
+where v.table_name = 'goodreads'
+"""
+
+CATALOGUE_SQL = """
+select
+    book_id,
+    isbn13,
+    title,
+    authors,
+    series,
+    average_rating,
+    ratings_count,
+    {title_key}  as title_key,
+    {author_key} as author_key
+from goodreads
+order by isbn13
+"""
+
+
+@dataclass(frozen=True)
+class IngestManifest:
+    """
+    What a Goodreads ingest loaded.
+
+    version is derived from the chunk file names and checksums, so loading
+    the same files again keeps the version. It only describes the files, the
+    exported catalogue follows goodreads_version instead.
+    """
+
+    version: str
+    rows: int
+    loaded_at: str
+    files: List[Dict]
+
+
+def write_ingest_manifest(
+    files: Iterable[Path],
+    rows: int,
+    path: Path = DEFAULT_MANIFEST_PATH,
+) -> IngestManifest:
+    entries = [
+        {"name": p.name, "size": p.stat().st_size, "sha256": sha256_file(p)}
+        for p in sorted(map(Path, files))
+    ]
+    digest = hashlib.sha256(json.dumps(entries, sort_keys=True).encode("utf-8"))
+    manifest = IngestManifest(
+        version=digest.hexdigest()[:16],
+        rows=rows,
+        loaded_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        files=entries,
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".part")
+    tmp.write_text(json.dumps(asdict(manifest), indent=2), encoding="utf-8")
+    tmp.replace(path)
+    return manifest
+
+
+def read_ingest_manifest(
+    path: Path = DEFAULT_MANIFEST_PATH,
+) -> Optional[IngestManifest]:
+    if not path.exists():
+        return None
+    return IngestManifest(**json.loads(path.read_text(encoding="utf-8")))
+
+
+def _table_exists(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return (
+        con.execute(
+            "select 1 from information_schema.tables where table_name = ?", [name]
+        ).fetchone()
+        is not None
+    )
+
+
+def goodreads_version(con: duckdb.DuckDBPyConnection) -> Optional[str]:
+    """
+    Version of the goodreads table as it is in DuckDB now.
+
+    Built from its table_versions entry, which the ingest and every later
+    writer such as the fuzzy matcher bump, plus its row count in case a
+    writer forgot to. None until a loader has bumped the table.
+    """
+
+    if not (_table_exists(con, "table_versions") and _table_exists(con, "goodreads")):
+        return None
+    row = con.execute(GOODREADS_VERSION_SQL).fetchone()
+    if row is None:
+        return None
+    version, bumped_at, rows = row
+    digest = hashlib.sha256(f"{version}|{bumped_at.isoformat()}|{rows}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _current_version(duckdb_path: Path) -> Optional[str]:
+    con = duckdb.connect(str(duckdb_path), read_only=True)
+    try:
+        return goodreads_version(con)
+    finally:
+        con.close()
+
+
+def _key_exprs(con: duckdb.DuckDBPyConnection) -> Dict[str, str]:
+    columns = {
+        row[0]
+        for row in con.execute(
+            "select column_name from information_schema.columns "
+            "where table_name = 'goodreads'"
+        ).fetchall()
+    }
+    if {"title_key", "author_key"} <= columns:
+        return {"title_key": "title_key", "author_key": "author_key"}
+    install_macros(con)
+    return {"title_key": "title_key(title)", "author_key": "surname_key(authors)"}
+
+
+def export_catalogue(
+    con: duckdb.DuckDBPyConnection,
+    version: str,
+    path: Path = DEFAULT_CATALOGUE_PATH,
+) -> int:
+    """
+    Write the goodreads table as an uncompressed Arrow IPC file.
+
+    Rows are sorted by isbn13 and streamed batch by batch, so the export
+    never holds the whole catalogue in memory. The goodreads version it was
+    read at is stored in the schema metadata. Returns the number of rows
+    written.
+    """
+
+    import pyarrow as pa
+
+    reader = con.execute(CATALOGUE_SQL.format(**_key_exprs(con))).fetch_record_batch()
+    schema = reader.schema.with_metadata({VERSION_KEY: version.encode()})
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".part")
+    rows = 0
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    tmp.replace(path)
+    return rows
+
+
+def catalogue_version(path: Path = DEFAULT_CATALOGUE_PATH) -> Optional[str]:
+    import pyarrow as pa
+
+    if not path.exists():
+        return None
+    with pa.memory_map(str(path), "r") as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    value = metadata.get(VERSION_KEY)
+    return value.decode() if value else None
+
+
+def open_catalogue(
+    path: Path = DEFAULT_CATALOGUE_PATH,
+    duckdb_path: Optional[Path] = DEFAULT_DUCKDB_PATH,
+):
+    """
+    Map the exported catalogue as a pyarrow Table without copying it.
+
+    Every buffer points into the memory mapped file, so any number of
+    processes share one copy in the page cache. Raises RuntimeError when the
+    goodreads table changed since the export, which takes a short read only
+    connection to duckdb_path. Pass duckdb_path=None to skip that check.
+    """
+
+    import pyarrow as pa
+
+    if duckdb_path is not None:
+        found = catalogue_version(path)
+        current = _current_version(duckdb_path)
+        if current is None or found != current:
+            raise RuntimeError(
+                f"{path} is stale (catalogue {found}, goodreads {current}); "
+                "run `gle catalogue export`"
+            )
+
+    source = pa.memory_map(str(path), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Shared memory mapped Arrow copy of the Goodreads catalogue."
+    )
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    parser.add_argument("--path", type=Path, default=DEFAULT_CATALOGUE_PATH)
+    actions = parser.add_subparsers(dest="action", required=True)
+    export = actions.add_parser("export", help="Export when missing or stale")
+    export.add_argument(
+        "--force", action="store_true", help="Export even when the version matches"
+    )
+    actions.add_parser("check", help="Exit 1 when the export is missing or stale")
+    args = parser.parse_args(argv)
+
+    current = _current_version(args.duckdb)
+    if current is None:
+        raise SystemExit(f"No goodreads table in {args.duckdb}, run `gle goodreads`")
+    found = catalogue_version(args.path)
+
+    if args.action == "check":
+        fresh = found == current
+        print(f"{args.path}: {'fresh' if fresh else 'stale'} ({found} vs {current})")
+        raise SystemExit(0 if fresh else 1)
+
+    if found == current and not args.force:
+        print(f"{args.path} already at goodreads {current}")
+        return
+    con = duckdb.connect(str(args.duckdb), read_only=True)
+    try:
+        # read again in the export's own connection, a writer may have run
+        version = goodreads_version(con)
+        rows = export_catalogue(con, version, args.path)
+    finally:
+        con.close()
+    print(f"Exported {rows:,} rows to {args.path} (goodreads {version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_CHECKPOINT_DIR = Path("data/interim/checkpoints")
+
+
+def _jsonable(value):
+    # numpy and pandas scalars from DataFrame rows
+    if type(value).__name__ == "NAType":
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def checkpoint_path(job: str, directory: Path = DEFAULT_CHECKPOINT_DIR) -> Path:
+    return directory / f"{job}.jsonl"
+
+
+class Journal:
+    """
+    Append only progress journal of a long running job.
+
+    The first line holds the job name and the options it was started with,
+    every further line one batch: the keys finished since the previous
+    batch, the results they produced, the counters so far and the last key.
+    Lines are flushed and fsynced as they are written, and a torn last
+    line from a crash is dropped on load, so the journal always describes
+    a prefix of the work that really finished.
+
+    Keys mark units of work, results are lists of JSON values per name
+    (for instance "matches"). finish removes the journal once the job has
+    stored its output.
+    """
+
+    def __init__(
+        self,
+        job: str,
+        options: Dict,
+        path: Optional[Path] = None,
+        resume: bool = False,
+        batch_size: int = 100,
+    ) -> None:
+        self.job = job
+        self.options = json.loads(json.dumps(options, default=_jsonable))
+        self.path = path or checkpoint_path(job)
+        self.batch_size = max(batch_size, 1)
+
+        self.done: set = set()
+        self.results: Dict[str, List] = {}
+        self.counters: Dict[str, int] = {}
+        self.marks: set = set()
+        self.last: Optional[str] = None
+        self.resumed = False
+
+        self._keys: List[str] = []
+        self._results: Dict[str, List] = {}
+        self._marks: List[str] = []
+
+        if resume and self.path.exists():
+            self._load()
+        else:
+            self._start()
+
+    # ── file handling ──────────────────────────────────────────────
+    def _start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        header = {"job": self.job, "options": self.options}
+        tmp = self.path.with_name(self.path.name + ".part")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps(header) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        tmp.replace(self.path)
+
+    def _load(self) -> None:
+        raw = self.path.read_bytes()
+        entries = []
+        good = 0
+        for line in raw.split(b"\n")[:-1]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+            good += len(line) + 1
+        if good < len(raw):
+            with open(self.path, "r+b") as fh:
+                fh.truncate(good)
+
+        if not entries:
+            self._start()
+            return
+        header = entries[0]
+        if header.get("job") != self.job or header.get("options") != self.options:
+            raise RuntimeError(
+                f"Checkpoint {self.path} was written by {header.get('job')} with "
+                f"options {header.get('options')}, not {self.options}; "
+                "rerun with the same options or without --resume"
+            )
+        for batch in entries[1:]:
+            self.done.update(batch.get("keys", []))
+            for name, values in batch.get("results", {}).items():
+                self.results.setdefault(name, []).extend(values)
+            self.counters = batch.get("counters", self.counters)
+            self.marks.update(batch.get("marks", []))
+            self.last = batch.get("last", self.last)
+        self.resumed = True
+
+    # ── recording ──────────────────────────────────────────────────
+    def __contains__(self, key: str) -> bool:
+        return key in self.done
+
+    def items(self, name: str) -> List:
+        """
+        All results recorded under name, including those of earlier runs.
+        """
+
+        return self.results.setdefault(name, [])
+
+    def record(
+        self,
+        key: str,
+        counters: Optional[Dict[str, int]] = None,
+        **results: Iterable,
+    ) -> None:
+        """
+        Mark key finished together with its results and counter increments.
+
+        The batch reaches the disk once batch_size keys are pending.
+        """
+
+        for name, values in results.items():
+            values = list(values)
+            self.items(name).extend(values)
+            self._results.setdefault(name, []).extend(values)
+        for name, n in (counters or {}).items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        self.done.add(key)
+        self.last = key
+        self._keys.append(key)
+        if len(self._keys) >= self.batch_size:
+            self.flush()
+
+    def mark(self, name: str, **results: Iterable) -> None:
+        """
+        Record that a whole phase finished, and write it out at once.
+        """
+
+        for key, values in results.items():
+            values = list(values)
+            self.items(key).extend(values)
+            self._results.setdefault(key, []).extend(values)
+        self.marks.add(name)
+        self._marks.append(name)
+        self.flush()
+
+    def flush(self) -> None:
+        if not (self._keys or self._results or self._marks):
+            return
+        batch = {
+            "keys": self._keys,
+            "results": self._results,
+            "counters": self.counters,
+            "marks": self._marks,
+            "last": self.last,
+        }
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(batch, default=_jsonable) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._keys, self._results, self._marks = [], {}, []
+
+    def finish(self) -> None:
+        """
+        Drop the journal after the job stored its output.
+        """
+
+        self._keys, self._results, self._marks = [], {}, []
+        self.path.unlink(missing_ok=True)
+
+    def describe(self) -> str:
+        if not self.resumed:
+            return f"checkpointing to {self.path}"
+        return f"resuming {self.path}: {len(self.done)} done, last {self.last}"
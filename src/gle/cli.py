@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from gle import __version__
+from gle.profiling import Profiler, add_profile_arguments
+
+
+@dataclass(frozen=True)
+class Command:
+    """
+    One gle subcommand.
+
+    The target is a dotted module path and a function name separated by a
+    colon. The module is imported only when the subcommand is invoked, so
+    heavy dependencies such as pandas, rapidfuzz or prefect are never loaded
+    by gle help or by unrelated subcommands.
+    """
+
+    name: str
+    target: str
+    help: str
+
+    def load(self) -> Callable[[Optional[list[str]]], object]:
+        module_name, _, attr = self.target.partition(":")
+        module = importlib.import_module(module_name)
+        return getattr(module, attr)
+
+
+COMMANDS: tuple[Command, ...] = (
+    Command("gate0", "gle.gate0_check:main", "Gate zero data sufficiency check"),
+    Command("nyt", "flows.nyt_ingest:main", "Fetch New York Times weekly snapshots"),
+    Command(
+        "nyt-flow",
+        "flows.nytimes_flow:main",
+        "Run the Prefect flow for the latest New York Times snapshot",
+    ),
+    Command(
+        "nyt-features",
+        "gle.nyt_features:main",
+        "Update the per ISBN New York Times feature table",
+    ),
+    Command(
+        "nyt-changes",
+        "gle.nyt_changes:main",
+        "Show or acknowledge week over week New York Times list changes",
+    ),
+    Command(
+        "work-index",
+        "gle.work_index:main",
+        "Cluster edition ISBNs into works for exact joins",
+    ),
+    Command(
+        "score",
+        "gle.scoring:main",
+        "Build the feature matrix and score ISBNs",
+    ),
+    Command(
+        "goodreads",
+        "flows.goodreads_ingest:main",
+        "Load the Goodreads book chunk files into DuckDB",
+    ),
+    Command(
+        "watch",
+        "flows.raw_watch:main",
+        "Watch data/raw and micro-batch new NYT, Hardcover and Goodreads files",
+    ),
+    Command(
+        "rating-history",
+        "gle.rating_history:main",
+        "Record, read as of and diff versioned Goodreads ratings",
+    ),
+    Command(
+        "catalogue",
+        "gle.catalogue:main",
+        "Export or check the shared Arrow copy of the Goodreads catalogue",
+    ),
+    Command(
+        "lookup",
+        "gle.lookup:main",
+        "Build, query, serve or load test the read only ISBN lookup snapshot",
+    ),
+    Command(
+        "export-joined",
+        "gle.joined_export:main",
+        "Write the joined NYT, Goodreads and Hardcover rows as week partitioned Parquet",
+    ),
+    Command(
+        "query-cache",
+        "gle.query_cache:main",
+        "Run read queries through the table version aware result cache",
+    ),
+    Command(
+        "hardcover",
+        "flows.hardcover_client:main",
+        "Fetch Hardcover metadata for one ISBN",
+    ),
+    Command(
+        "hardcover-probe",
+        "flows.hardcover_probe:main",
+        "Look up New York Times ISBNs on Hardcover",
+    ),
+    Command(
+        "probe-schedule",
+        "gle.probe_schedule:main",
+        "Show which ISBNs the next Hardcover probe will spend its budget on",
+    ),
+    Command(
+        "fuzzy",
+        "flows.fuzzy_nyt_gr:main",
+        "Match unmatched New York Times titles to Goodreads",
+    ),
+    Command(
+        "fuzzy-tune",
+        "flows.fuzzy_tune:main",
+        "Sweep fuzzy matcher thresholds against a gold set (dry run)",
+    ),
+    Command(
+        "standin",
+        "gle.standin:main",
+        "Local record and replay stand in for the NYT and Hardcover APIs",
+    ),
+    Command(
+        "ratelimit",
+        "gle.ratelimit:main",
+        "Show or reset the shared NYT and Hardcover rate limiter state",
+    ),
+)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the top level parser.
+
+    Subcommand parsers carry no options of their own. Everything after the
+    subcommand name is forwarded untouched to the target main function,
+    which owns its argument parsing, including its own help output. The
+    --profile options go before the subcommand, gle --profile fuzzy, or
+    after it, where every target accepts them as well.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="gle",
+        description="Green Light Engine command line interface.",
+    )
+    parser.add_argument(
+        "--version", action="version", version=f"%(prog)s {__version__}"
+    )
+    add_profile_arguments(parser)
+
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for command in COMMANDS:
+        subparsers.add_parser(command.name, help=command.help, add_help=False)
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+
+    command = next(c for c in COMMANDS if c.name == args.command)
+    if argv is None:
+        # Targets build their own parsers, so let their usage lines read gle <name>
+        sys.argv[0] = f"{parser.prog} {command.name}"
+    target = command.load()
+    if args.profile:
+        with Profiler(command.name, args.profile_dir, args.profile_interval):
+            result = target(rest)
+    else:
+        result = target(rest)
+
+    if isinstance(result, int):
+        sys.exit(result)
+
+
+if __name__ == "__main__":
+    main()
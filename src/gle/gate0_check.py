@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import argparse
+import sqlite3
 import sys
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -7,6 +9,10 @@ from typing import Optional
 
 import duckdb
 
+from gle.profiling import profiled
+from gle.query_cache import DEFAULT_CACHE_DIR, QueryCache
+from gle.snapshot_manifest import snapshot_paths
+
 DEFAULT_NYT_RAW_DIR = Path("data/raw/nyt")
 DEFAULT_DUCKDB_PATH = Path("data/green_light.duckdb")
 
@@ -78,25 +84,21 @@ class Gate0Config:
     duckdb_path: Path = DEFAULT_DUCKDB_PATH
     sample_size: int = 1000
     thresholds: Gate0Thresholds = field(default_factory=Gate0Thresholds)
+    cache_dir: Optional[Path] = None
 
 
 def _count_nyt_weeks(nyt_raw_dir: Path) -> int:
     """
-    Count how many snapshot files exist in the given directory.
+    Count how many distinct weekly snapshots exist in the given directory.
 
-    Files are expected to be named with an iso date such as
-    YYYY minus MM minus DD dot json. Copies or variants with
-    extra text in the stem will be counted as separate entries.
+    The snapshot manifest is used when present, counting only dates whose
+    file is still on disk with the recorded size. Directories without a
+    manifest fall back to files named with an iso date such as
+    YYYY minus MM minus DD dot json, so copies or variants with extra text
+    in the stem are not counted.
     """
 
-    if not nyt_raw_dir.exists():
-        return 0
-
-    weeks = set()
-    for path in nyt_raw_dir.glob("*.json"):
-        weeks.add(path.stem)
-
-    return len(weeks)
+    return len({path.stem for path in snapshot_paths(nyt_raw_dir)})
 
 
 def _connect_duckdb(db_path: Path) -> Optional[duckdb.DuckDBPyConnection]:
@@ -121,8 +123,40 @@ def _connect_duckdb(db_path: Path) -> Optional[duckdb.DuckDBPyConnection]:
         return None
 
 
+def _open_cache(
+    con: duckdb.DuckDBPyConnection, cache_dir: Optional[Path]
+) -> Optional[QueryCache]:
+    """
+    Result cache for the gate queries, or None to run them directly.
+
+    A cache directory or index that cannot be opened only costs the reuse,
+    the gate still runs.
+    """
+
+    if cache_dir is None:
+        return None
+    try:
+        return QueryCache(con, cache_dir)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+def _fetchone(
+    con: duckdb.DuckDBPyConnection, sql: str, cache: Optional[QueryCache]
+) -> Optional[tuple]:
+    """
+    First row of an aggregate query, through the result cache when given.
+    """
+
+    if cache is None:
+        return con.execute(sql).fetchone()
+    rows = cache.fetchall(sql)
+    return rows[0] if rows else None
+
+
 def _goodreads_coverage(
     con: duckdb.DuckDBPyConnection,
+    cache: Optional[QueryCache] = None,
 ) -> tuple[Optional[float], Optional[float]]:
     """
     Compute coverage for publication_year and series columns in table goodreads.
@@ -138,16 +172,17 @@ def _goodreads_coverage(
         if con.fetchone() is None:
             return None, None
 
-        con.execute(
+        total, year_non_null, series_non_null = _fetchone(
+            con,
             """
             select
                 count(*) as total,
                 sum(publication_year is not null) as year_non_null,
                 sum(series is not null) as series_non_null
             from goodreads
-            """
+            """,
+            cache,
         )
-        total, year_non_null, series_non_null = con.fetchone()
         if total == 0:
             return None, None
 
@@ -161,11 +196,14 @@ def _goodreads_coverage(
 def _join_rate(
     con: duckdb.DuckDBPyConnection,
     sample_size: int,
+    cache: Optional[QueryCache] = None,
 ) -> Optional[float]:
     """
     Estimate join rate between New York Times and Goodreads on isbn13.
 
     The function expects tables nyt_titles and goodreads or nyt_raw and goodreads.
+    When the isbn_work edition index exists, an isbn also counts as joined
+    if another edition of the same work is in goodreads.
     It returns None if required tables or columns are missing.
     """
 
@@ -174,16 +212,27 @@ def _join_rate(
             """
             select table_name
             from information_schema.tables
-            where table_name in ('nyt_titles', 'nyt_raw')
+            where table_name in ('nyt_titles', 'nyt_raw', 'isbn_work')
             """
         )
         rows = [r[0] for r in con.fetchall()]
-        if not rows:
+        if "nyt_titles" not in rows and "nyt_raw" not in rows:
             return None
 
         nyt_table = "nyt_titles" if "nyt_titles" in rows else "nyt_raw"
 
-        con.execute(
+        work_join = ""
+        if "isbn_work" in rows:
+            work_join = """
+                or s.isbn13 in (
+                    select wn.isbn13
+                    from isbn_work wn
+                    join isbn_work wg on wg.work_id = wn.work_id
+                    join goodreads gw on gw.isbn13 = wg.isbn13
+                )"""
+
+        sample_count, joined = _fetchone(
+            con,
             f"""
             with sample as (
                 select distinct isbn13
@@ -193,12 +242,14 @@ def _join_rate(
             )
             select
                 count(*) as sample_size,
-                sum(case when g.isbn13 is not null then 1 else 0 end) as joined
+                sum(
+                    case when g.isbn13 is not null {work_join} then 1 else 0 end
+                ) as joined
             from sample s
-            left join goodreads g using (isbn13)
-            """
+            left join goodreads g on g.isbn13 = s.isbn13
+            """,
+            cache,
         )
-        sample_count, joined = con.fetchone()
         if sample_count == 0:
             return None
 
@@ -224,8 +275,9 @@ def measure_gate0(config: Gate0Config) -> Gate0Metrics:
         series_cov = None
         join_rate = None
     else:
-        year_cov, series_cov = _goodreads_coverage(con)
-        join_rate = _join_rate(con, config.sample_size)
+        cache = _open_cache(con, config.cache_dir)
+        year_cov, series_cov = _goodreads_coverage(con, cache)
+        join_rate = _join_rate(con, config.sample_size, cache)
         con.close()
 
     return Gate0Metrics(
@@ -281,8 +333,47 @@ def print_report(metrics: Gate0Metrics) -> None:
     print(f"Gate zero overall pass      {metrics.overall_pass()}")
 
 
-def main() -> None:
-    config = Gate0Config()
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Gate zero data sufficiency check.")
+    parser.add_argument(
+        "--nyt-raw-dir",
+        type=Path,
+        default=DEFAULT_NYT_RAW_DIR,
+        help=f"Directory with weekly snapshots (default {DEFAULT_NYT_RAW_DIR})",
+    )
+    parser.add_argument(
+        "--duckdb",
+        type=Path,
+        default=DEFAULT_DUCKDB_PATH,
+        help=f"DuckDB database file (default {DEFAULT_DUCKDB_PATH})",
+    )
+    parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=1000,
+        help="Number of distinct NYT isbn13 values sampled for the join rate",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help="Reuse query results while the tables they read are unchanged",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always run the queries"
+    )
+    return parser
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    config = Gate0Config(
+        nyt_raw_dir=args.nyt_raw_dir,
+        duckdb_path=args.duckdb,
+        sample_size=args.sample_size,
+        cache_dir=None if args.no_cache else args.cache_dir,
+    )
     metrics = measure_gate0(config)
     print_report(metrics)
 
@@ -1,25 +1,39 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Iterable, Optional
 
 import requests
 
+from gle.ratelimit import limiter_for
+from gle.snapshot_manifest import SnapshotManifest
+
 DEFAULT_RAW_DIR = Path("data/raw/nyt")
+DEFAULT_BASE_URL = "https://api.nytimes.com/svc/books/v3"
+BASE_URL_ENV = "NYT_BASE_URL"
+
+
+def _default_base_url() -> str:
+    return os.getenv(BASE_URL_ENV) or DEFAULT_BASE_URL
 
 
 @dataclass(frozen=True)
 class NytIngestConfig:
     """
     Configuration for New York Times full overview ingestion.
+
+    base_url defaults to the NYT_BASE_URL environment variable and then the
+    public API, so runs can be pointed at a local stand in server.
     """
 
     api_key: str
     raw_dir: Path = DEFAULT_RAW_DIR
     timeout_seconds: float = 15.0
+    base_url: str = field(default_factory=_default_base_url)
 
 
 def ensure_raw_dir(path: Path) -> Path:
@@ -65,6 +79,18 @@ def iter_mondays(start_iso: str, end_iso: str) -> Iterable[str]:
         current = current + timedelta(days=7)
 
 
+def _get_overview(config: NytIngestConfig, monday_iso: str) -> requests.Response:
+    url = f"{config.base_url.rstrip('/')}/lists/full-overview.json"
+    params = {"api-key": config.api_key, "published_date": monday_iso}
+
+    # one quota per api key across every process, see gle.ratelimit
+    response = limiter_for("nyt", config.api_key).call(
+        lambda: requests.get(url, params=params, timeout=config.timeout_seconds)
+    )
+    response.raise_for_status()
+    return response
+
+
 def fetch_one_overview(config: NytIngestConfig, monday_iso: str) -> Dict:
     """
     Fetch the New York Times full overview for a given monday.
@@ -72,45 +98,61 @@ def fetch_one_overview(config: NytIngestConfig, monday_iso: str) -> Dict:
     Raises requests.HTTPError if the remote endpoint returns an error.
     """
 
-    url = (
-        "https://api.nytimes.com/svc/books/v3/lists/full-overview.json"
-        f"?api-key={config.api_key}&published_date={monday_iso}"
-    )
-
-    response = requests.get(url, timeout=config.timeout_seconds)
-    response.raise_for_status()
-    return response.json()
+    return _get_overview(config, monday_iso).json()
 
 
 def save_snapshot(payload: Dict, monday_iso: str, raw_dir: Path) -> Path:
     """
     Save a single snapshot payload to disk under the given directory.
 
-    The file is named YYYY minus MM minus DD dot json.
+    The file is named YYYY minus MM minus DD dot json. It is written to a
+    temporary name first and then renamed, so a crash never leaves a
+    truncated snapshot under the final name.
     """
 
     ensure_raw_dir(raw_dir)
     output_path = raw_dir / f"{monday_iso}.json"
-    output_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    tmp_path = output_path.with_name(output_path.name + ".part")
+    tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    tmp_path.replace(output_path)
     return output_path
 
 
-def ingest_range(config: NytIngestConfig, start_iso: str, end_iso: str) -> None:
+def ingest_range(
+    config: NytIngestConfig,
+    start_iso: str,
+    end_iso: str,
+    force: bool = False,
+) -> None:
     """
     Fetch one snapshot per monday from start_iso to end_iso inclusive
     and write each payload to disk.
+
+    Weeks that already have an intact snapshot in the manifest are skipped
+    unless force is set, so an interrupted range can simply be run again.
+    Every saved snapshot is recorded in the manifest with its size,
+    checksum, fetch time and http status.
     """
 
+    manifest = SnapshotManifest(config.raw_dir)
+
     for monday_iso in iter_mondays(start_iso, end_iso):
+        if not force and manifest.is_valid(monday_iso):
+            print(f"Skipping {monday_iso}, snapshot already in manifest")
+            continue
+
         print(f"Fetching New York Times snapshot for {monday_iso}")
-        payload = fetch_one_overview(config, monday_iso)
-        output_path = save_snapshot(payload, monday_iso, config.raw_dir)
+        response = _get_overview(config, monday_iso)
+        output_path = save_snapshot(response.json(), monday_iso, config.raw_dir)
+        manifest.record_file(monday_iso, output_path, response.status_code)
         print(f"Saved snapshot to {output_path}")
 
 
-def ingest_one_monday(config: NytIngestConfig, monday_iso: str) -> None:
+def ingest_one_monday(
+    config: NytIngestConfig, monday_iso: str, force: bool = False
+) -> None:
     """
     Convenience wrapper to fetch one monday only.
     """
 
-    ingest_range(config, monday_iso, monday_iso)
+    ingest_range(config, monday_iso, monday_iso, force=force)
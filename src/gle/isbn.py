@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+_NON_ISBN = re.compile(r"[^0-9Xx]")
+
+
+def isbn10_to13(isbn10: Optional[str]) -> Optional[str]:
+    """
+    Convert an isbn10 to its 978 prefixed isbn13, or None if malformed.
+    """
+
+    if not isbn10:
+        return None
+    d = _NON_ISBN.sub("", isbn10)
+    if len(d) != 10:
+        return None
+    body = "978" + d[:9]
+    chk = (10 - sum((1, 3)[i & 1] * int(x) for i, x in enumerate(body)) % 10) % 10
+    return body + str(chk)
+
+
+def normalize_isbn(value: Optional[str]) -> Optional[str]:
+    """
+    Return an isbn13 for any isbn10 or isbn13 spelling, or None.
+
+    Hyphens and spaces are ignored. The isbn13 check digit is not verified,
+    matching how the Goodreads ingest treats thirteen digit values.
+    """
+
+    if not value:
+        return None
+    digits = _NON_ISBN.sub("", value)
+    if len(digits) == 13 and digits.isdigit():
+        return digits
+    if len(digits) == 10:
+        return isbn10_to13(digits)
+    return None
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import duckdb
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.lookup import DEFAULT_HARDCOVER_DIR, hardcover_source
+from gle.profiling import profiled
+
+DEFAULT_EXPORT_DIR = Path("data/processed/joined")
+STATE_NAME = "_export.json"
+DEFAULT_ROW_GROUP_SIZE = 100_000
+BLOOM_FALSE_POSITIVE_RATIO = 0.01
+
+# Every list appearance with the NYT features as of that week, the
+# Goodreads rating and the Hardcover metadata of the same isbn13.
+JOINED_SQL = """
+create or replace temp view joined_export as
+with gr as (
+    select isbn13, book_id, average_rating, ratings_count
+    from {goodreads}
+    where isbn13 is not null
+    qualify row_number() over (
+        partition by isbn13 order by ratings_count desc nulls last, book_id
+    ) = 1
+),
+hc as (
+    select * from {hardcover}
+)
+select
+    a.week,
+    a.isbn13,
+    a.list_name,
+    a.rank,
+    a.title,
+    a.author,
+    f.weeks_on_list              as nyt_weeks_on_list,
+    f.peak_rank                  as nyt_peak_rank,
+    f.list_count                 as nyt_list_count,
+    gr.book_id                   as goodreads_book_id,
+    gr.average_rating::double    as goodreads_average_rating,
+    gr.ratings_count             as goodreads_ratings_count,
+    hc.id                        as hardcover_id,
+    hc.rating::double            as hardcover_rating,
+    hc.ratings_count             as hardcover_ratings_count,
+    hc.publication_date          as hardcover_publication_date
+from nyt_appearances a
+left join {nyt_features} f on f.isbn13 = a.isbn13 and f.as_of = a.week
+left join gr on gr.isbn13 = a.isbn13
+left join hc on hc.isbn13 = a.isbn13
+"""
+
+# Order independent digest of each week's rows; a partition is touched
+# when its digest or row count differs from the last export.
+FINGERPRINT_SQL = """
+select strftime(week, '%Y-%m-%d') as week, count(*) as rows,
+       bit_xor(hash(j))::varchar as fingerprint
+from joined_export j
+group by week
+order by week
+"""
+
+GOODREADS_FALLBACK = (
+    "(select null::varchar as isbn13, null::integer as book_id, "
+    "null::double as average_rating, null::integer as ratings_count where false)"
+)
+NYT_FEATURES_FALLBACK = (
+    "(select null::varchar as isbn13, null::date as as_of, "
+    "null::integer as weeks_on_list, null::integer as peak_rank, "
+    "null::integer as list_count where false)"
+)
+
+
+@dataclass(frozen=True)
+class ExportResult:
+    written: List[str]
+    removed: List[str]
+    unchanged: int
+    rows: int
+
+
+def _table_exists(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return (
+        con.execute(
+            "select 1 from information_schema.tables where table_name = ?", [name]
+        ).fetchone()
+        is not None
+    )
+
+
+def partition_dir(out_dir: Path, week_iso: str) -> Path:
+    return out_dir / f"week={week_iso}"
+
+
+def read_state(out_dir: Path = DEFAULT_EXPORT_DIR) -> Dict[str, Dict]:
+    path = out_dir / STATE_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))["weeks"]
+
+
+def _write_state(out_dir: Path, weeks: Dict[str, Dict]) -> None:
+    path = out_dir / STATE_NAME
+    tmp = path.with_name(STATE_NAME + ".part")
+    tmp.write_text(json.dumps({"weeks": weeks}, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _write_partition(
+    con: duckdb.DuckDBPyConnection,
+    out_dir: Path,
+    week_iso: str,
+    row_group_size: int,
+) -> None:
+    target = partition_dir(out_dir, week_iso)
+    tmp = target.with_name(target.name + ".part")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    path = str(tmp / "data.parquet").replace("'", "''")
+    # the dictionary limit keeps isbn13 dictionary encoded, which is what
+    # makes DuckDB write a bloom filter for it in every row group
+    con.execute(
+        f"""
+        copy (
+            select * exclude (week)
+            from joined_export
+            where week = '{week_iso}'::date
+            order by isbn13, list_name
+        ) to '{path}' (
+            format parquet,
+            compression zstd,
+            row_group_size {int(row_group_size)},
+            dictionary_size_limit {int(row_group_size) * 2},
+            bloom_filter_false_positive_ratio {BLOOM_FALSE_POSITIVE_RATIO}
+        )
+        """
+    )
+    shutil.rmtree(target, ignore_errors=True)
+    tmp.rename(target)
+
+
+def export_joined(
+    con: duckdb.DuckDBPyConnection,
+    out_dir: Path = DEFAULT_EXPORT_DIR,
+    hardcover_dir: Path = DEFAULT_HARDCOVER_DIR,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    force: bool = False,
+) -> ExportResult:
+    """
+    Write one Parquet partition per list week, only where the data changed.
+
+    Partitions are hive style week=YYYY-MM-DD directories sorted by
+    isbn13, so row group min/max statistics and the isbn13 bloom filters
+    let point lookups skip most files and week filters prune directories.
+    A digest of every week's joined rows is kept in _export.json; weeks
+    whose digest is unchanged are left alone and weeks that no longer
+    exist are removed. Every partition is written next to the old one and
+    swapped in.
+    """
+
+    if not _table_exists(con, "nyt_appearances"):
+        raise RuntimeError("No nyt_appearances table, run `gle nyt-features sync`")
+
+    con.execute(
+        JOINED_SQL.format(
+            goodreads=(
+                "goodreads" if _table_exists(con, "goodreads") else GOODREADS_FALLBACK
+            ),
+            nyt_features=(
+                "nyt_isbn_features"
+                if _table_exists(con, "nyt_isbn_features")
+                else NYT_FEATURES_FALLBACK
+            ),
+            hardcover=hardcover_source(hardcover_dir),
+        )
+    )
+    current = {
+        week: {"rows": rows, "fingerprint": fingerprint}
+        for week, rows, fingerprint in con.execute(FINGERPRINT_SQL).fetchall()
+    }
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    previous = {} if force else read_state(out_dir)
+    state = {w: v for w, v in read_state(out_dir).items() if w in current}
+
+    written = []
+    for week, info in current.items():
+        old = previous.get(week)
+        exists = partition_dir(out_dir, week).exists()
+        if (
+            old
+            and exists
+            and (old["rows"], old["fingerprint"]) == (info["rows"], info["fingerprint"])
+        ):
+            continue
+        _write_partition(con, out_dir, week, row_group_size)
+        stamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        state[week] = {**info, "exported_at": stamp}
+        written.append(week)
+        _write_state(out_dir, state)
+
+    removed = []
+    for path in sorted(out_dir.glob("week=*")):
+        week = path.name.split("=", 1)[1]
+        if week not in current:
+            shutil.rmtree(path)
+            removed.append(week)
+    _write_state(out_dir, state)
+
+    return ExportResult(
+        written=written,
+        removed=removed,
+        unchanged=len(current) - len(written),
+        rows=sum(v["rows"] for v in current.values()),
+    )
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Partitioned Parquet export of NYT x Goodreads x Hardcover."
+    )
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_EXPORT_DIR)
+    parser.add_argument("--hardcover-dir", type=Path, default=DEFAULT_HARDCOVER_DIR)
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--force", action="store_true", help="Rewrite every partition")
+    args = parser.parse_args(argv)
+
+    con = duckdb.connect(str(args.duckdb), read_only=True)
+    try:
+        result = export_joined(
+            con, args.out_dir, args.hardcover_dir, args.row_group_size, args.force
+        )
+    finally:
+        con.close()
+    print(
+        f"Wrote {len(result.written)} week partitions, kept {result.unchanged}, "
+        f"removed {len(result.removed)} ({result.rows:,} rows in {args.out_dir})"
+    )
+    for week in result.written:
+        print(f"  wrote week={week}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,768 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+
+import duckdb
+import numpy as np
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.isbn import normalize_isbn
+from gle.profiling import profiled
+
+DEFAULT_SNAPSHOT_DIR = Path("data/processed/lookup")
+DEFAULT_HARDCOVER_DIR = Path("data/raw/hardcover")
+DEFAULT_CACHE_SIZE = 100_000
+DEFAULT_PORT = 8766
+MANIFEST_NAME = "manifest.json"
+
+ISBN_DTYPE = "S13"
+SECTIONS = ("goodreads", "nyt", "hardcover")
+# DuckDB tables SNAPSHOT_SQL reads, their table_versions entries key the version
+SNAPSHOT_TABLES = ("goodreads", "nyt_isbn_features")
+TAKE_MIN_ROWS = 16
+
+# One row per isbn known to any source. Column prefixes map to the
+# sections of a lookup result, the first column of a section is its id.
+SNAPSHOT_SQL = """
+with gr as (
+    select isbn13, book_id, title, authors, average_rating, ratings_count
+    from {goodreads}
+    where isbn13 is not null
+    qualify row_number() over (
+        partition by isbn13 order by ratings_count desc nulls last, book_id
+    ) = 1
+),
+nyt as (
+    select *
+    from {nyt_features}
+    qualify row_number() over (partition by isbn13 order by as_of desc) = 1
+),
+hc as (
+    select * from {hardcover}
+)
+select
+    coalesce(gr.isbn13, nyt.isbn13, hc.isbn13)  as isbn13,
+    gr.book_id                                  as goodreads_book_id,
+    gr.title                                    as goodreads_title,
+    gr.authors                                  as goodreads_authors,
+    gr.average_rating::double                   as goodreads_average_rating,
+    gr.ratings_count                            as goodreads_ratings_count,
+    strftime(nyt.as_of, '%Y-%m-%d')             as nyt_as_of,
+    nyt.weeks_on_list                           as nyt_weeks_on_list,
+    nyt.peak_rank                               as nyt_peak_rank,
+    nyt.current_rank                            as nyt_current_rank,
+    strftime(nyt.first_week, '%Y-%m-%d')        as nyt_first_week,
+    strftime(nyt.last_week, '%Y-%m-%d')         as nyt_last_week,
+    nyt.list_count                              as nyt_list_count,
+    hc.id                                       as hardcover_id,
+    hc.title                                    as hardcover_title,
+    hc.rating::double                           as hardcover_rating,
+    hc.ratings_count                            as hardcover_ratings_count,
+    hc.publication_date                         as hardcover_publication_date
+from gr
+full outer join nyt on nyt.isbn13 = gr.isbn13
+full outer join hc on hc.isbn13 = coalesce(gr.isbn13, nyt.isbn13)
+order by 1
+"""
+
+GOODREADS_FALLBACK = (
+    "(select null::varchar as isbn13, null::integer as book_id, "
+    "null::varchar as title, null::varchar as authors, "
+    "null::double as average_rating, null::integer as ratings_count where false)"
+)
+NYT_FEATURES_FALLBACK = (
+    "(select null::varchar as isbn13, null::date as as_of, "
+    "null::integer as weeks_on_list, null::integer as peak_rank, "
+    "null::integer as current_rank, null::date as first_week, "
+    "null::date as last_week, null::integer as list_count where false)"
+)
+HARDCOVER_FALLBACK = (
+    "(select null::varchar as isbn13, null::bigint as id, null::varchar as title, "
+    "null::double as rating, null::integer as ratings_count, "
+    "null::varchar as publication_date where false)"
+)
+
+
+@dataclass(frozen=True)
+class LookupManifest:
+    """
+    Which snapshot file is current and what it was built from.
+
+    sources holds the table_versions entry and row count of every table
+    the snapshot reads and a fingerprint of the Hardcover files; version is
+    a digest of them, so rebuilding unchanged sources keeps the version.
+    """
+
+    version: str
+    file: str
+    rows: int
+    built_at: str
+    sources: Dict
+
+
+def _table_exists(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return (
+        con.execute(
+            "select 1 from information_schema.tables where table_name = ?", [name]
+        ).fetchone()
+        is not None
+    )
+
+
+def _hardcover_files(hardcover_dir: Path) -> List[Path]:
+    return sorted(hardcover_dir.glob("*.json")) if hardcover_dir.is_dir() else []
+
+
+def hardcover_source(hardcover_dir: Path = DEFAULT_HARDCOVER_DIR) -> str:
+    """
+    SQL relation over the slim documents hardcover_probe writes per isbn.
+
+    Columns are isbn13, id, title, rating, ratings_count and
+    publication_date; empty when the directory holds no documents.
+    """
+
+    if not _hardcover_files(hardcover_dir):
+        return HARDCOVER_FALLBACK
+    pattern = str(hardcover_dir / "*.json").replace("'", "''")
+    return f"""
+    (select regexp_extract(filename, '([^/\\\\]+)\\.json$', 1) as isbn13,
+            id, title, rating, ratings_count,
+            strftime(publication_date, '%Y-%m-%d') as publication_date
+     from read_json('{pattern}', filename = true, columns = {{
+         'id': 'bigint', 'title': 'varchar', 'rating': 'double',
+         'ratings_count': 'bigint', 'publication_date': 'date'
+     }}))
+    """
+
+
+def _table_source(con: duckdb.DuckDBPyConnection, name: str) -> Optional[Dict]:
+    # every writer bumps the version, the row count guards against one
+    # that forgot; an in place reload of a week changes the version only
+    if not _table_exists(con, name):
+        return None
+    source: Dict = {"version": None, "bumped_at": None}
+    if _table_exists(con, "table_versions"):
+        row = con.execute(
+            "select version, strftime(bumped_at, '%Y-%m-%dT%H:%M:%S.%f') "
+            "from table_versions where table_name = ?",
+            [name],
+        ).fetchone()
+        if row:
+            source = {"version": row[0], "bumped_at": row[1]}
+    source["rows"] = con.execute(f'select count(*) from "{name}"').fetchone()[0]
+    return source
+
+
+def hardcover_signature(hardcover_dir: Path = DEFAULT_HARDCOVER_DIR) -> Dict:
+    """
+    Count and digest of the name, size and mtime of every Hardcover document.
+    """
+
+    digest = hashlib.sha256()
+    files = _hardcover_files(hardcover_dir)
+    for p in files:
+        st = p.stat()
+        digest.update(f"{p.name}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return {"files": len(files), "sha256": digest.hexdigest()[:16]}
+
+
+def snapshot_sources(
+    con: duckdb.DuckDBPyConnection,
+    hardcover_dir: Path = DEFAULT_HARDCOVER_DIR,
+) -> Dict:
+    sources = {name: _table_source(con, name) for name in SNAPSHOT_TABLES}
+    sources["hardcover"] = hardcover_signature(hardcover_dir)
+    return sources
+
+
+def read_lookup_manifest(
+    snapshot_dir: Path = DEFAULT_SNAPSHOT_DIR,
+) -> Optional[LookupManifest]:
+    path = snapshot_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    return LookupManifest(**json.loads(path.read_text(encoding="utf-8")))
+
+
+def build_snapshot(
+    con: duckdb.DuckDBPyConnection,
+    snapshot_dir: Path = DEFAULT_SNAPSHOT_DIR,
+    hardcover_dir: Path = DEFAULT_HARDCOVER_DIR,
+    force: bool = False,
+) -> LookupManifest:
+    """
+    Write a read only Arrow snapshot of every isbn and point the manifest at it.
+
+    The snapshot is a new file named after its version and the manifest is
+    replaced last, so running services keep reading the old file until
+    they see the new manifest. Returns the current manifest, unchanged when
+    the sources are and force is not set.
+    """
+
+    import pyarrow as pa
+
+    sources = snapshot_sources(con, hardcover_dir)
+    digest = hashlib.sha256(json.dumps(sources, sort_keys=True).encode("utf-8"))
+    version = digest.hexdigest()[:16]
+    current = read_lookup_manifest(snapshot_dir)
+    if (
+        current
+        and current.version == version
+        and (snapshot_dir / current.file).exists()
+        and not force
+    ):
+        return current
+
+    sql = SNAPSHOT_SQL.format(
+        goodreads=(
+            "goodreads" if _table_exists(con, "goodreads") else GOODREADS_FALLBACK
+        ),
+        nyt_features=(
+            "nyt_isbn_features"
+            if _table_exists(con, "nyt_isbn_features")
+            else NYT_FEATURES_FALLBACK
+        ),
+        hardcover=hardcover_source(hardcover_dir),
+    )
+
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    name = f"snapshot-{version}.arrow"
+    tmp = snapshot_dir / (name + ".part")
+    rows = 0
+    reader = con.execute(sql).fetch_record_batch()
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(
+        sink, reader.schema
+    ) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    tmp.replace(snapshot_dir / name)
+
+    manifest = LookupManifest(
+        version=version,
+        file=name,
+        rows=rows,
+        built_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        sources=sources,
+    )
+    path = snapshot_dir / MANIFEST_NAME
+    part = path.with_name(MANIFEST_NAME + ".part")
+    part.write_text(json.dumps(asdict(manifest), indent=2), encoding="utf-8")
+    part.replace(path)
+
+    # the file just replaced stays one generation for readers that read the
+    # old manifest but have not opened it yet; mapped files stay alive anyway
+    keep = {name, current.file if current else name}
+    for old in snapshot_dir.glob("snapshot-*.arrow"):
+        if old.name not in keep:
+            old.unlink(missing_ok=True)
+    return manifest
+
+
+class _Snapshot:
+    def __init__(self, snapshot_dir: Path, manifest: LookupManifest) -> None:
+        import pyarrow as pa
+
+        self.manifest = manifest
+        source = pa.memory_map(str(snapshot_dir / manifest.file), "r")
+        self.table = pa.ipc.open_file(source).read_all()
+        self.isbns = np.asarray(
+            self.table.column("isbn13").to_numpy(zero_copy_only=False),
+            dtype=ISBN_DTYPE,
+        )
+        self.layout = _layout(self.table.column_names)
+
+    def positions(self, keys: Sequence[str]) -> np.ndarray:
+        """
+        Row of each key in the sorted isbn index, -1 where it is missing.
+        """
+
+        wanted = np.asarray(keys, dtype=ISBN_DTYPE)
+        idx = np.searchsorted(self.isbns, wanted)
+        idx[idx >= len(self.isbns)] = 0
+        found = (self.isbns[idx] == wanted) if len(self.isbns) else idx < 0
+        return np.where(found, idx, -1)
+
+    def rows(self, positions: Sequence[int]) -> List[Dict]:
+        import pyarrow as pa
+
+        # take has a fixed cost per column that only pays off for batches
+        if len(positions) < TAKE_MIN_ROWS:
+            rows = [self.table.slice(p, 1).to_pylist()[0] for p in positions]
+        else:
+            rows = self.table.take(pa.array(positions, pa.int64())).to_pylist()
+        return [_record(row, self.layout) for row in rows]
+
+
+def _layout(columns: Sequence[str]) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    # (section, [(column, field), ...]) in column order, computed per snapshot
+    layout = []
+    for section in SECTIONS:
+        prefix = section + "_"
+        fields = [(c, c[len(prefix) :]) for c in columns if c.startswith(prefix)]
+        layout.append((section, fields))
+    return layout
+
+
+def _record(row: Dict, layout) -> Dict:
+    """
+    Nest a flat snapshot row into its sections, None for a missing source.
+    """
+
+    out: Dict = {"isbn13": row["isbn13"]}
+    for section, fields in layout:
+        if row[fields[0][0]] is None:
+            out[section] = None
+        else:
+            out[section] = {name: row[column] for column, name in fields}
+    return out
+
+
+class LookupStore:
+    """
+    ISBN to Goodreads rating, NYT history and Hardcover metadata.
+
+    Reads the memory mapped snapshot written by build_snapshot, so no
+    DuckDB connection is opened and ingest writers are never blocked.
+    Results, including misses, are kept in an LRU cache of cache_size
+    entries. At most every check_interval seconds a lookup looks at the
+    snapshot manifest and switches to a new snapshot when its version
+    changed, dropping the cache. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        snapshot_dir: Path = DEFAULT_SNAPSHOT_DIR,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        check_interval: float = 1.0,
+    ) -> None:
+        self.snapshot_dir = snapshot_dir
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._cache: OrderedDict = OrderedDict()
+        self._counts = {"hits": 0, "misses": 0, "reloads": 0}
+        self._checked = 0.0
+        self._stamp: Optional[int] = None
+        self._snapshot: Optional[_Snapshot] = None
+        self.refresh(force=True)
+
+    @property
+    def manifest(self) -> LookupManifest:
+        return self._snapshot.manifest
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Switch to a newer snapshot if the manifest changed. True if it did.
+        """
+
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        path = self.snapshot_dir / MANIFEST_NAME
+        try:
+            stamp = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            if self._snapshot is None:
+                raise RuntimeError(
+                    f"No lookup snapshot in {self.snapshot_dir}, run `gle lookup build`"
+                )
+            return False
+        if stamp == self._stamp and not force:
+            return False
+
+        manifest = read_lookup_manifest(self.snapshot_dir)
+        current = self._snapshot
+        self._stamp = stamp
+        if current is not None and manifest.version == current.manifest.version:
+            return False
+        try:
+            snapshot = _Snapshot(self.snapshot_dir, manifest)
+        except FileNotFoundError:
+            # rebuilt twice since the manifest was read, take the newer one
+            manifest = read_lookup_manifest(self.snapshot_dir)
+            snapshot = _Snapshot(self.snapshot_dir, manifest)
+        with self._lock:
+            self._snapshot = snapshot
+            self._cache.clear()
+            if current is not None:
+                self._counts["reloads"] += 1
+        return current is not None
+
+    def _cached(self, key: str) -> Tuple[bool, Optional[Dict]]:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._counts["hits"] += 1
+                return True, self._cache[key]
+            self._counts["misses"] += 1
+            return False, None
+
+    def _remember(self, items: Iterable[Tuple[str, Optional[Dict]]]) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            for key, value in items:
+                self._cache[key] = value
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def get(self, isbn: str) -> Optional[Dict]:
+        """
+        Everything known about one isbn10 or isbn13, or None.
+        """
+
+        return self.get_many([isbn])[isbn]
+
+    def get_many(self, isbns: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Look up many isbns at once, keyed by the values passed in.
+
+        Cache misses are resolved with one vectorized search and one take
+        over the snapshot.
+        """
+
+        self.refresh()
+        snapshot = self._snapshot
+        out: Dict[str, Optional[Dict]] = {}
+        todo: Dict[str, List[str]] = {}
+        for isbn in isbns:
+            key = normalize_isbn(isbn)
+            if key is None:
+                out[isbn] = None
+                continue
+            hit, value = self._cached(key)
+            if hit:
+                out[isbn] = value
+            else:
+                todo.setdefault(key, []).append(isbn)
+
+        if todo:
+            keys = list(todo)
+            positions = snapshot.positions(keys)
+            found = positions >= 0
+            rows = iter(snapshot.rows(positions[found].tolist()))
+            fetched = [(k, next(rows) if f else None) for k, f in zip(keys, found)]
+            if snapshot is self._snapshot:
+                self._remember(fetched)
+            for key, value in fetched:
+                for isbn in todo[key]:
+                    out[isbn] = value
+        return out
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "version": self.manifest.version,
+                "rows": self.manifest.rows,
+                "cached": len(self._cache),
+                **self._counts,
+            }
+
+
+# ── service ────────────────────────────────────────────────────────
+class LookupServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], store: LookupStore) -> None:
+        super().__init__(address, LookupHandler)
+        self.store = store
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """
+    GET /isbn/<isbn>, POST /isbn/batch with {"isbns": [...]}, GET /_stats.
+    """
+
+    server: LookupServer
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes; without this every keep alive
+    # response waits for the client's delayed ack
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        path = urlparse(self.path).path
+        if path == "/_stats":
+            self._send(200, self.server.store.stats())
+        elif path.startswith("/isbn/"):
+            isbn = unquote(path[len("/isbn/") :])
+            record = self.server.store.get(isbn)
+            self._send(200 if record else 404, record or {"error": "not found"})
+        else:
+            self._send(404, {"error": "unknown route"})
+
+    def do_POST(self) -> None:
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlparse(self.path).path != "/isbn/batch":
+            self._send(404, {"error": "unknown route"})
+            return
+        try:
+            isbns = json.loads(raw or b"{}")["isbns"]
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": 'expected {"isbns": [...]}'})
+            return
+        self._send(200, {"results": self.server.store.get_many(map(str, isbns))})
+
+
+def rebuild_if_changed(
+    store: LookupStore, duckdb_path: Path, hardcover_dir: Path
+) -> Optional[LookupManifest]:
+    """
+    Rebuild the snapshot when any of its sources changed, None otherwise.
+
+    The connection is read only and closed right after; while a writer
+    still holds the database the connect fails and None is returned too.
+    """
+
+    try:
+        con = duckdb.connect(str(duckdb_path), read_only=True)
+    except duckdb.Error as exc:
+        print(f"Snapshot rebuild postponed: {exc}")
+        return None
+    try:
+        if snapshot_sources(con, hardcover_dir) == store.manifest.sources:
+            return None
+        manifest = build_snapshot(con, store.snapshot_dir, hardcover_dir)
+    finally:
+        con.close()
+    store.refresh(force=True)
+    return manifest
+
+
+def _rebuild_loop(
+    store: LookupStore, duckdb_path: Path, hardcover_dir: Path, interval: float
+) -> None:
+    while True:
+        time.sleep(interval)
+        manifest = rebuild_if_changed(store, duckdb_path, hardcover_dir)
+        if manifest is not None:
+            print(
+                f"Rebuilt lookup snapshot {manifest.version} ({manifest.rows:,} rows)"
+            )
+
+
+def serve(
+    store: LookupStore,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+) -> LookupServer:
+    """
+    Start the lookup service on a background thread and return the server.
+    """
+
+    server = LookupServer((host, port), store)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ── load test ──────────────────────────────────────────────────────
+def _sample(store: LookupStore, count: int, miss_rate: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    isbns = store._snapshot.isbns
+    out = []
+    for _ in range(count):
+        if not len(isbns) or rng.random() < miss_rate:
+            out.append(f"979{rng.randrange(10**10):010d}")
+        else:
+            out.append(isbns[rng.randrange(len(isbns))].decode())
+    return out
+
+
+def load_test(
+    store: LookupStore,
+    url: Optional[str] = None,
+    requests_total: int = 10_000,
+    workers: int = 8,
+    batch_size: int = 1,
+    miss_rate: float = 0.1,
+    seed: int = 0,
+) -> Dict:
+    """
+    Fire lookups from a thread pool and report latency percentiles and QPS.
+
+    Without url the store is called in process, otherwise the service at
+    url is called over keep alive HTTP connections. With batch_size above
+    one every request looks up that many isbns through the batch path.
+    """
+
+    keys = _sample(store, requests_total * batch_size, miss_rate, seed)
+    chunks = [keys[i : i + batch_size] for i in range(0, len(keys), batch_size)]
+    local = threading.local()
+
+    def call(chunk: List[str]) -> Tuple[float, bool]:
+        t0 = time.perf_counter()
+        if url is None:
+            ok = True
+            store.get_many(chunk) if batch_size > 1 else store.get(chunk[0])
+        else:
+            import requests
+
+            session = getattr(local, "session", None)
+            if session is None:
+                session = local.session = requests.Session()
+            try:
+                if batch_size > 1:
+                    resp = session.post(f"{url}/isbn/batch", json={"isbns": chunk})
+                else:
+                    resp = session.get(f"{url}/isbn/{chunk[0]}")
+                ok = resp.status_code in (200, 404)
+            except requests.RequestException:
+                ok = False
+        return time.perf_counter() - t0, ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(call, chunks))
+    elapsed = time.perf_counter() - t0
+
+    latencies = np.array([r[0] for r in results]) * 1000
+    return {
+        "mode": "http" if url else "library",
+        "requests": len(chunks),
+        "batch_size": batch_size,
+        "workers": workers,
+        "errors": sum(not r[1] for r in results),
+        "qps": len(chunks) / elapsed,
+        "isbns_per_s": len(keys) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="ISBN lookups over a read only snapshot of the pipeline tables."
+    )
+    parser.add_argument("--snapshot-dir", type=Path, default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+    actions = parser.add_subparsers(dest="action", required=True)
+
+    build = actions.add_parser("build", help="Write the snapshot from DuckDB")
+    build.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    build.add_argument("--hardcover-dir", type=Path, default=DEFAULT_HARDCOVER_DIR)
+    build.add_argument("--force", action="store_true")
+
+    get = actions.add_parser("get", help="Print lookups as JSON")
+    get.add_argument("isbns", nargs="+")
+
+    srv = actions.add_parser("serve", help="Run the HTTP lookup service")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=DEFAULT_PORT)
+    srv.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Rebuild the snapshot when a source table or Hardcover file changes",
+    )
+    srv.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    srv.add_argument("--hardcover-dir", type=Path, default=DEFAULT_HARDCOVER_DIR)
+    srv.add_argument("--interval", type=float, default=30.0)
+
+    load = actions.add_parser("loadtest", help="Report p50/p99 latency and QPS")
+    load.add_argument("--url", help="Service to call (default in process)")
+    load.add_argument("--requests", type=int, default=10_000)
+    load.add_argument("--workers", type=int, default=8)
+    load.add_argument("--batch-size", type=int, default=1)
+    load.add_argument("--miss-rate", type=float, default=0.1)
+    load.add_argument(
+        "--serve", action="store_true", help="Start a local service and call it"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.action == "build":
+        con = duckdb.connect(str(args.duckdb), read_only=True)
+        try:
+            manifest = build_snapshot(
+                con, args.snapshot_dir, args.hardcover_dir, args.force
+            )
+        finally:
+            con.close()
+        print(
+            f"Lookup snapshot {manifest.version}: {manifest.rows:,} isbns "
+            f"in {args.snapshot_dir / manifest.file}"
+        )
+        return
+
+    store = LookupStore(args.snapshot_dir, args.cache_size)
+
+    if args.action == "get":
+        print(json.dumps(store.get_many(args.isbns), indent=2))
+    elif args.action == "serve":
+        if args.rebuild:
+            threading.Thread(
+                target=_rebuild_loop,
+                args=(store, args.duckdb, args.hardcover_dir, args.interval),
+                daemon=True,
+            ).start()
+        server = LookupServer((args.host, args.port), store)
+        print(
+            f"Lookup service on {server.url} "
+            f"(snapshot {store.manifest.version}, {store.manifest.rows:,} isbns)"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    else:
+        server = serve(store, port=0) if args.serve else None
+        url = server.url if server else args.url
+        try:
+            result = load_test(
+                store,
+                url,
+                args.requests,
+                args.workers,
+                args.batch_size,
+                args.miss_rate,
+            )
+        finally:
+            if server:
+                server.shutdown()
+        print(
+            f"{result['mode']:<8} {result['requests']:,} requests x "
+            f"{result['batch_size']} isbns, {result['workers']} workers, "
+            f"{result['errors']} errors"
+        )
+        print(
+            f"  {result['qps']:>10,.0f} req/s  {result['isbns_per_s']:>10,.0f} isbns/s  "
+            f"p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms"
+        )
+        print(f"  {json.dumps(store.stats())}")
+
+
+if __name__ == "__main__":
+    main()
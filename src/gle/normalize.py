@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Optional
+
+import duckdb
+
+# Column at a time title and author keys as DuckDB macros, so the same rules
+# run inside the Goodreads ingest, the matcher queries and on Python lists.
+# Plain replace and split_part are used wherever a regex is not needed, and
+# the trailing number rule only runs on titles that end in a digit.
+#
+# gle_fold     lower case, diacritics removed, null as empty string
+# gle_words    apostrophes dropped, any other run of punctuation a single space
+# title_key    subtitle and series suffix after ':' '(' or '[' dropped, then a
+#              trailing "Book 3", "Vol. 2" or "#4", '&' read as 'and', and a
+#              leading "The", "A" or "An"
+# surname_key  first listed author only, initials split on '.', then the last
+#              word that is not a "Jr." style suffix
+MACROS_SQL = r"""
+create or replace temp macro gle_fold(s) as
+    lower(strip_accents(coalesce(s, '')));
+
+create or replace temp macro gle_words(s) as
+    trim(regexp_replace(replace(replace(s, '''', ''), '’', ''), '[^a-z0-9]+', ' ', 'g'));
+
+create or replace temp macro gle_untail(s) as
+    case
+        when regexp_matches(s, '\d\s*$')
+        then regexp_replace(s, '[,\s]*(book|vol|volume|part|#)\.?\s*\d+\s*$', '')
+        else s
+    end;
+
+create or replace temp macro title_key(t) as
+    regexp_replace(
+        gle_words(
+            replace(
+                gle_untail(
+                    split_part(split_part(split_part(gle_fold(t), ':', 1), '(', 1), '[', 1)
+                ),
+                '&', ' and '
+            )
+        ),
+        '^(the|a|an) ', ''
+    );
+
+create or replace temp macro gle_coauthors(s) as
+    case
+        when contains(s, ' and ') or contains(s, ' with ') or contains(s, ' & ')
+        then regexp_replace(s, '\s+(and|with|&)\s+.*$', '')
+        else s
+    end;
+
+create or replace temp macro surname_key(a) as
+    regexp_extract(
+        gle_words(
+            replace(
+                gle_coauthors(split_part(split_part(gle_fold(a), '/', 1), ';', 1)),
+                '.', ' '
+            )
+        ),
+        '(\S+)(?:\s(?:jr|sr|ii|iii|iv|phd|md))?$', 1
+    );
+"""
+
+_local: Optional[duckdb.DuckDBPyConnection] = None
+
+
+def install_macros(con: duckdb.DuckDBPyConnection) -> None:
+    """
+    Define the normalization macros on a connection.
+
+    The macros are temporary, so this also works on read only connections
+    and never changes the database file.
+    """
+
+    con.execute(MACROS_SQL)
+
+
+def _connection(con: Optional[duckdb.DuckDBPyConnection]) -> duckdb.DuckDBPyConnection:
+    global _local
+    if con is not None:
+        install_macros(con)
+        return con
+    if _local is None:
+        _local = duckdb.connect()
+        install_macros(_local)
+    return _local
+
+
+def _apply(
+    macro: str,
+    values: Iterable[Optional[str]],
+    con: Optional[duckdb.DuckDBPyConnection],
+) -> List[str]:
+    import pyarrow as pa
+
+    con = _connection(con)
+    if not hasattr(values, "__len__"):
+        values = list(values)
+    column = pa.table({"value": pa.array(values, pa.string())})
+    con.register("normalize_input", column)
+    try:
+        result = con.execute(f"select {macro}(value) as k from normalize_input")
+        keys = result.fetchnumpy()["k"]
+    finally:
+        con.unregister("normalize_input")
+    return keys.tolist()
+
+
+def title_keys(
+    values: Iterable[Optional[str]],
+    con: Optional[duckdb.DuckDBPyConnection] = None,
+) -> List[str]:
+    """
+    Title keys for a whole column in one query, in input order.
+    """
+
+    return _apply("title_key", values, con)
+
+
+def surname_keys(
+    values: Iterable[Optional[str]],
+    con: Optional[duckdb.DuckDBPyConnection] = None,
+) -> List[str]:
+    """
+    Surname keys for a whole column in one query, in input order.
+    """
+
+    return _apply("surname_key", values, con)
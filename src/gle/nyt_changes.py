@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import duckdb
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+
+CHANGE_KINDS = ("entered", "exited", "rank_changed", "new")
+
+SCHEMA_SQL = """
+create sequence if not exists nyt_change_seq;
+
+create table if not exists nyt_changes (
+    seq bigint primary key default nextval('nyt_change_seq'),
+    week date not null,
+    change varchar not null,
+    list_name varchar,
+    isbn13 varchar not null,
+    prev_rank integer,
+    rank integer
+);
+
+create table if not exists nyt_change_weeks (
+    week date primary key,
+    previous_week date
+);
+
+create table if not exists nyt_change_watermarks (
+    consumer varchar primary key,
+    seq bigint not null,
+    updated_at timestamp
+);
+"""
+
+# Changes of one week against the previous loaded week, per list and isbn.
+# new marks the first week an isbn shows up on any list at all.
+DIFF_SQL = """
+with cur as (
+    select list_name, isbn13, rank from nyt_appearances where week = $week
+),
+prev as (
+    select list_name, isbn13, rank from nyt_appearances where week = $prev
+)
+select 'entered' as change, c.list_name, c.isbn13, null::integer as prev_rank, c.rank
+from cur c anti join prev p using (list_name, isbn13)
+union all
+select 'exited', p.list_name, p.isbn13, p.rank, null
+from prev p anti join cur c using (list_name, isbn13)
+union all
+select 'rank_changed', c.list_name, c.isbn13, p.rank, c.rank
+from cur c join prev p using (list_name, isbn13)
+where c.rank is distinct from p.rank
+union all
+select 'new', null, isbn13, null, min(rank)
+from cur
+where isbn13 not in (
+    select isbn13 from nyt_appearances where week < $week
+)
+group by isbn13
+"""
+
+
+@dataclass(frozen=True)
+class NytChange:
+    """
+    One week over week change of one isbn, on one list unless it is new.
+    """
+
+    seq: int
+    week: str
+    change: str
+    list_name: Optional[str]
+    isbn13: str
+    prev_rank: Optional[int]
+    rank: Optional[int]
+
+
+def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
+    con.execute(SCHEMA_SQL)
+
+
+def _loaded_weeks(con: duckdb.DuckDBPyConnection) -> List[str]:
+    return [
+        row[0].isoformat()
+        for row in con.execute(
+            "select distinct week from nyt_appearances "
+            "union select week from nyt_feature_weeks order by 1"
+        ).fetchall()
+    ]
+
+
+def diff_week(con: duckdb.DuckDBPyConnection, week_iso: str) -> int:
+    """
+    Recompute the changes of one week against the loaded week before it.
+
+    Rows are only replaced when the diff actually differs, so consumers are
+    not handed the same changes again under new sequence numbers. Returns
+    the number of rows written.
+    """
+
+    weeks = _loaded_weeks(con)
+    earlier = [w for w in weeks if w < week_iso]
+    prev = earlier[-1] if earlier else None
+
+    rows = sorted(
+        con.execute(DIFF_SQL, {"week": week_iso, "prev": prev}).fetchall(),
+        key=repr,
+    )
+    current = sorted(
+        con.execute(
+            "select change, list_name, isbn13, prev_rank, rank "
+            "from nyt_changes where week = ?",
+            [week_iso],
+        ).fetchall(),
+        key=repr,
+    )
+    con.execute(
+        "insert or replace into nyt_change_weeks values (?, ?)", [week_iso, prev]
+    )
+    if rows == current:
+        return 0
+
+    con.execute("delete from nyt_changes where week = ?", [week_iso])
+    bump_table_versions(con, "nyt_changes")
+    if rows:
+        con.executemany(
+            "insert into nyt_changes "
+            "(week, change, list_name, isbn13, prev_rank, rank) "
+            "values (?, ?, ?, ?, ?, ?)",
+            [(week_iso, *row) for row in rows],
+        )
+    return len(rows)
+
+
+def record_week(con: duckdb.DuckDBPyConnection, week_iso: str) -> int:
+    """
+    Update the changes after one week was loaded or reloaded.
+
+    Besides the week itself this rediffs the next loaded week, whose
+    previous week may have changed, and any later week that flagged one of
+    this week's isbns as new. Runs inside the caller's transaction.
+    """
+
+    ensure_schema(con)
+    weeks = _loaded_weeks(con)
+    later = [w for w in weeks if w > week_iso]
+
+    affected = {week_iso}
+    if later:
+        affected.add(later[0])
+    affected.update(
+        row[0].isoformat()
+        for row in con.execute(
+            """
+            select distinct week from nyt_changes
+            where change = 'new' and week > ?
+              and isbn13 in (select isbn13 from nyt_appearances where week = ?)
+            """,
+            [week_iso, week_iso],
+        ).fetchall()
+    )
+    return sum(diff_week(con, week) for week in sorted(affected))
+
+
+def sync_changes(con: duckdb.DuckDBPyConnection) -> List[str]:
+    """
+    Diff every loaded week that has no changes yet, oldest first.
+
+    Needed once for databases that were loaded before the changes table
+    existed, afterwards update_week keeps it current. Returns those weeks.
+    """
+
+    ensure_schema(con)
+    exists = con.execute(
+        "select 1 from information_schema.tables where table_name = 'nyt_appearances'"
+    ).fetchone()
+    if not exists:
+        return []
+
+    done = {
+        row[0].isoformat()
+        for row in con.execute("select week from nyt_change_weeks").fetchall()
+    }
+    missing = [w for w in _loaded_weeks(con) if w not in done]
+    for week in missing:
+        record_week(con, week)
+    return missing
+
+
+def watermark(con: duckdb.DuckDBPyConnection, consumer: str) -> int:
+    ensure_schema(con)
+    row = con.execute(
+        "select seq from nyt_change_watermarks where consumer = ?", [consumer]
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def latest_seq(con: duckdb.DuckDBPyConnection) -> int:
+    ensure_schema(con)
+    return con.execute("select coalesce(max(seq), 0) from nyt_changes").fetchone()[0]
+
+
+def pending_changes(
+    con: duckdb.DuckDBPyConnection,
+    consumer: str,
+    kinds: Optional[Sequence[str]] = None,
+) -> List[NytChange]:
+    """
+    Changes after the consumer's watermark, oldest first.
+    """
+
+    kinds = list(kinds or CHANGE_KINDS)
+    rows = con.execute(
+        """
+        select seq, strftime(week, '%Y-%m-%d'), change, list_name, isbn13,
+               prev_rank, rank
+        from nyt_changes
+        where seq > ? and change in (select unnest(?::varchar[]))
+        order by seq
+        """,
+        [watermark(con, consumer), kinds],
+    ).fetchall()
+    return [NytChange(*row) for row in rows]
+
+
+def pending_isbns(changes: Iterable[NytChange]) -> List[str]:
+    return sorted({change.isbn13 for change in changes})
+
+
+def advance_watermark(
+    con: duckdb.DuckDBPyConnection, consumer: str, seq: Optional[int] = None
+) -> int:
+    """
+    Mark everything up to seq as consumed, by default everything there is.
+
+    Consumers should pass the latest_seq they saw before reading their
+    delta, so changes written while they worked are not skipped. The
+    watermark never moves backwards. Returns the new watermark.
+    """
+
+    if seq is None:
+        seq = latest_seq(con)
+    seq = max(seq, watermark(con, consumer))
+    con.execute(
+        "insert or replace into nyt_change_watermarks values (?, ?, current_timestamp)",
+        [consumer, seq],
+    )
+    return seq
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Week over week New York Times list changes for downstream stages."
+    )
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    actions = parser.add_subparsers(dest="action", required=True)
+
+    actions.add_parser("sync", help="Diff loaded weeks that have no changes yet")
+
+    show = actions.add_parser("show", help="List changes a consumer has not seen")
+    show.add_argument("--consumer", required=True)
+    show.add_argument("--kind", action="append", choices=CHANGE_KINDS)
+
+    ack = actions.add_parser("ack", help="Advance a consumer watermark")
+    ack.add_argument("--consumer", required=True)
+    ack.add_argument("--seq", type=int, help="Last consumed seq (default latest)")
+
+    args = parser.parse_args(argv)
+
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        if args.action == "sync":
+            weeks = sync_changes(con)
+            print(f"Diffed {len(weeks)} weeks")
+        elif args.action == "show":
+            changes = pending_changes(con, args.consumer, args.kind)
+            for c in changes:
+                ranks = f"{c.prev_rank or '-'} -> {c.rank or '-'}"
+                print(
+                    f"{c.seq:>8} {c.week} {c.change:<13}{c.isbn13} {c.list_name or ''} {ranks}"
+                )
+            print(f"{len(changes)} changes pending for {args.consumer}")
+        else:
+            seq = advance_watermark(con, args.consumer, args.seq)
+            print(f"{args.consumer} watermark at {seq}")
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import duckdb
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH, DEFAULT_NYT_RAW_DIR
+from gle.nyt_changes import record_week, sync_changes
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+from gle.snapshot_manifest import SnapshotManifest, SnapshotRecord
+
+DEFAULT_EXPORT_DIR = Path("data/processed/nyt_features")
+
+SCHEMA_SQL = """
+create table if not exists nyt_appearances (
+    week date not null,
+    list_name varchar not null,
+    rank integer,
+    isbn13 varchar not null,
+    title varchar,
+    author varchar,
+    primary key (week, list_name, isbn13)
+);
+
+create table if not exists nyt_isbn_features (
+    isbn13 varchar not null,
+    as_of date not null,
+    weeks_on_list integer,
+    peak_rank integer,
+    current_rank integer,
+    first_week date,
+    last_week date,
+    list_count integer,
+    rank_trajectory integer[],
+    primary key (isbn13, as_of)
+);
+
+create table if not exists nyt_feature_weeks (
+    week date primary key,
+    sha256 varchar,
+    isbn_count integer
+);
+"""
+
+# Rebuild feature rows for the touched isbns, from the given week onwards.
+# Only those isbns are read, so the cost follows the size of a weekly list
+# and not the length of the history.
+FEATURES_SQL = """
+with touched as (
+    select unnest($touched::varchar[]) as isbn13
+),
+weekly as (
+    select
+        isbn13,
+        week,
+        min(rank) as best_rank,
+        list(distinct list_name) as lists
+    from nyt_appearances
+    where isbn13 in (select isbn13 from touched)
+    group by isbn13, week
+),
+rolled as (
+    select
+        isbn13,
+        week as as_of,
+        count(*) over w as weeks_on_list,
+        min(best_rank) over w as peak_rank,
+        best_rank as current_rank,
+        min(week) over w as first_week,
+        week as last_week,
+        len(list_distinct(flatten(list(lists) over w))) as list_count,
+        list(best_rank) over w as rank_trajectory
+    from weekly
+    window w as (
+        partition by isbn13 order by week
+        rows between unbounded preceding and current row
+    )
+)
+select * from rolled where as_of >= $week
+"""
+
+
+@dataclass(frozen=True)
+class NytAppearance:
+    """
+    One book on one list in one weekly snapshot.
+    """
+
+    week: str
+    list_name: str
+    rank: Optional[int]
+    isbn13: str
+    title: Optional[str]
+    author: Optional[str]
+
+
+def flatten_snapshot(monday_iso: str, payload: Dict) -> List[NytAppearance]:
+    """
+    Turn a full overview payload into one row per book and list.
+
+    Books without a primary isbn13 cannot be keyed and are dropped.
+    """
+
+    rows: Dict[tuple[str, str], NytAppearance] = {}
+    for lst in (payload.get("results") or {}).get("lists") or []:
+        list_name = lst.get("list_name_encoded") or lst.get("list_name") or ""
+        for book in lst.get("books") or []:
+            isbn13 = book.get("primary_isbn13")
+            if not isbn13:
+                continue
+            rows[(list_name, isbn13)] = NytAppearance(
+                week=monday_iso,
+                list_name=list_name,
+                rank=book.get("rank"),
+                isbn13=isbn13,
+                title=book.get("title"),
+                author=book.get("author"),
+            )
+    return list(rows.values())
+
+
+def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
+    con.execute(SCHEMA_SQL)
+
+
+def update_week(
+    con: duckdb.DuckDBPyConnection,
+    monday_iso: str,
+    appearances: Iterable[NytAppearance],
+    sha256: Optional[str] = None,
+) -> int:
+    """
+    Load one weekly snapshot and refresh the features of its isbns only.
+
+    Reloading a week replaces its appearances. A week that arrives out of
+    order also refreshes the later rows of the isbns it contains, so the
+    result never depends on the order in which snapshots landed. The week
+    over week changes in nyt_changes are updated in the same transaction.
+
+    Returns the number of isbns touched.
+    """
+
+    ensure_schema(con)
+    rows = [
+        (a.week, a.list_name, a.rank, a.isbn13, a.title, a.author) for a in appearances
+    ]
+
+    con.execute("begin transaction")
+    try:
+        previous = [
+            r[0]
+            for r in con.execute(
+                "select distinct isbn13 from nyt_appearances where week = ?",
+                [monday_iso],
+            ).fetchall()
+        ]
+        con.execute("delete from nyt_appearances where week = ?", [monday_iso])
+        if rows:
+            con.executemany(
+                "insert into nyt_appearances values (?, ?, ?, ?, ?, ?)", rows
+            )
+
+        # Isbns that dropped out of a reloaded week need their rows rebuilt too
+        touched = sorted({r[3] for r in rows} | set(previous))
+        con.execute(
+            """
+            delete from nyt_isbn_features
+            where as_of >= ? and isbn13 in (select unnest(?::varchar[]))
+            """,
+            [monday_iso, touched],
+        )
+        con.execute(
+            "insert into nyt_isbn_features " + FEATURES_SQL,
+            {"week": monday_iso, "touched": touched},
+        )
+
+        con.execute(
+            "insert or replace into nyt_feature_weeks values (?, ?, ?)",
+            [monday_iso, sha256, len(touched)],
+        )
+        record_week(con, monday_iso)
+        bump_table_versions(
+            con, "nyt_appearances", "nyt_isbn_features", "nyt_feature_weeks"
+        )
+        con.execute("commit")
+    except duckdb.Error:
+        con.execute("rollback")
+        raise
+
+    return len(touched)
+
+
+def pending_records(
+    con: duckdb.DuckDBPyConnection, manifest: SnapshotManifest
+) -> List[SnapshotRecord]:
+    """
+    Return manifest records not yet loaded, or loaded from a different file.
+    """
+
+    ensure_schema(con)
+    loaded = {
+        week.isoformat(): sha
+        for week, sha in con.execute(
+            "select week, sha256 from nyt_feature_weeks"
+        ).fetchall()
+    }
+    return [
+        record
+        for record in manifest.valid_records()
+        if loaded.get(record.date) != record.sha256
+    ]
+
+
+def affected_weeks(con: duckdb.DuckDBPyConnection, since_iso: str) -> List[str]:
+    return [
+        row[0].isoformat()
+        for row in con.execute(
+            "select distinct as_of from nyt_isbn_features where as_of >= ? order by 1",
+            [since_iso],
+        ).fetchall()
+    ]
+
+
+def export_partitions(
+    con: duckdb.DuckDBPyConnection,
+    weeks: Iterable[str],
+    export_dir: Path = DEFAULT_EXPORT_DIR,
+) -> List[Path]:
+    """
+    Write one hive style parquet partition per as of week.
+
+    Only the given weeks are rewritten, everything else under the export
+    directory is left untouched.
+    """
+
+    written = []
+    for week in weeks:
+        part_dir = export_dir / f"as_of={week}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        output = part_dir / "data.parquet"
+        tmp = part_dir / "data.parquet.tmp"
+        con.execute(
+            f"""
+            copy (
+                select * exclude (as_of)
+                from nyt_isbn_features
+                where as_of = '{week}'::date
+                order by isbn13
+            ) to '{tmp.as_posix()}' (format parquet)
+            """
+        )
+        tmp.replace(output)
+        written.append(output)
+    return written
+
+
+def features_as_of(
+    con: duckdb.DuckDBPyConnection, week_iso: str
+) -> duckdb.DuckDBPyRelation:
+    """
+    Latest feature row per isbn13 known at the given week.
+    """
+
+    return con.sql(
+        """
+        select *
+        from nyt_isbn_features
+        where as_of <= $week::date
+        qualify row_number() over (partition by isbn13 order by as_of desc) = 1
+        """,
+        params={"week": week_iso},
+    )
+
+
+def sync_features(
+    con: duckdb.DuckDBPyConnection,
+    nyt_raw_dir: Path = DEFAULT_NYT_RAW_DIR,
+    export_dir: Optional[Path] = DEFAULT_EXPORT_DIR,
+) -> List[str]:
+    """
+    Bring the feature table up to date with the snapshot manifest.
+
+    Returns the weeks that were loaded.
+    """
+
+    manifest = SnapshotManifest(nyt_raw_dir)
+    ensure_schema(con)
+    sync_changes(con)
+    loaded = []
+    for record in pending_records(con, manifest):
+        path = manifest.path_for(record)
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        update_week(
+            con, record.date, flatten_snapshot(record.date, payload), record.sha256
+        )
+        loaded.append(record.date)
+
+    if loaded and export_dir is not None:
+        export_partitions(con, affected_weeks(con, min(loaded)), export_dir)
+
+    return loaded
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Update the per isbn New York Times feature table."
+    )
+    parser.add_argument("--nyt-raw-dir", type=Path, default=DEFAULT_NYT_RAW_DIR)
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    parser.add_argument("--export-dir", type=Path, default=DEFAULT_EXPORT_DIR)
+    parser.add_argument(
+        "--no-export", action="store_true", help="Skip the parquet export"
+    )
+    args = parser.parse_args(argv)
+
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        loaded = sync_features(
+            con,
+            nyt_raw_dir=args.nyt_raw_dir,
+            export_dir=None if args.no_export else args.export_dir,
+        )
+    finally:
+        con.close()
+
+    if loaded:
+        print(f"Loaded {len(loaded)} weeks from {loaded[0]} to {loaded[-1]}")
+    else:
+        print("Feature table already up to date")
+
+
+if __name__ == "__main__":
+    main()
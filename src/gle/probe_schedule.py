@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import duckdb
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+
+LOG_SCHEMA_SQL = """
+create table if not exists hardcover_probe_log (
+    isbn13 varchar primary key,
+    probed_at timestamp not null,
+    hit boolean not null,
+    attempts integer not null
+);
+"""
+
+# One row per isbn that was ever on a list and is due for a probe: never
+# looked up, or a miss whose cooldown has passed. Age is counted in weeks
+# before the newest loaded week, rank is the best rank of the isbn's last
+# week on any list.
+PENDING_SQL = """
+with per_week as (
+    select isbn13, week, min(rank) as best_rank
+    from nyt_appearances
+    group by isbn13, week
+),
+latest as (
+    select
+        isbn13,
+        max(week) as last_week,
+        arg_max(best_rank, week) as last_rank,
+        count(*) as weeks_on_list
+    from per_week
+    group by isbn13
+),
+scored as (
+    select
+        l.isbn13,
+        l.last_week,
+        l.last_rank,
+        l.weeks_on_list,
+        date_diff('week', l.last_week, (select max(week) from per_week)) as age_weeks,
+        gr.isbn13 is not null as matched,
+        p.isbn13 is not null as retry
+    from latest l
+    left join {goodreads} gr using (isbn13)
+    left join hardcover_probe_log p using (isbn13)
+    where (p.isbn13 is null
+           or (not p.hit and p.probed_at < now()::timestamp - to_days($retry_days)))
+      and ($only::varchar[] is null or list_contains($only::varchar[], l.isbn13))
+)
+select
+    isbn13,
+    strftime(last_week, '%Y-%m-%d') as last_week,
+    last_rank,
+    weeks_on_list,
+    matched,
+    retry,
+    (
+        $w_recency * pow(0.5, age_weeks / $half_life)
+        + $w_rank * (21 - least(coalesce(last_rank, 20), 20)) / 20.0
+        + $w_unmatched * (not matched)::integer
+    ) * (case when retry then $w_retry else 1.0 end) as priority
+from scored
+order by priority desc, last_week desc, isbn13
+"""
+
+
+@dataclass(frozen=True)
+class ProbePriority:
+    """
+    Weights of the probe order.
+
+    recency halves every half_life_weeks since the isbn was last on a list,
+    rank runs from one for first place down to nothing from rank 20, and
+    unmatched counts for isbns the Goodreads table has no row for. Misses
+    come back after retry_days with their priority scaled by retry_weight.
+    """
+
+    recency: float = 3.0
+    half_life_weeks: float = 4.0
+    rank: float = 2.0
+    unmatched: float = 1.0
+    retry_days: int = 30
+    retry_weight: float = 0.25
+
+
+@dataclass(frozen=True)
+class ScheduledIsbn:
+    isbn13: str
+    last_week: str
+    last_rank: Optional[int]
+    weeks_on_list: int
+    matched: bool
+    retry: bool
+    priority: float
+
+
+def ensure_log(con: duckdb.DuckDBPyConnection) -> None:
+    con.execute(LOG_SCHEMA_SQL)
+
+
+def _table_exists(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return (
+        con.execute(
+            "select 1 from information_schema.tables where table_name = ?", [name]
+        ).fetchone()
+        is not None
+    )
+
+
+def rank_pending(
+    con: duckdb.DuckDBPyConnection,
+    priority: ProbePriority = ProbePriority(),
+    only: Optional[Sequence[str]] = None,
+) -> List[ScheduledIsbn]:
+    """
+    Isbns due for a Hardcover probe, most valuable first.
+
+    only restricts the ranking to the given isbns, for instance the ones
+    the change feed reports. Returns an empty list before any New York
+    Times week is loaded.
+    """
+
+    ensure_log(con)
+    if not _table_exists(con, "nyt_appearances"):
+        return []
+    goodreads = (
+        "(select distinct isbn13 from goodreads)"
+        if _table_exists(con, "goodreads")
+        else "(select null::varchar as isbn13 where false)"
+    )
+    rows = con.execute(
+        PENDING_SQL.format(goodreads=goodreads),
+        {
+            "retry_days": priority.retry_days,
+            "only": list(only) if only is not None else None,
+            "w_recency": priority.recency,
+            "half_life": priority.half_life_weeks,
+            "w_rank": priority.rank,
+            "w_unmatched": priority.unmatched,
+            "w_retry": priority.retry_weight,
+        },
+    ).fetchall()
+    return [ScheduledIsbn(*row) for row in rows]
+
+
+def record_probes(con: duckdb.DuckDBPyConnection, outcomes: Dict[str, bool]) -> None:
+    """
+    Log one probe per isbn with whether Hardcover had it.
+    """
+
+    ensure_log(con)
+    if not outcomes:
+        return
+    con.executemany(
+        """
+        insert into hardcover_probe_log values (?, now()::timestamp, ?, 1)
+        on conflict (isbn13) do update set
+            probed_at = excluded.probed_at,
+            hit = excluded.hit,
+            attempts = hardcover_probe_log.attempts + 1
+        """,
+        list(outcomes.items()),
+    )
+    bump_table_versions(con, "hardcover_probe_log")
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Show the order the Hardcover probe would spend its budget in."
+    )
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    parser.add_argument("--n", type=int, default=25, help="Rows to show")
+    args = parser.parse_args(argv)
+
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        pending = rank_pending(con)
+    finally:
+        con.close()
+    for s in pending[: args.n]:
+        flags = ("matched " if s.matched else "") + ("retry" if s.retry else "")
+        print(
+            f"{s.priority:6.2f}  {s.isbn13}  {s.last_week}  "
+            f"rank {s.last_rank or '-':>2}  {s.weeks_on_list:>3} wk  {flags}"
+        )
+    print(f"{len(pending):,} isbns pending")
+
+
+if __name__ == "__main__":
+    main()
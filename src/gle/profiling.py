@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_PROFILE_DIR = Path("data/interim/profiles")
+DEFAULT_INTERVAL = 0.005
+KEEP_PLANS = 100
+SUMMARY_FRAMES = 15
+SUMMARY_QUERIES = 5
+
+# Connection methods that start a statement; each gets its own plan file
+HOOKED_METHODS = ("execute", "executemany", "sql", "query")
+
+_active: Optional["Profiler"] = None
+
+
+def _short_path(filename: str) -> str:
+    path = os.path.normpath(filename)
+    cwd = os.getcwd()
+    if path.startswith(cwd + os.sep):
+        return os.path.relpath(path, cwd)
+    parts = path.split(os.sep)
+    for marker in ("site-packages", "dist-packages"):
+        if marker in parts:
+            return "/".join(parts[parts.index(marker) + 1 :])
+    return "/".join(parts[-2:])
+
+
+class StackSampler:
+    """
+    Wall clock sampling profiler for every Python thread of the process.
+
+    A daemon thread takes the stack of each other thread every interval
+    seconds and counts identical stacks, so the overhead depends on the
+    interval and not on how many calls the program makes. Time spent in C
+    code, DuckDB queries included, shows up under the Python line that
+    called it.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Tuple[object, int], str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="gle-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _label(self, code, lineno: int) -> str:
+        key = (code, lineno)
+        label = self._labels.get(key)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{lineno})"
+            self._labels[key] = label = label.replace(";", ",")
+        return label
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        due = time.perf_counter()
+        while not self._stop.wait(max(due - time.perf_counter(), 0)):
+            # a busy GIL delays samples, skip rather than catch up
+            due = max(due + self.interval, time.perf_counter())
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code, frame.f_lineno))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread {ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path: Path) -> None:
+        """
+        Stacks in the collapsed format of flamegraph.pl, inferno and speedscope.
+        """
+
+        with path.open("w", encoding="utf-8") as fh:
+            for stack, count in sorted(self.stacks.items()):
+                fh.write(f"{stack} {count}\n")
+
+    def top_frames(self, n: int = SUMMARY_FRAMES) -> List[Tuple[str, int, int]]:
+        """
+        (frame, self samples, total samples) of the frames with most self time.
+        """
+
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(n)]
+
+
+def render_plan(node: Dict, depth: int = 0) -> List[str]:
+    """
+    Operator tree of a DuckDB JSON profile with time and rows per operator.
+    """
+
+    lines = []
+    name = node.get("operator_name") or node.get("operator_type")
+    if name:
+        timing = node.get("operator_timing", node.get("timing", 0.0)) or 0.0
+        rows = node.get("operator_cardinality", node.get("cardinality", 0)) or 0
+        lines.append(
+            f"{'  ' * depth}{name:<{32 - 2 * depth}} {timing * 1000:>10.1f} ms {rows:>12,} rows"
+        )
+    for child in node.get("children", []):
+        lines.extend(render_plan(child, depth + 1 if name else depth))
+    return lines
+
+
+class Profiler:
+    """
+    Sampled Python stacks plus one DuckDB plan per statement for one run.
+
+    Everything goes to its own directory under profile_dir:
+    stacks.folded for flame graphs, plans/<seq>.json with the DuckDB
+    profile of the slowest statements, queries.tsv with the latency of
+    every statement and summary.txt with the hottest frames and plans.
+
+    DuckDB writes a profile when a statement finishes, so while the
+    profiler runs every connection points its profiling output at a fresh
+    file before each statement, and reads the rest of the previous result
+    first. A relation fetched only after later statements ran lands in the
+    file of the last one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        profile_dir: Path = DEFAULT_PROFILE_DIR,
+        interval: float = DEFAULT_INTERVAL,
+        keep_plans: int = KEEP_PLANS,
+    ) -> None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.run_dir = Path(profile_dir) / f"{name}-{stamp}-{os.getpid()}"
+        self.plans_dir = self.run_dir / "plans"
+        self.keep_plans = keep_plans
+        self.sampler = StackSampler(interval)
+        self.statements: List[Tuple[int, str]] = []
+        self.elapsed = 0.0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._connections: weakref.WeakSet = weakref.WeakSet()
+        self._originals: Dict[str, Callable] = {}
+        self._started = 0.0
+
+    def __enter__(self) -> "Profiler":
+        global _active
+        self.plans_dir.mkdir(parents=True, exist_ok=True)
+        self._hook_duckdb()
+        _active = self
+        self._started = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _active
+        self.sampler.stop()
+        self.elapsed = time.perf_counter() - self._started
+        _active = None
+        self._unhook_duckdb()
+        self.write()
+        print(f"Profile written to {self.run_dir}", file=sys.stderr)
+
+    def _hook_duckdb(self) -> None:
+        try:
+            import duckdb
+        except ImportError:
+            return
+
+        for method in HOOKED_METHODS + ("close",):
+            original = getattr(duckdb.DuckDBPyConnection, method)
+            self._originals[method] = original
+
+            def in_duckdb(con, *args, _original=original, _method=method, **kwargs):
+                self._finish_statement(con)
+                if _method != "close":
+                    self._next_plan(con, args[0] if args else kwargs.get("query"))
+                return _original(con, *args, **kwargs)
+
+            setattr(duckdb.DuckDBPyConnection, method, in_duckdb)
+
+    def _unhook_duckdb(self) -> None:
+        if not self._originals:
+            return
+        import duckdb
+
+        for con in list(self._connections):
+            self._finish_statement(con)
+            try:
+                self._originals["execute"](con, "set enable_profiling = 'no_output'")
+            except duckdb.Error:  # closed meanwhile
+                pass
+        for method, original in self._originals.items():
+            setattr(duckdb.DuckDBPyConnection, method, original)
+
+    def _finish_statement(self, con) -> None:
+        """
+        Read what is left of the previous result of a profiled connection.
+
+        DuckDB only writes the profile of a statement whose result was read
+        to the end, a fetchone on an aggregate would otherwise leave none.
+        """
+
+        import duckdb
+
+        if con not in self._connections:
+            return
+        try:
+            while con.fetchmany(10_000):
+                pass
+        except duckdb.Error:  # no open result, or the connection is closed
+            pass
+
+    def _next_plan(self, con, query) -> None:
+        import duckdb
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self.statements.append((seq, str(query)))
+        path = (self.plans_dir / f"{seq:06d}.json").as_posix().replace("'", "''")
+        execute = self._originals["execute"]
+        try:
+            if con not in self._connections:
+                execute(con, "set enable_profiling = 'json'")
+                self._connections.add(con)
+            execute(con, f"set profiling_output = '{path}'")
+        except duckdb.Error:
+            # closed connection or aborted transaction, the statement reports it
+            pass
+
+    def _plans(self) -> List[Tuple[int, Optional[float], Optional[int], str]]:
+        """
+        (seq, latency, rows, query) of every statement, None latency if unprofiled.
+        """
+
+        plans = []
+        for seq, query in self.statements:
+            path = self.plans_dir / f"{seq:06d}.json"
+            try:
+                profile = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                plans.append((seq, None, None, query))
+                continue
+            plans.append(
+                (
+                    seq,
+                    profile.get("latency", profile.get("timing")),
+                    profile.get("rows_returned"),
+                    profile.get("query_name") or query,
+                )
+            )
+        return plans
+
+    def write(self) -> None:
+        self.sampler.write_folded(self.run_dir / "stacks.folded")
+
+        plans = self._plans()
+        with (self.run_dir / "queries.tsv").open("w", encoding="utf-8") as fh:
+            fh.write("seq\tlatency_s\trows\tquery\n")
+            for seq, latency, rows, query in plans:
+                text = " ".join(query.split())[:500]
+                latency = "" if latency is None else f"{latency:.6f}"
+                fh.write(f"{seq}\t{latency}\t{'' if rows is None else rows}\t{text}\n")
+
+        slowest = sorted(
+            (p for p in plans if p[1] is not None), key=lambda p: p[1], reverse=True
+        )
+        lines = [
+            f"wall time   {self.elapsed:.2f} s",
+            f"samples     {self.sampler.samples:,} every "
+            f"{self.sampler.interval * 1000:g} ms",
+            f"statements  {len(plans):,} ({len(slowest):,} profiled)",
+            "",
+            "hottest frames (self and total share of samples)",
+        ]
+        samples = max(self.sampler.samples, 1)
+        for frame, own, total in self.sampler.top_frames():
+            lines.append(f"{own / samples:>7.1%} {total / samples:>7.1%}  {frame}")
+        for seq, latency, rows, query in slowest[:SUMMARY_QUERIES]:
+            profile = json.loads(
+                (self.plans_dir / f"{seq:06d}.json").read_text(encoding="utf-8")
+            )
+            lines += [
+                "",
+                f"statement {seq}: {latency * 1000:.1f} ms, {rows or 0:,} rows",
+                " ".join(query.split())[:200],
+                *render_plan(profile),
+            ]
+        (self.run_dir / "summary.txt").write_text(
+            "\n".join(lines) + "\n", encoding="utf-8"
+        )
+
+        for seq, *_ in slowest[self.keep_plans :]:
+            (self.plans_dir / f"{seq:06d}.json").unlink()
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample stacks and DuckDB plans of this run into --profile-dir",
+    )
+    parser.add_argument("--profile-dir", type=Path, default=DEFAULT_PROFILE_DIR)
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Seconds between stack samples",
+    )
+
+
+def profiled(main: Callable) -> Callable:
+    """
+    Give a main function the --profile options shared by every entry point.
+
+    The options are taken out of argv before main parses the rest, so the
+    script's own parser never sees them. Without --profile, or inside a run
+    that is already profiled, main runs as is.
+    """
+
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    add_profile_arguments(parser)
+
+    @functools.wraps(main)
+    def wrapper(argv: Optional[list[str]] = None):
+        args = sys.argv[1:] if argv is None else list(argv)
+        options, rest = parser.parse_known_args(args)
+        if rest == args:
+            rest = argv
+        if not options.profile or _active is not None:
+            return main(rest)
+        name = main.__module__.rsplit(".", 1)[-1]
+        if name == "__main__":
+            name = Path(sys.argv[0]).stem
+        with Profiler(name, options.profile_dir, options.profile_interval):
+            return main(rest)
+
+    return wrapper
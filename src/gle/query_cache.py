@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import duckdb
+
+from gle.profiling import profiled
+
+DEFAULT_CACHE_DIR = Path("data/interim/query_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+INDEX_NAME = "index.sqlite"
+
+VERSIONS_SQL = """
+create table if not exists table_versions (
+    table_name varchar primary key,
+    version bigint not null,
+    bumped_at timestamp not null
+);
+"""
+
+INDEX_SCHEMA_SQL = """
+create table if not exists entries (
+    key text primary key,
+    query text not null,
+    sql text not null,
+    tables text not null,
+    rows integer not null,
+    bytes integer not null,
+    created_at real not null,
+    last_used real not null,
+    hits integer not null
+)
+"""
+
+# Version of every table a query reads; the exact row count is added per
+# table as a guard against writers that do not bump.
+TABLE_STATE_SQL = """
+select t.table_name, v.version, t.schema_name
+from duckdb_tables() t
+left join table_versions v on v.table_name = t.table_name
+where t.table_name in (select unnest($names::varchar[]))
+  and not t.temporary
+order by t.table_name
+"""
+
+# Results that depend on more than the tables they read are never cached.
+UNCACHEABLE = {
+    "current_date",
+    "current_time",
+    "current_timestamp",
+    "gen_random_uuid",
+    "get_current_time",
+    "get_current_timestamp",
+    "glob",
+    "now",
+    "random",
+    "read_blob",
+    "read_csv",
+    "read_csv_auto",
+    "read_json",
+    "read_json_auto",
+    "read_ndjson",
+    "read_parquet",
+    "read_text",
+    "parquet_scan",
+    "setseed",
+    "sqlite_scan",
+    "uuid",
+}
+
+_STRING = re.compile(r"[eE]?'(?:[^']|'')*'")
+_QUOTED = re.compile(r'"(?:[^"]|"")*"')
+_TOKEN_END = re.compile(r"\s|--|/\*")
+_PARAMETER = re.compile(r"\$\d+")
+
+
+def _tokens(sql: str) -> List[str]:
+    tokens = duckdb.tokenize(sql)
+    ends = [start for start, _ in tokens[1:]] + [len(sql)]
+    parts = []
+    for (start, kind), end in zip(tokens, ends):
+        text = sql[start:end]
+        quoted = _STRING if kind == duckdb.token_type.string_const else _QUOTED
+        match = quoted.match(sql, start)
+        if match and match.end() <= end:
+            parts.append(match.group(0))
+        else:
+            parts.append(_TOKEN_END.split(text, maxsplit=1)[0].lower())
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return parts
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical text of a query for the cache key.
+
+    The query goes through DuckDB's own tokenizer, so comments, spacing and
+    a trailing semicolon drop out and keywords and unquoted identifiers are
+    lowercased; string literals and quoted identifiers are kept verbatim.
+    """
+
+    return " ".join(_tokens(sql))
+
+
+def _without_parameters(sql: str) -> str:
+    """
+    The query with every ?, $1 or $name parameter replaced by null, which is
+    enough for DuckDB to bind it and report the tables it reads.
+    """
+
+    parts = _tokens(sql)
+    out = []
+    for i, part in enumerate(parts):
+        if part == "$" and i + 1 < len(parts):
+            continue
+        if part == "?" or _PARAMETER.fullmatch(part) or (i and parts[i - 1] == "$"):
+            out.append("null")
+        else:
+            out.append(part)
+    return " ".join(out)
+
+
+def bump_table_versions(con: duckdb.DuckDBPyConnection, *tables: str) -> None:
+    """
+    Mark tables as changed, which retires every cached result that read them.
+
+    Loaders call this in the same connection, and where they use one in the
+    same transaction, as the write itself.
+    """
+
+    con.execute(VERSIONS_SQL)
+    con.executemany(
+        """
+        insert into table_versions values (?, 1, now()::timestamp)
+        on conflict (table_name) do update set
+            version = table_versions.version + 1,
+            bumped_at = excluded.bumped_at
+        """,
+        [[t] for t in tables],
+    )
+
+
+def _table_exists(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return (
+        con.execute(
+            "select 1 from information_schema.tables where table_name = ?", [name]
+        ).fetchone()
+        is not None
+    )
+
+
+def table_state(
+    con: duckdb.DuckDBPyConnection, sql: str
+) -> Optional[List[Tuple[str, int, int]]]:
+    """
+    (table, version, rows) for every table the query reads, views expanded.
+
+    None when the query cannot be cached: it is not a plain read, it calls
+    a file reader or a volatile function, reads no table, reads a table no
+    loader has ever bumped, or DuckDB cannot list the tables it reads.
+    """
+
+    normalized = normalize_sql(sql)
+    first = normalized.split(" ", 1)[0]
+    if first not in ("select", "with", "from", "(") or UNCACHEABLE.intersection(
+        re.findall(r"[a-z_]+", normalized)
+    ):
+        return None
+    if not _table_exists(con, "table_versions"):
+        return None
+    try:
+        names = sorted(con.get_table_names(_without_parameters(sql)))
+    except duckdb.Error:  # some using joins do not bind without a catalog
+        return None
+    tables = con.execute(TABLE_STATE_SQL, {"names": names}).fetchall()
+    if not names or len(tables) != len(names) or any(v is None for _, v, _ in tables):
+        return None
+    # estimated_size misses deletes, count(*) does not
+    return [
+        (
+            name,
+            version,
+            con.execute(
+                'select count(*) from "{}"."{}"'.format(
+                    schema.replace('"', '""'), name.replace('"', '""')
+                )
+            ).fetchone()[0],
+        )
+        for name, version, schema in tables
+    ]
+
+
+class QueryCache:
+    """
+    Memoized read queries, stored as Parquet and evicted least recently used.
+
+    A result is keyed on the normalized SQL, its parameters and the version
+    and row count of every table it reads, so an ingest that bumps a table
+    version makes the next call recompute. The index is a small SQLite file
+    next to the results, shared by every process that points at the same
+    directory; total size stays under max_bytes.
+    """
+
+    def __init__(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.con = con
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        index = self._index()
+        try:
+            index.execute("pragma journal_mode = wal")
+            index.execute(INDEX_SCHEMA_SQL)
+        finally:
+            index.close()
+
+    def _index(self) -> sqlite3.Connection:
+        return sqlite3.connect(
+            str(self.cache_dir / INDEX_NAME), timeout=60, isolation_level=None
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def query(self, sql: str, params: Optional[Sequence[Any] | Dict] = None):
+        """
+        Result of a read query as a pyarrow Table, from the cache when valid.
+        """
+
+        import pyarrow.parquet as pq
+
+        state = table_state(self.con, sql)
+        if state is None:
+            self.bypassed += 1
+            return self.con.execute(sql, params).fetch_arrow_table()
+
+        query = hashlib.sha256(
+            json.dumps([normalize_sql(sql), params], default=str).encode("utf-8")
+        ).hexdigest()
+        key = hashlib.sha256(json.dumps([query, state]).encode("utf-8")).hexdigest()[
+            :32
+        ]
+
+        index = self._index()
+        try:
+            if index.execute("select 1 from entries where key = ?", [key]).fetchone():
+                try:
+                    table = pq.read_table(self._path(key))
+                except (OSError, ValueError):  # evicted by another process
+                    index.execute("delete from entries where key = ?", [key])
+                else:
+                    index.execute(
+                        "update entries set last_used = ?, hits = hits + 1 "
+                        "where key = ?",
+                        [self.clock(), key],
+                    )
+                    self.hits += 1
+                    return table
+
+            self.misses += 1
+            table = self.con.execute(sql, params).fetch_arrow_table()
+            self._store(index, key, query, sql, state, table)
+            return table
+        finally:
+            index.close()
+
+    def fetchall(
+        self, sql: str, params: Optional[Sequence[Any] | Dict] = None
+    ) -> List[tuple]:
+        table = self.query(sql, params)
+        return list(zip(*(column.to_pylist() for column in table.columns)))
+
+    def df(self, sql: str, params: Optional[Sequence[Any] | Dict] = None):
+        return self.query(sql, params).to_pandas()
+
+    def _store(self, index, key, query, sql, state, table) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self._path(key)
+        tmp = path.with_name(path.name + ".part")
+        try:
+            pq.write_table(table, tmp, compression="zstd")
+        except pa.ArrowException:  # a type Parquet cannot hold
+            tmp.unlink(missing_ok=True)
+            return
+        size = tmp.stat().st_size
+        if size > self.max_bytes:
+            tmp.unlink()
+            return
+        tmp.replace(path)
+
+        now = self.clock()
+        index.execute("begin immediate")
+        try:
+            # results of the same query over older table versions are dead
+            stale = index.execute(
+                "select key from entries where query = ? and key != ?", [query, key]
+            ).fetchall()
+            index.executemany(
+                "delete from entries where key = ?", [(k,) for (k,) in stale]
+            )
+            index.execute(
+                "insert or replace into entries values (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                [key, query, sql, json.dumps(state), table.num_rows, size, now, now],
+            )
+            total = index.execute("select sum(bytes) from entries").fetchone()[0]
+            evicted = []
+            for old_key, old_bytes in index.execute(
+                "select key, bytes from entries where key != ? order by last_used",
+                [key],
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                evicted.append((old_key,))
+                total -= old_bytes
+            index.executemany("delete from entries where key = ?", evicted)
+            stale += evicted
+            index.execute("commit")
+        except sqlite3.Error:
+            index.execute("rollback")
+            raise
+        for (old_key,) in stale:
+            self._path(old_key).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, int]:
+        index = self._index()
+        try:
+            entries, size = index.execute(
+                "select count(*), coalesce(sum(bytes), 0) from entries"
+            ).fetchone()
+        finally:
+            index.close()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+        }
+
+    def clear(self) -> int:
+        index = self._index()
+        try:
+            keys = [k for (k,) in index.execute("select key from entries")]
+            index.execute("delete from entries")
+        finally:
+            index.close()
+        for key in keys:
+            self._path(key).unlink(missing_ok=True)
+        return len(keys)
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    # imported here because gate0_check itself uses the cache
+    from gle.gate0_check import DEFAULT_DUCKDB_PATH
+
+    parser = argparse.ArgumentParser(
+        description="Table version aware cache of read query results."
+    )
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    actions = parser.add_subparsers(dest="action", required=True)
+
+    run = actions.add_parser("query", help="Run a query through the cache")
+    run.add_argument("sql")
+
+    actions.add_parser("stats", help="Show entries and size")
+    actions.add_parser("clear", help="Drop every cached result")
+    actions.add_parser("versions", help="Show the table versions")
+
+    bump = actions.add_parser(
+        "bump", help="Bump table versions, e.g. after a manual change"
+    )
+    bump.add_argument("tables", nargs="+")
+
+    args = parser.parse_args(argv)
+
+    con = duckdb.connect(str(args.duckdb), read_only=args.action != "bump")
+    try:
+        cache = QueryCache(con, args.cache_dir, args.max_bytes)
+        if args.action == "query":
+            started = time.perf_counter()
+            table = cache.query(args.sql)
+            elapsed = time.perf_counter() - started
+            print(table.slice(0, 20).to_pandas().to_string(index=False))
+            outcome = [k for k in ("hits", "misses", "bypassed") if cache.stats()[k]]
+            print(f"{table.num_rows:,} rows in {elapsed * 1000:.1f} ms ({outcome[0]})")
+        elif args.action == "stats":
+            for name, value in cache.stats().items():
+                print(f"{name:<10} {value:,}")
+        elif args.action == "clear":
+            print(f"Removed {cache.clear()} cached results")
+        elif args.action == "versions":
+            if _table_exists(con, "table_versions"):
+                for name, version, bumped_at in con.execute(
+                    "select * from table_versions order by table_name"
+                ).fetchall():
+                    print(f"{name:<28} v{version:<6} {bumped_at}")
+        else:
+            bump_table_versions(con, *args.tables)
+            print(f"Bumped {', '.join(args.tables)}")
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+from gle.profiling import profiled
+
+DEFAULT_STATE_PATH = Path("data/interim/ratelimit.sqlite")
+STATE_PATH_ENV = "GLE_RATELIMIT_DB"
+
+# Published quotas, as comma separated "requests/seconds" buckets. The New
+# York Times asks for twelve seconds between calls and 500 calls a day,
+# Hardcover allows 60 a minute, spaced here to one a second.
+DEFAULT_QUOTAS = {
+    "nyt": "1/12,500/86400",
+    "hardcover": "1/1",
+}
+QUOTA_ENV = {"nyt": "NYT_RATE_LIMIT", "hardcover": "HARDCOVER_RATE_LIMIT"}
+
+SCHEMA_SQL = """
+create table if not exists buckets (
+    key text not null,
+    bucket integer not null,
+    tat real not null,
+    primary key (key, bucket)
+)
+"""
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Quota:
+    """
+    At most requests calls in any window of seconds, all usable at once.
+    """
+
+    requests: int
+    seconds: float
+
+    @property
+    def interval(self) -> float:
+        return self.seconds / self.requests
+
+    @property
+    def tolerance(self) -> float:
+        return (self.requests - 1) * self.interval
+
+
+def parse_quotas(spec: str) -> List[Quota]:
+    """
+    Parse "1/12,500/86400" into quotas. "off" or an empty string is none.
+    """
+
+    spec = spec.strip()
+    if spec.lower() in ("", "off", "none"):
+        return []
+    quotas = []
+    for part in spec.split(","):
+        requests, _, seconds = part.strip().partition("/")
+        quota = Quota(int(requests), float(seconds or 1))
+        if quota.requests < 1 or quota.seconds <= 0:
+            raise ValueError(f"Invalid quota {part!r}")
+        quotas.append(quota)
+    return quotas
+
+
+def key_id(service: str, api_key: str) -> str:
+    """
+    Bucket name for one API key. Only a digest of the key is stored.
+    """
+
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    return f"{service}:{digest}"
+
+
+class RateLimiter:
+    """
+    Quota budget for one API key shared by every thread and process.
+
+    The state is one SQLite row per quota holding the theoretical arrival
+    time of the next call (the generic cell rate algorithm). acquire takes
+    the write lock only long enough to reserve the earliest free slot and
+    then sleeps outside it, so callers are served in the order they asked
+    and nobody spins or starves. Wall clock time is used because the
+    slots are compared across processes.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        quotas: Sequence[Quota],
+        path: Path = DEFAULT_STATE_PATH,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.key = key
+        self.quotas = list(quotas)
+        self.path = Path(path)
+        self.clock = clock
+        self.sleep = sleep
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        if not self._ready:
+            con.execute("pragma journal_mode = wal")
+            con.execute(SCHEMA_SQL)
+            self._ready = True
+        return con
+
+    def reserve(self, max_wait: Optional[float] = None) -> float:
+        """
+        Claim the next slot and return the seconds until it starts.
+
+        When the wait would exceed max_wait nothing is claimed and
+        RuntimeError is raised.
+        """
+
+        if not self.quotas:
+            return 0.0
+        con = self._connect()
+        try:
+            con.execute("begin immediate")
+            stored = dict(
+                con.execute(
+                    "select bucket, tat from buckets where key = ?", [self.key]
+                ).fetchall()
+            )
+            now = self.clock()
+            tats = [stored.get(i, now) for i in range(len(self.quotas))]
+            start = max(
+                [now] + [tat - q.tolerance for tat, q in zip(tats, self.quotas)]
+            )
+            wait = start - now
+            if max_wait is not None and wait > max_wait:
+                con.execute("rollback")
+                raise RuntimeError(
+                    f"Rate limit {self.key}: next slot in {wait:.1f}s "
+                    f"exceeds max wait {max_wait:.1f}s"
+                )
+            con.executemany(
+                "insert or replace into buckets values (?, ?, ?)",
+                [
+                    (self.key, i, max(tat, start) + q.interval)
+                    for i, (tat, q) in enumerate(zip(tats, self.quotas))
+                ],
+            )
+            con.execute("commit")
+        finally:
+            con.close()
+        return wait
+
+    def acquire(self, max_wait: Optional[float] = None) -> float:
+        """
+        Block until this caller may send one request. Returns the wait.
+        """
+
+        wait = self.reserve(max_wait)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def backoff(self, seconds: float) -> None:
+        """
+        Push every slot of this key at least seconds into the future.
+
+        Used when the server answers 429 anyway, for instance because
+        another machine shares the key, so all local callers pause.
+        """
+
+        if not self.quotas:
+            return
+        con = self._connect()
+        try:
+            con.execute("begin immediate")
+            now = self.clock()
+            for i, q in enumerate(self.quotas):
+                floor = now + seconds + q.tolerance
+                con.execute(
+                    "insert into buckets values (?, ?, ?) "
+                    "on conflict (key, bucket) do update "
+                    "set tat = max(tat, excluded.tat)",
+                    [self.key, i, floor],
+                )
+            con.execute("commit")
+        finally:
+            con.close()
+
+    def call(self, send: Callable[[], T], retries: int = 5) -> T:
+        """
+        Acquire, send, and on a 429 back off by Retry-After and try again.
+
+        send returns a response with status_code and headers. After
+        retries throttled answers the last response is returned as is.
+        """
+
+        for _ in range(retries):
+            self.acquire()
+            response = send()
+            if getattr(response, "status_code", None) != 429:
+                return response
+            self.backoff(_retry_after(response))
+        self.acquire()
+        return send()
+
+
+def _retry_after(response) -> float:
+    try:
+        return max(float(response.headers.get("Retry-After", 1)), 0.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def state_path() -> Path:
+    return Path(os.getenv(STATE_PATH_ENV) or DEFAULT_STATE_PATH)
+
+
+def quotas_for(service: str) -> List[Quota]:
+    env = QUOTA_ENV.get(service)
+    spec = os.getenv(env) if env else None
+    return parse_quotas(spec if spec is not None else DEFAULT_QUOTAS.get(service, ""))
+
+
+def limiter_for(service: str, api_key: str) -> RateLimiter:
+    """
+    Shared limiter for one service and key.
+
+    Quotas come from NYT_RATE_LIMIT or HARDCOVER_RATE_LIMIT when set,
+    otherwise DEFAULT_QUOTAS; the state file from GLE_RATELIMIT_DB.
+    """
+
+    return RateLimiter(key_id(service, api_key), quotas_for(service), state_path())
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Inspect or reset the shared API rate limiter state."
+    )
+    parser.add_argument("--path", type=Path, default=None)
+    actions = parser.add_subparsers(dest="action", required=True)
+    actions.add_parser("show", help="Quotas and how far ahead each bucket is reserved")
+    reset = actions.add_parser("reset", help="Forget the state of one or all keys")
+    reset.add_argument("--key", help="Bucket key, default all")
+    args = parser.parse_args(argv)
+
+    path = args.path or state_path()
+    if not path.exists():
+        print(f"No rate limiter state at {path}")
+        return
+    con = sqlite3.connect(str(path), timeout=60)
+    try:
+        if args.action == "show":
+            now = time.time()
+            for service, default in DEFAULT_QUOTAS.items():
+                print(f"{service:<10} quota {os.getenv(QUOTA_ENV[service]) or default}")
+            for key, bucket, tat in con.execute(
+                "select key, bucket, tat from buckets order by key, bucket"
+            ):
+                print(
+                    f"{key:<24} bucket {bucket}  reserved for {max(tat - now, 0):8.1f}s"
+                )
+        else:
+            if args.key:
+                con.execute("delete from buckets where key = ?", [args.key])
+            else:
+                con.execute("delete from buckets")
+            con.commit()
+            print(f"Reset {args.key or 'all keys'} in {path}")
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
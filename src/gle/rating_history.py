@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+
+import duckdb
+
+from gle.catalogue import DEFAULT_MANIFEST_PATH, read_ingest_manifest
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+
+SCHEMA_SQL = """
+create table if not exists goodreads_rating_versions (
+    version integer primary key,
+    ingest varchar,
+    dump_date date not null,
+    recorded_at timestamp not null,
+    rows integer not null,
+    changed integer not null,
+    removed integer not null
+);
+
+create table if not exists goodreads_rating_history (
+    isbn13 varchar not null,
+    valid_from integer not null,
+    valid_to integer,
+    book_id integer,
+    average_rating double,
+    ratings_count integer,
+    primary key (isbn13, valid_from)
+);
+"""
+
+# A history row holds the ratings of one isbn from version valid_from up
+# to, but not including, valid_to; the open row has no valid_to.
+AS_OF_SQL = """
+select isbn13, book_id, average_rating, ratings_count
+from goodreads_rating_history
+where valid_from <= $version and (valid_to is null or valid_to > $version)
+"""
+
+# Close the open rows whose ratings changed or whose isbn left the dump.
+CLOSE_SQL = """
+update goodreads_rating_history h
+set valid_to = $version
+where h.valid_to is null
+  and not exists (
+      select 1
+      from goodreads g
+      where g.isbn13 = h.isbn13
+        and g.book_id is not distinct from h.book_id
+        and g.average_rating is not distinct from h.average_rating
+        and g.ratings_count is not distinct from h.ratings_count
+  )
+"""
+
+# Open a row for every isbn of the dump left without one: new or changed.
+OPEN_SQL = """
+insert into goodreads_rating_history
+select g.isbn13, $version, null, g.book_id, g.average_rating, g.ratings_count
+from goodreads g
+anti join (
+    select isbn13 from goodreads_rating_history where valid_to is null
+) o using (isbn13)
+"""
+
+# Only isbns with a row starting or ending between the two versions can
+# differ, so the delta reads the churn of the interval and not the
+# catalogue.
+DELTA_SQL = """
+with touched as (
+    select distinct isbn13
+    from goodreads_rating_history
+    where (valid_from > $lo and valid_from <= $hi)
+       or (valid_to > $lo and valid_to <= $hi)
+),
+a as (
+    select *
+    from goodreads_rating_history
+    where valid_from <= $from and (valid_to is null or valid_to > $from)
+      and isbn13 in (select isbn13 from touched)
+),
+b as (
+    select *
+    from goodreads_rating_history
+    where valid_from <= $to and (valid_to is null or valid_to > $to)
+      and isbn13 in (select isbn13 from touched)
+),
+days as (
+    select date_diff(
+        'day',
+        (select dump_date from goodreads_rating_versions where version = $from),
+        (select dump_date from goodreads_rating_versions where version = $to)
+    ) as n
+)
+select
+    coalesce(b.isbn13, a.isbn13) as isbn13,
+    case
+        when a.isbn13 is null then 'added'
+        when b.isbn13 is null then 'removed'
+        else 'changed'
+    end as change,
+    a.ratings_count as ratings_count_from,
+    b.ratings_count as ratings_count_to,
+    b.ratings_count - a.ratings_count as ratings_delta,
+    a.average_rating as average_rating_from,
+    b.average_rating as average_rating_to,
+    (b.ratings_count - a.ratings_count) / nullif((select n from days), 0)
+        as ratings_per_day
+from a
+full outer join b on a.isbn13 = b.isbn13
+where (a.book_id, a.average_rating, a.ratings_count)
+      is distinct from (b.book_id, b.average_rating, b.ratings_count)
+order by isbn13
+"""
+
+
+@dataclass(frozen=True)
+class RatingVersion:
+    version: int
+    ingest: Optional[str]
+    dump_date: str
+    rows: int
+    changed: int
+    removed: int
+
+
+def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
+    con.execute(SCHEMA_SQL)
+
+
+def list_versions(con: duckdb.DuckDBPyConnection) -> List[RatingVersion]:
+    ensure_schema(con)
+    return [
+        RatingVersion(*row)
+        for row in con.execute(
+            """
+            select version, ingest, strftime(dump_date, '%Y-%m-%d'), rows,
+                   changed, removed
+            from goodreads_rating_versions
+            order by version
+            """
+        ).fetchall()
+    ]
+
+
+def record_version(
+    con: duckdb.DuckDBPyConnection,
+    dump_date: Optional[str] = None,
+    ingest: Optional[str] = None,
+) -> RatingVersion:
+    """
+    Record the current goodreads table as the next rating version.
+
+    Only rows whose book id, average rating or ratings count differ from
+    the previous version are stored, so the history grows with churn and
+    not with the size of the catalogue. Recording the same ingest twice
+    returns the existing version. dump_date is the day the dump was taken
+    (default today) and may not go back before the latest version.
+    """
+
+    ensure_schema(con)
+    dump_date = dump_date or date.today().isoformat()
+    versions = list_versions(con)
+    latest = versions[-1] if versions else None
+    if latest and ingest and latest.ingest == ingest:
+        return latest
+    if latest and dump_date < latest.dump_date:
+        raise RuntimeError(
+            f"Dump date {dump_date} is before version {latest.version} "
+            f"({latest.dump_date})"
+        )
+
+    version = latest.version + 1 if latest else 1
+    con.execute("begin transaction")
+    try:
+        con.execute(CLOSE_SQL, {"version": version})
+        con.execute(OPEN_SQL, {"version": version})
+        changed, removed = con.execute(
+            """
+            select
+                count(*) filter (where valid_from = $version),
+                count(*) filter (
+                    where valid_to = $version
+                      and isbn13 not in (select isbn13 from goodreads)
+                )
+            from goodreads_rating_history
+            where valid_from = $version or valid_to = $version
+            """,
+            {"version": version},
+        ).fetchone()
+        rows = con.execute("select count(*) from goodreads").fetchone()[0]
+        con.execute(
+            """
+            insert into goodreads_rating_versions
+            values (?, ?, ?::date, now()::timestamp, ?, ?, ?)
+            """,
+            [version, ingest, dump_date, rows, changed, removed],
+        )
+        bump_table_versions(
+            con, "goodreads_rating_history", "goodreads_rating_versions"
+        )
+        con.execute("commit")
+    except duckdb.Error:
+        con.execute("rollback")
+        raise
+    return RatingVersion(version, ingest, dump_date, rows, changed, removed)
+
+
+def resolve_version(
+    con: duckdb.DuckDBPyConnection,
+    version: Optional[int] = None,
+    on: Optional[str] = None,
+) -> int:
+    """
+    The given version, the latest one dumped on or before a date, or the
+    latest one.
+    """
+
+    ensure_schema(con)
+    if version is not None:
+        found = con.execute(
+            "select version from goodreads_rating_versions where version = ?",
+            [version],
+        ).fetchone()
+    elif on is not None:
+        found = con.execute(
+            """
+            select max(version) from goodreads_rating_versions
+            where dump_date <= ?::date
+            """,
+            [on],
+        ).fetchone()
+    else:
+        found = con.execute(
+            "select max(version) from goodreads_rating_versions"
+        ).fetchone()
+    if found is None or found[0] is None:
+        raise RuntimeError(
+            f"No rating version for {version if version is not None else on or 'latest'}"
+        )
+    return found[0]
+
+
+def ratings_as_of(
+    con: duckdb.DuckDBPyConnection,
+    version: Optional[int] = None,
+    on: Optional[str] = None,
+) -> duckdb.DuckDBPyRelation:
+    """
+    Ratings of every isbn as they were in a version, or on a dump date.
+    """
+
+    # The version is inlined rather than bound: a relation with parameters
+    # is materialized at once, a plain one stays lazy for filters and joins
+    version = resolve_version(con, version, on)
+    return con.sql(AS_OF_SQL.replace("$version", str(int(version))))
+
+
+def rating_delta(
+    con: duckdb.DuckDBPyConnection, from_version: int, to_version: int
+) -> duckdb.DuckDBPyRelation:
+    """
+    Isbns whose ratings differ between two versions, with the change in
+    ratings count and the ratings gained per day between the dumps.
+    """
+
+    from_version = resolve_version(con, from_version)
+    to_version = resolve_version(con, to_version)
+    return con.sql(
+        DELTA_SQL,
+        params={
+            "from": from_version,
+            "to": to_version,
+            "lo": min(from_version, to_version),
+            "hi": max(from_version, to_version),
+        },
+    )
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Versioned Goodreads ratings: record dumps, read as of, diff."
+    )
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    actions = parser.add_subparsers(dest="action", required=True)
+
+    record = actions.add_parser(
+        "record", help="Record the loaded goodreads table as a new version"
+    )
+    record.add_argument("--dump-date", help="Day the dump was taken (default today)")
+    record.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST_PATH)
+
+    actions.add_parser("versions", help="List versions and history size")
+
+    as_of = actions.add_parser("as-of", help="Ratings of one isbn in a version")
+    as_of.add_argument("isbn13")
+    as_of.add_argument("--version", type=int)
+    as_of.add_argument("--on", help="Latest version dumped on or before this date")
+
+    delta = actions.add_parser("delta", help="Rating changes between two versions")
+    delta.add_argument("--from", dest="from_version", type=int)
+    delta.add_argument("--to", dest="to_version", type=int)
+    delta.add_argument("--n", type=int, default=25, help="Rows to show")
+
+    args = parser.parse_args(argv)
+
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        if args.action == "record":
+            manifest = read_ingest_manifest(args.manifest)
+            v = record_version(
+                con, args.dump_date, manifest.version if manifest else None
+            )
+            print(
+                f"Version {v.version} ({v.dump_date}): {v.rows:,} rows, "
+                f"{v.changed:,} new or changed, {v.removed:,} removed"
+            )
+        elif args.action == "versions":
+            versions = list_versions(con)
+            for v in versions:
+                print(
+                    f"{v.version:>4}  {v.dump_date}  {v.rows:>10,} rows  "
+                    f"{v.changed:>9,} changed  {v.removed:>7,} removed  "
+                    f"{v.ingest or ''}"
+                )
+            stored = con.execute(
+                "select count(*) from goodreads_rating_history"
+            ).fetchone()[0]
+            full = sum(v.rows for v in versions)
+            print(
+                f"{stored:,} history rows for {len(versions)} versions "
+                f"({full:,} rows as full copies)"
+            )
+        elif args.action == "as-of":
+            version = resolve_version(con, args.version, args.on)
+            row = con.execute(
+                AS_OF_SQL + " and isbn13 = $isbn",
+                {"version": version, "isbn": args.isbn13},
+            ).fetchone()
+            print(f"version {version}: {row if row else 'not in the dump'}")
+        else:
+            to_version = args.to_version or resolve_version(con)
+            from_version = args.from_version or to_version - 1
+            changes = rating_delta(con, from_version, to_version).fetchall()
+            for isbn13, change, rc_from, rc_to, diff, _, _, per_day in changes[
+                : args.n
+            ]:
+                rate = f"{per_day:+.2f}/day" if per_day is not None else ""
+                print(
+                    f"{isbn13}  {change:<8} {rc_from or '-':>8} -> {rc_to or '-':<8} "
+                    f"{diff if diff is not None else '':>7}  {rate}"
+                )
+            print(
+                f"{len(changes):,} isbns changed from version {from_version} "
+                f"to {to_version}"
+            )
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
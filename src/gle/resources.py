@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+
+
+@dataclass(frozen=True)
+class ResourceProfile:
+    """
+    DuckDB resource settings for a connection.
+
+    Unset values keep the DuckDB defaults. memory_limit takes DuckDB size
+    strings such as 2GB or 512MB. When temp_directory is set, operators that
+    exceed the memory limit spill there instead of failing.
+    """
+
+    memory_limit: Optional[str] = None
+    threads: Optional[int] = None
+    temp_directory: Optional[Path] = None
+    preserve_insertion_order: bool = True
+
+    def apply(self, con: duckdb.DuckDBPyConnection) -> None:
+        if self.memory_limit:
+            con.execute(f"set memory_limit = '{self.memory_limit}'")
+        if self.threads:
+            con.execute(f"set threads = {int(self.threads)}")
+        if self.temp_directory:
+            self.temp_directory.mkdir(parents=True, exist_ok=True)
+            con.execute(f"set temp_directory = '{self.temp_directory.as_posix()}'")
+        if not self.preserve_insertion_order:
+            # Lets large inserts stream without buffering rows to keep order
+            con.execute("set preserve_insertion_order = false")
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident memory of this process, or None where unsupported.
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _directory_bytes(path: Path) -> int:
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file():
+                total += entry.stat().st_size
+        except FileNotFoundError:  # removed while we looked
+            pass
+    return total
+
+
+class SpillMonitor:
+    """
+    Peak size of the DuckDB spill directory while a block runs.
+
+    DuckDB removes its temporary files as soon as an operator is done, so
+    their size read after a load is almost always 0. A daemon thread adds
+    up the files in the connection's temp_directory every interval seconds
+    instead and keeps the largest total in peak.
+    """
+
+    def __init__(self, con: duckdb.DuckDBPyConnection, interval: float = 0.1) -> None:
+        setting = con.execute("select current_setting('temp_directory')").fetchone()[0]
+        self.directory = Path(setting) if setting else None
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="gle-spill-monitor", daemon=True
+        )
+
+    def _sample(self) -> None:
+        if self.directory is not None:
+            self.peak = max(self.peak, _directory_bytes(self.directory))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "SpillMonitor":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def format_bytes(value: Optional[int]) -> str:
+    if value is None:
+        return "n a"
+    size = float(value)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} GB"
@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Protocol, Sequence
+
+import duckdb
+import numpy as np
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+
+DEFAULT_MATRIX_DIR = Path("data/processed/feature_matrix")
+DEFAULT_SCORES_TABLE = "green_light_scores"
+DEFAULT_BATCH_SIZE = 65_536
+
+FEATURE_COLUMNS = (
+    "weeks_on_list",
+    "peak_rank",
+    "current_rank",
+    "list_count",
+    "average_rating",
+    "log_ratings_count",
+)
+
+ISBN_DTYPE = "S13"
+ISBN_LENGTH = 13
+# One past the bottom of the longest NYT weekly list, for books never ranked
+WORST_RANK = 16.0
+META_NAME = "meta.json"
+
+
+class ScoringModel(Protocol):
+    """
+    Anything with the feature names it needs and a vectorized predict.
+
+    predict receives a float32 matrix with one row per isbn and one column
+    per name in feature_names, in that order, and returns one score per row.
+    Missing values are passed through as nan.
+    """
+
+    feature_names: Sequence[str]
+
+    def predict(self, features: np.ndarray) -> np.ndarray: ...
+
+
+@dataclass
+class LinearModel:
+    """
+    Logistic model over a weighted sum of features.
+
+    Missing values are replaced by their entry in fill, or 0 when the
+    feature has none. Used as the baseline until a trained model is plugged
+    in.
+    """
+
+    weights: Mapping[str, float]
+    bias: float = 0.0
+    fill: Mapping[str, float] = field(default_factory=dict)
+    feature_names: Sequence[str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.feature_names = tuple(self.weights)
+        self._coef = np.array(list(self.weights.values()), dtype=np.float32)
+        self._fill = np.array(
+            [self.fill.get(name, 0.0) for name in self.feature_names],
+            dtype=np.float32,
+        )
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        features = np.where(np.isnan(features), self._fill, features)
+        logits = features @ self._coef + self.bias
+        return 1.0 / (1.0 + np.exp(-logits))
+
+
+BASELINE_MODEL = LinearModel(
+    weights={
+        "weeks_on_list": 0.15,
+        "peak_rank": -0.10,
+        "list_count": 0.30,
+        "average_rating": 0.50,
+        "log_ratings_count": 0.40,
+    },
+    bias=-5.0,
+    # a rank of 0 would beat every charted book
+    fill={"peak_rank": WORST_RANK, "current_rank": WORST_RANK},
+)
+
+
+def load_model(spec: Optional[str]) -> ScoringModel:
+    """
+    Resolve a model from a module colon attribute spec.
+
+    The attribute may be a model instance or a zero argument factory.
+    None returns the baseline model.
+    """
+
+    if not spec:
+        return BASELINE_MODEL
+
+    module_name, _, attr = spec.partition(":")
+    model = getattr(importlib.import_module(module_name), attr)
+    if isinstance(model, type) or not hasattr(model, "predict"):
+        model = model()
+    return model
+
+
+FEATURES_SQL = """
+with nyt as (
+    select *
+    from {nyt_features}
+    where as_of <= coalesce($as_of::date, as_of)
+    qualify row_number() over (partition by isbn13 order by as_of desc) = 1
+)
+select
+    coalesce(nyt.isbn13, gr.isbn13)          as isbn13,
+    nyt.weeks_on_list::float                 as weeks_on_list,
+    nyt.peak_rank::float                     as peak_rank,
+    nyt.current_rank::float                  as current_rank,
+    nyt.list_count::float                    as list_count,
+    gr.average_rating::float                 as average_rating,
+    ln(1 + gr.ratings_count)::float          as log_ratings_count
+from nyt
+full outer join {goodreads} gr using (isbn13)
+where coalesce(nyt.isbn13, gr.isbn13) is not null
+order by 1
+"""
+
+# Empty stand ins so a matrix can be built before both sources are loaded
+GOODREADS_FALLBACK = (
+    "(select null::varchar as isbn13, null::double as average_rating, "
+    "null::integer as ratings_count where false)"
+)
+NYT_FEATURES_FALLBACK = (
+    "(select null::varchar as isbn13, null::date as as_of, "
+    "null::integer as weeks_on_list, null::integer as peak_rank, "
+    "null::integer as current_rank, null::integer as list_count where false)"
+)
+
+
+def _table_exists(con: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return (
+        con.execute(
+            "select 1 from information_schema.tables where table_name = ?", [name]
+        ).fetchone()
+        is not None
+    )
+
+
+def build_feature_matrix(
+    con: duckdb.DuckDBPyConnection,
+    out_dir: Path = DEFAULT_MATRIX_DIR,
+    as_of: Optional[str] = None,
+) -> int:
+    """
+    Export one float32 file per feature plus a sorted isbn13 index.
+
+    Every column is written as its own npy file so it can be memory mapped
+    on its own. Rows are sorted by isbn13, which lets single lookups binary
+    search the index instead of building a dict over millions of keys. The
+    new matrix is written next to the old one and swapped in at the end.
+    Keys longer than an isbn13 are rejected, the fixed width index would
+    cut them short.
+
+    Returns the number of rows written.
+    """
+
+    goodreads = "goodreads" if _table_exists(con, "goodreads") else GOODREADS_FALLBACK
+    nyt_features = (
+        "nyt_isbn_features"
+        if _table_exists(con, "nyt_isbn_features")
+        else NYT_FEATURES_FALLBACK
+    )
+
+    sql = FEATURES_SQL.format(goodreads=goodreads, nyt_features=nyt_features)
+    columns = con.execute(sql, {"as_of": as_of}).fetchnumpy()
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    too_long = [k for k in columns["isbn13"] if len(k) > ISBN_LENGTH]
+    if too_long:
+        raise RuntimeError(
+            f"{len(too_long):,} isbn13 keys are longer than {ISBN_LENGTH} "
+            f"characters, e.g. {too_long[0]!r}"
+        )
+    isbns = np.asarray(columns["isbn13"], dtype=ISBN_DTYPE)
+    np.save(tmp_dir / "isbn13.npy", isbns)
+    for name in FEATURE_COLUMNS:
+        values = np.ma.filled(columns[name].astype(np.float32), np.nan)
+        np.save(tmp_dir / f"{name}.npy", values)
+
+    meta = {"rows": int(len(isbns)), "columns": list(FEATURE_COLUMNS), "as_of": as_of}
+    (tmp_dir / META_NAME).write_text(json.dumps(meta), encoding="utf-8")
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp_dir.rename(out_dir)
+    return len(isbns)
+
+
+class FeatureMatrix:
+    """
+    Memory mapped, column oriented view of an exported feature matrix.
+
+    Opening is cheap, pages are only read when a batch or lookup touches
+    them, and several processes share the same page cache.
+    """
+
+    def __init__(self, matrix_dir: Path = DEFAULT_MATRIX_DIR) -> None:
+        self.matrix_dir = matrix_dir
+        self.meta = json.loads((matrix_dir / META_NAME).read_text(encoding="utf-8"))
+        self.isbns: np.ndarray = np.load(matrix_dir / "isbn13.npy", mmap_mode="r")
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return int(self.meta["rows"])
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = np.load(
+                self.matrix_dir / f"{name}.npy", mmap_mode="r"
+            )
+        return self._columns[name]
+
+    def batch(self, names: Sequence[str], start: int, stop: int) -> np.ndarray:
+        """
+        Return rows start to stop as a dense float32 matrix in names order.
+        """
+
+        out = np.empty((stop - start, len(names)), dtype=np.float32)
+        for j, name in enumerate(names):
+            out[:, j] = self.column(name)[start:stop]
+        return out
+
+    def row_index(self, isbn13: str) -> Optional[int]:
+        if len(isbn13) > ISBN_LENGTH:
+            return None
+        key = np.asarray(isbn13, dtype=ISBN_DTYPE)
+        idx = int(np.searchsorted(self.isbns, key))
+        if idx < len(self.isbns) and self.isbns[idx] == key:
+            return idx
+        return None
+
+    def lookup(self, isbn13: str, names: Sequence[str]) -> Optional[np.ndarray]:
+        """
+        Return the feature row of one isbn as a one row matrix, or None.
+        """
+
+        idx = self.row_index(isbn13)
+        if idx is None:
+            return None
+        return self.batch(names, idx, idx + 1)
+
+
+def score_matrix(
+    matrix: FeatureMatrix,
+    model: ScoringModel,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> np.ndarray:
+    """
+    Score every row of the matrix in fixed size vectorized batches.
+
+    Memory use is bounded by one dense batch regardless of matrix size.
+    """
+
+    names = tuple(model.feature_names)
+    scores = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), batch_size):
+        stop = min(start + batch_size, len(matrix))
+        scores[start:stop] = model.predict(matrix.batch(names, start, stop))
+    return scores
+
+
+def score_isbn(
+    matrix: FeatureMatrix, model: ScoringModel, isbn13: str
+) -> Optional[float]:
+    """
+    Low latency path for one isbn through the same lookup as batch scoring.
+    """
+
+    row = matrix.lookup(isbn13, tuple(model.feature_names))
+    if row is None:
+        return None
+    return float(model.predict(row)[0])
+
+
+def write_scores(
+    con: duckdb.DuckDBPyConnection,
+    isbns: np.ndarray,
+    scores: np.ndarray,
+    table: str = DEFAULT_SCORES_TABLE,
+) -> None:
+    """
+    Replace the scores table with isbn13, score and a dense rank, best first.
+
+    Equal scores share a rank and the next score takes the following one.
+    """
+
+    import pyarrow as pa
+
+    order = np.argsort(-scores, kind="stable")
+    ranked = scores[order]
+    rank = np.cumsum(np.r_[True, ranked[1:] != ranked[:-1]])[: len(ranked)]
+    scored = pa.table(
+        {
+            "isbn13": pa.array(np.asarray(isbns)[order].astype(str)),
+            "score": pa.array(ranked),
+            "rank": pa.array(rank.astype(np.int64)),
+        }
+    )
+    con.register("scored_batch", scored)
+    try:
+        con.execute(f"create or replace table {table} as select * from scored_batch")
+        bump_table_versions(con, table)
+    finally:
+        con.unregister("scored_batch")
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Score isbns for green light.")
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    parser.add_argument("--matrix-dir", type=Path, default=DEFAULT_MATRIX_DIR)
+    parser.add_argument(
+        "--model",
+        help="Model as module:attribute, instance or factory (default baseline)",
+    )
+    actions = parser.add_subparsers(dest="action", required=True)
+
+    build = actions.add_parser("build", help="Export the feature matrix from DuckDB")
+    build.add_argument("--as-of", help="Use NYT features known at this week")
+
+    batch = actions.add_parser("batch", help="Score every isbn and write to DuckDB")
+    batch.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    batch.add_argument("--table", default=DEFAULT_SCORES_TABLE)
+
+    one = actions.add_parser("isbn", help="Score a single isbn")
+    one.add_argument("isbn13")
+
+    args = parser.parse_args(argv)
+
+    if args.action == "build":
+        con = duckdb.connect(str(args.duckdb), read_only=True)
+        try:
+            rows = build_feature_matrix(con, args.matrix_dir, args.as_of)
+        finally:
+            con.close()
+        print(f"Wrote feature matrix with {rows:,} rows to {args.matrix_dir}")
+        return
+
+    model = load_model(args.model)
+    matrix = FeatureMatrix(args.matrix_dir)
+
+    if args.action == "isbn":
+        score = score_isbn(matrix, model, args.isbn13)
+        print("not in feature matrix" if score is None else f"{score:.6f}")
+        return
+
+    scores = score_matrix(matrix, model, args.batch_size)
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        write_scores(con, matrix.isbns, scores, args.table)
+    finally:
+        con.close()
+    print(f"Scored {len(scores):,} isbns into {args.table}")
+
+
+if __name__ == "__main__":
+    main()
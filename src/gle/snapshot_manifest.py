@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+@dataclass(frozen=True)
+class SnapshotRecord:
+    """
+    One fetched weekly snapshot as recorded in the manifest.
+
+    The file name is stored relative to the raw directory so the whole
+    directory can be moved or downloaded as a workflow artefact.
+    """
+
+    date: str
+    file_name: str
+    size: int
+    sha256: str
+    fetched_at: str
+    http_status: Optional[int]
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_iso_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+class SnapshotManifest:
+    """
+    Append only manifest of weekly snapshots kept next to the raw files.
+
+    Each fetch appends one json line. When a date appears more than once the
+    last line wins, so a refetch simply supersedes the earlier record. A
+    torn final line left behind by a crash is ignored on load.
+    """
+
+    def __init__(self, raw_dir: Path) -> None:
+        self.raw_dir = raw_dir
+        self.path = raw_dir / MANIFEST_NAME
+        self._records: Dict[str, SnapshotRecord] = {}
+        self._load()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+
+        with self.path.open(encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = SnapshotRecord(**json.loads(line))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+                self._records[record.date] = record
+
+    def get(self, monday_iso: str) -> Optional[SnapshotRecord]:
+        return self._records.get(monday_iso)
+
+    def records(self) -> List[SnapshotRecord]:
+        """
+        Return the current record for every date, oldest first.
+        """
+
+        return [self._records[key] for key in sorted(self._records)]
+
+    def append(self, record: SnapshotRecord) -> None:
+        self.raw_dir.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(asdict(record)) + "\n")
+            handle.flush()
+        self._records[record.date] = record
+
+    def record_file(
+        self,
+        monday_iso: str,
+        path: Path,
+        http_status: Optional[int],
+        fetched_at: Optional[datetime] = None,
+    ) -> SnapshotRecord:
+        """
+        Describe a snapshot file already on disk and append it to the manifest.
+        """
+
+        if fetched_at is None:
+            fetched_at = datetime.now(timezone.utc)
+
+        record = SnapshotRecord(
+            date=monday_iso,
+            file_name=path.name,
+            size=path.stat().st_size,
+            sha256=sha256_file(path),
+            fetched_at=fetched_at.isoformat(timespec="seconds"),
+            http_status=http_status,
+        )
+        self.append(record)
+        return record
+
+    def path_for(self, record: SnapshotRecord) -> Path:
+        return self.raw_dir / record.file_name
+
+    def is_valid(self, monday_iso: str, verify_checksum: bool = True) -> bool:
+        """
+        Check that the recorded snapshot for a date is still intact on disk.
+
+        The size check is always done. The checksum check reads the file and
+        can be skipped when only a cheap presence test is needed.
+        """
+
+        record = self.get(monday_iso)
+        if record is None:
+            return False
+
+        path = self.path_for(record)
+        if not path.exists() or path.stat().st_size != record.size:
+            return False
+
+        if verify_checksum and sha256_file(path) != record.sha256:
+            return False
+
+        return True
+
+    def valid_records(self, verify_checksum: bool = False) -> List[SnapshotRecord]:
+        return [
+            record
+            for record in self.records()
+            if self.is_valid(record.date, verify_checksum=verify_checksum)
+        ]
+
+
+def snapshot_paths(raw_dir: Path) -> List[Path]:
+    """
+    Return snapshot files in date order.
+
+    The manifest is the source of truth when present. Directories that
+    predate the manifest fall back to files whose stem is an iso date, so
+    copies such as 2025 01 13 dot copy dot json are never picked up.
+    """
+
+    manifest = SnapshotManifest(raw_dir)
+    if manifest.exists():
+        return [manifest.path_for(record) for record in manifest.valid_records()]
+
+    if not raw_dir.exists():
+        return []
+
+    return sorted(path for path in raw_dir.glob("*.json") if is_iso_date(path.stem))
+
+
+def iter_snapshot_payloads(raw_dir: Path) -> Iterator[tuple[str, dict]]:
+    """
+    Yield (date, payload) for every snapshot in date order.
+    """
+
+    for path in snapshot_paths(raw_dir):
+        yield path.stem, json.loads(path.read_text(encoding="utf-8"))
+
+
+def rebuild_manifest(raw_dir: Path) -> List[SnapshotRecord]:
+    """
+    Adopt snapshot files that have no manifest record yet.
+
+    Useful for directories filled before the manifest existed or from a
+    downloaded workflow artefact. The http status of adopted files is unknown
+    and recorded as None.
+    """
+
+    manifest = SnapshotManifest(raw_dir)
+    adopted = []
+    for path in sorted(raw_dir.glob("*.json")):
+        if not is_iso_date(path.stem) or manifest.is_valid(path.stem):
+            continue
+        fetched_at = datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
+        adopted.append(manifest.record_file(path.stem, path, None, fetched_at))
+    return adopted
@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from gle.ingest_nyt import DEFAULT_BASE_URL as NYT_UPSTREAM
+from gle.profiling import profiled
+from gle.snapshot_manifest import is_iso_date
+
+HARDCOVER_UPSTREAM = "https://api.hardcover.app/v1/graphql"
+DEFAULT_CASSETTE_DIR = Path("data/interim/standin")
+DEFAULT_PORT = 8765
+
+ISBN_PATTERN = re.compile(r"[0-9]{13}|[0-9]{9}[0-9Xx]")
+
+
+@dataclass(frozen=True)
+class StandInConfig:
+    """
+    Behaviour of the local New York Times and Hardcover stand in.
+
+    Responses come from the cassette directory, one file per week or isbn.
+    A miss is answered with a synthetic payload, or fetched from the real
+    API and written to the cassette when record is set. latency_ms and
+    jitter_ms delay every answer, error_rate answers that share with 500,
+    and rate_limit (requests per second with a burst allowance) answers
+    with 429 and a Retry-After header once the budget is spent.
+    """
+
+    cassette_dir: Path = DEFAULT_CASSETTE_DIR
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit: Optional[float] = None
+    burst: int = 1
+    retry_after: float = 1.0
+    synthetic: bool = True
+    record: bool = False
+    seed: Optional[int] = None
+
+
+class TokenBucket:
+    """
+    Requests per second budget shared by all handler threads.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.stamp) * self.rate
+            )
+            self.stamp = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def synthetic_overview(monday_iso: str, lists: int = 4, books: int = 15) -> Dict:
+    """
+    Deterministic full overview payload with the fields the pipeline reads.
+    """
+
+    seed = int(hashlib.sha256(monday_iso.encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    result_lists = []
+    for li in range(lists):
+        entries = []
+        for rank in range(1, books + 1):
+            n = rng.randrange(10**8)
+            entries.append(
+                {
+                    "rank": rank,
+                    "primary_isbn13": f"97800{n:08d}",
+                    "primary_isbn10": f"00{n:08d}",
+                    "title": f"SYNTHETIC TITLE {n}",
+                    "author": f"Author {n % 997}",
+                    "isbns": [{"isbn13": f"97800{n:08d}", "isbn10": f"00{n:08d}"}],
+                }
+            )
+        result_lists.append(
+            {
+                "list_name": f"Synthetic List {li}",
+                "list_name_encoded": f"synthetic-list-{li}",
+                "books": entries,
+            }
+        )
+    return {
+        "status": "OK",
+        "results": {"published_date": monday_iso, "lists": result_lists},
+    }
+
+
+def synthetic_search(isbn: str) -> Dict:
+    """
+    GraphQL search response with one hit for the isbn.
+    """
+
+    n = int(hashlib.sha256(isbn.encode()).hexdigest()[:6], 16)
+    document = {
+        "id": n,
+        "title": f"Synthetic Title {n}",
+        "isbns": [isbn],
+        "rating": round(3 + (n % 200) / 100, 2),
+        "ratings_count": n % 5000,
+        "contributions": [{"author": {"name": f"Author {n % 997}"}}],
+    }
+    return {
+        "data": {
+            "search": {
+                "results": {"found": 1, "hits": [{"document": document}]},
+            }
+        }
+    }
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: StandInConfig) -> None:
+        super().__init__(address, StandInHandler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.bucket = (
+            TokenBucket(config.rate_limit, config.burst) if config.rate_limit else None
+        )
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "misses": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def chance(self, rate: float) -> bool:
+        with self.lock:
+            return self.rng.random() < rate
+
+    def delay(self) -> float:
+        cfg = self.config
+        with self.lock:
+            jitter = (
+                self.rng.uniform(-cfg.jitter_ms, cfg.jitter_ms) if cfg.jitter_ms else 0
+            )
+        return max(cfg.latency_ms + jitter, 0) / 1000
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    # ── plumbing ───────────────────────────────────────────────────
+    def _send(self, status: int, body: bytes, headers: Optional[Dict] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _gate(self) -> bool:
+        """
+        Apply rate limit, latency and injected errors. False when answered.
+        """
+
+        server = self.server
+        server.count("requests")
+        if server.bucket and not server.bucket.take():
+            server.count("throttled")
+            retry = server.config.retry_after
+            body = json.dumps({"fault": "Rate limit exceeded"}).encode()
+            self._send(429, body, {"Retry-After": f"{retry:g}"})
+            return False
+        time.sleep(server.delay())
+        if server.config.error_rate and server.chance(server.config.error_rate):
+            server.count("errors")
+            self._send(500, b'{"fault": "injected error"}')
+            return False
+        return True
+
+    def _cassette(self, kind: str, name: str) -> Optional[Path]:
+        """
+        Cassette file for one week or isbn, None if it would leave its directory.
+        """
+
+        root = (self.server.config.cassette_dir / kind).resolve()
+        path = (root / f"{name}.json").resolve()
+        return path if path.parent == root else None
+
+    def _replay(self, path: Path, upstream) -> Optional[bytes]:
+        if path.exists():
+            return path.read_bytes()
+        self.server.count("misses")
+        if self.server.config.record:
+            body = upstream()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".part")
+            tmp.write_bytes(body)
+            tmp.replace(path)
+            return body
+        return None
+
+    # ── routes ─────────────────────────────────────────────────────
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/_stats":
+            with self.server.lock:
+                body = json.dumps(self.server.stats).encode()
+            self._send(200, body)
+            return
+        if not url.path.endswith("/lists/full-overview.json"):
+            self._send(404, b'{"fault": "unknown route"}')
+            return
+        query = parse_qs(url.query)
+        monday = (query.get("published_date") or ["latest"])[0]
+        cassette = (
+            self._cassette("nyt", monday)
+            if monday == "latest" or is_iso_date(monday)
+            else None
+        )
+        if cassette is None:
+            self._send(400, b'{"fault": "published_date must be YYYY-MM-DD"}')
+            return
+        if not self._gate():
+            return
+
+        def upstream() -> bytes:
+            import requests
+
+            response = requests.get(
+                f"{NYT_UPSTREAM}/lists/full-overview.json",
+                params={k: v[0] for k, v in query.items()},
+                timeout=30,
+            )
+            response.raise_for_status()
+            return response.content
+
+        body = self._replay(cassette, upstream)
+        if body is None and self.server.config.synthetic:
+            body = json.dumps(synthetic_overview(monday)).encode()
+        if body is None:
+            self._send(404, b'{"fault": "not recorded"}')
+            return
+        self.server.count("ok")
+        self._send(200, body)
+
+    def do_POST(self) -> None:
+        if not urlparse(self.path).path.endswith("/graphql"):
+            self._send(404, b'{"errors": [{"message": "unknown route"}]}')
+            return
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            isbn = str((json.loads(raw or b"{}").get("variables") or {}).get("isbn"))
+        except (ValueError, AttributeError):
+            isbn = ""
+        cassette = (
+            self._cassette("hardcover", isbn) if ISBN_PATTERN.fullmatch(isbn) else None
+        )
+        if cassette is None:
+            self._send(
+                400, b'{"errors": [{"message": "variables.isbn must be an isbn"}]}'
+            )
+            return
+        if not self._gate():
+            return
+        auth = self.headers.get("Authorization", "")
+
+        def upstream() -> bytes:
+            import requests
+
+            response = requests.post(
+                HARDCOVER_UPSTREAM,
+                data=raw,
+                headers={"Authorization": auth, "Content-Type": "application/json"},
+                timeout=30,
+            )
+            response.raise_for_status()
+            return response.content
+
+        body = self._replay(cassette, upstream)
+        if body is None and self.server.config.synthetic:
+            body = json.dumps(synthetic_search(isbn)).encode()
+        if body is None:
+            body = b'{"data": {"search": {"results": {"found": 0, "hits": []}}}}'
+        self.server.count("ok")
+        self._send(200, body)
+
+
+def serve(
+    config: StandInConfig, host: str = "127.0.0.1", port: int = DEFAULT_PORT
+) -> StandInServer:
+    """
+    Start the stand in on a background thread and return the server.
+
+    Port zero picks a free port, see server.url. Call shutdown to stop.
+    """
+
+    server = StandInServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Local stand in for the New York Times and Hardcover APIs."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cassette-dir", type=Path, default=DEFAULT_CASSETTE_DIR)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, help="Requests per second")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument(
+        "--record", action="store_true", help="Fetch misses from the real APIs"
+    )
+    parser.add_argument(
+        "--no-synthetic", action="store_true", help="Answer misses with 404"
+    )
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    config = StandInConfig(
+        cassette_dir=args.cassette_dir,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        retry_after=args.retry_after,
+        synthetic=not args.no_synthetic,
+        record=args.record,
+        seed=args.seed,
+    )
+    server = StandInServer((args.host, args.port), config)
+    print(f"Stand in listening on {server.url}")
+    print(f"  export NYT_BASE_URL={server.url}/svc/books/v3")
+    print(f"  export HARDCOVER_URL={server.url}/v1/graphql")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
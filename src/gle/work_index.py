@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import duckdb
+
+from gle.gate0_check import DEFAULT_DUCKDB_PATH, DEFAULT_NYT_RAW_DIR
+from gle.isbn import normalize_isbn
+from gle.profiling import profiled
+from gle.query_cache import bump_table_versions
+from gle.snapshot_manifest import iter_snapshot_payloads
+
+DEFAULT_HARDCOVER_DIR = Path("data/raw/hardcover")
+WORK_TABLE = "isbn_work"
+
+# Resolve isbns of the given table to a Goodreads row of the same work.
+# When a work has several Goodreads editions the dedup rule of the Goodreads
+# ingest picks one: most ratings, then best rating, then lowest book id.
+WORK_MATCH_SQL = """
+select
+    n.isbn13                 as nyt_isbn13,
+    g.book_id,
+    g.average_rating         as avg_rating,
+    g.ratings_count,
+    100                      as score,
+    'work'                   as stage
+from {source} n
+join isbn_work wn on wn.isbn13 = n.isbn13
+join isbn_work wg on wg.work_id = wn.work_id
+join goodreads g on g.isbn13 = wg.isbn13
+qualify row_number() over (
+    partition by n.isbn13
+    order by g.ratings_count desc nulls last,
+             g.average_rating desc nulls last,
+             g.book_id
+) = 1
+"""
+
+
+class UnionFind:
+    """
+    Disjoint sets over isbn13 strings.
+
+    The smallest isbn13 of a set is always its root, so the resulting work
+    ids do not depend on the order in which groups were added.
+    """
+
+    def __init__(self) -> None:
+        self.parent: Dict[str, str] = {}
+
+    def find(self, item: str) -> str:
+        parent = self.parent
+        root = parent.setdefault(item, item)
+        while root != parent[root]:
+            root = parent[root]
+        while item != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a: str, b: str) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if root_b < root_a:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+
+    def add_group(self, items: Iterable[str]) -> None:
+        items = list(items)
+        if not items:
+            return
+        first = items[0]
+        self.find(first)
+        for other in items[1:]:
+            self.union(first, other)
+
+    def work_ids(self) -> Dict[str, int]:
+        """
+        Map every isbn13 to its work id, the integer value of the root isbn13.
+        """
+
+        return {item: int(self.find(item)) for item in self.parent}
+
+
+def _normalized(values: Iterable[Optional[str]]) -> List[str]:
+    return sorted({isbn for isbn in map(normalize_isbn, values) if isbn})
+
+
+def iter_nyt_groups(nyt_raw_dir: Path) -> Iterator[List[str]]:
+    """
+    Yield the edition isbns listed together for each book in each snapshot.
+    """
+
+    for _, payload in iter_snapshot_payloads(nyt_raw_dir):
+        for lst in (payload.get("results") or {}).get("lists") or []:
+            for book in lst.get("books") or []:
+                values = [book.get("primary_isbn13"), book.get("primary_isbn10")]
+                for entry in book.get("isbns") or []:
+                    values += [entry.get("isbn13"), entry.get("isbn10")]
+                yield _normalized(values)
+
+
+def iter_hardcover_groups(hardcover_dir: Path) -> Iterator[List[str]]:
+    """
+    Yield the sibling edition isbns of every stored Hardcover document.
+    """
+
+    if not hardcover_dir.exists():
+        return
+    for path in sorted(hardcover_dir.glob("*.json")):
+        try:
+            doc = json.loads(path.read_bytes())
+        except json.JSONDecodeError:
+            continue
+        yield _normalized(doc.get("isbns") or [])
+
+
+def build_work_ids(groups: Iterable[Iterable[str]]) -> Dict[str, int]:
+    uf = UnionFind()
+    for group in groups:
+        uf.add_group(group)
+    return uf.work_ids()
+
+
+def write_work_table(con: duckdb.DuckDBPyConnection, work_ids: Dict[str, int]) -> None:
+    """
+    Replace the isbn13 to work id table in one bulk load.
+    """
+
+    import pyarrow as pa
+
+    table = pa.table(
+        {
+            "isbn13": pa.array(list(work_ids), pa.string()),
+            "work_id": pa.array(list(work_ids.values()), pa.int64()),
+        }
+    )
+    con.register("work_ids_arrow", table)
+    try:
+        con.execute(
+            f"""
+            create or replace table {WORK_TABLE} as
+            select isbn13, work_id from work_ids_arrow order by work_id, isbn13
+            """
+        )
+        con.execute(
+            f"create unique index if not exists {WORK_TABLE}_isbn13_uidx "
+            f"on {WORK_TABLE}(isbn13)"
+        )
+        con.execute(
+            f"create index if not exists {WORK_TABLE}_work_idx on {WORK_TABLE}(work_id)"
+        )
+        bump_table_versions(con, WORK_TABLE)
+    finally:
+        con.unregister("work_ids_arrow")
+
+
+def has_work_table(con: duckdb.DuckDBPyConnection) -> bool:
+    return (
+        con.execute(
+            "select 1 from information_schema.tables where table_name = ?",
+            [WORK_TABLE],
+        ).fetchone()
+        is not None
+    )
+
+
+@profiled
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Cluster isbns into works from Hardcover and NYT edition lists."
+    )
+    parser.add_argument("--nyt-raw-dir", type=Path, default=DEFAULT_NYT_RAW_DIR)
+    parser.add_argument("--hardcover-dir", type=Path, default=DEFAULT_HARDCOVER_DIR)
+    parser.add_argument("--duckdb", type=Path, default=DEFAULT_DUCKDB_PATH)
+    args = parser.parse_args(argv)
+
+    groups = list(iter_nyt_groups(args.nyt_raw_dir))
+    groups += iter_hardcover_groups(args.hardcover_dir)
+    work_ids = build_work_ids(groups)
+
+    con = duckdb.connect(str(args.duckdb))
+    try:
+        write_work_table(con, work_ids)
+    finally:
+        con.close()
+
+    works = len(set(work_ids.values()))
+    print(f"Clustered {len(work_ids):,} isbns into {works:,} works")
+
+
+if __name__ == "__main__":
+    main()
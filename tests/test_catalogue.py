@@ -0,0 +1,118 @@
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+from gle.catalogue import (
+    catalogue_version,
+    export_catalogue,
+    goodreads_version,
+    main,
+    open_catalogue,
+    read_ingest_manifest,
+    write_ingest_manifest,
+)
+from gle.query_cache import bump_table_versions
+
+
+@pytest.fixture
+def db(tmp_path: Path) -> Path:
+    db = tmp_path / "gl.duckdb"
+    con = duckdb.connect(str(db))
+    con.execute(
+        """
+        create table goodreads (
+            book_id integer, isbn13 varchar primary key, title varchar,
+            authors varchar, series varchar, average_rating double,
+            ratings_count integer
+        )
+        """
+    )
+    con.execute(
+        """
+        insert into goodreads values
+            (2, '9780000000002', 'The Hobbit (Illustrated)', 'J.R.R. Tolkien', '', 4.3, 10),
+            (1, '9780000000001', 'Beach Read', 'Emily Henry', '', 4.0, 5)
+        """
+    )
+    bump_table_versions(con, "goodreads")
+    con.close()
+    return db
+
+
+def _export(db: Path, path: Path) -> str:
+    con = duckdb.connect(str(db), read_only=True)
+    version = goodreads_version(con)
+    export_catalogue(con, version, path)
+    con.close()
+    return version
+
+
+def _chunk(tmp_path: Path, text: str) -> Path:
+    path = tmp_path / "book1-100.csv"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_manifest_version_follows_file_content(tmp_path: Path) -> None:
+    manifest_path = tmp_path / "manifest.json"
+    first = write_ingest_manifest([_chunk(tmp_path, "a")], 1, manifest_path)
+    again = write_ingest_manifest([_chunk(tmp_path, "a")], 1, manifest_path)
+    changed = write_ingest_manifest([_chunk(tmp_path, "b")], 1, manifest_path)
+
+    assert first.version == again.version != changed.version
+    assert read_ingest_manifest(manifest_path) == changed
+
+
+def test_export_and_zero_copy_open(db: Path, tmp_path: Path) -> None:
+    path = tmp_path / "catalogue.arrow"
+    version = _export(db, path)
+    assert version and catalogue_version(path) == version
+
+    before = pa.total_allocated_bytes()
+    table = open_catalogue(path, db)
+    assert pa.total_allocated_bytes() == before
+
+    assert table.num_rows == 2
+    assert table.column("isbn13").to_pylist() == ["9780000000001", "9780000000002"]
+    assert table.column("title_key").to_pylist() == ["beach read", "hobbit"]
+    assert table.column("author_key").to_pylist() == ["henry", "tolkien"]
+
+
+def test_later_writes_make_the_catalogue_stale(db: Path, tmp_path: Path) -> None:
+    path = tmp_path / "catalogue.arrow"
+    _export(db, path)
+
+    # the fuzzy matcher adds rows without a new ingest manifest
+    con = duckdb.connect(str(db))
+    con.execute(
+        "insert into goodreads (book_id, isbn13, average_rating, ratings_count) "
+        "values (3, '9780000000003', 3.5, 7)"
+    )
+    bump_table_versions(con, "goodreads")
+    con.close()
+    with pytest.raises(RuntimeError, match="stale"):
+        open_catalogue(path, db)
+    assert open_catalogue(path, duckdb_path=None).num_rows == 2
+
+    # an in place update keeps the row count, the bump still tells
+    _export(db, path)
+    con = duckdb.connect(str(db))
+    con.execute("update goodreads set average_rating = 5.0 where book_id = 3")
+    bump_table_versions(con, "goodreads")
+    con.close()
+    with pytest.raises(RuntimeError, match="stale"):
+        open_catalogue(path, db)
+
+
+def test_check_command(db: Path, tmp_path: Path) -> None:
+    path = tmp_path / "catalogue.arrow"
+    argv = ["--duckdb", str(db), "--path", str(path)]
+    with pytest.raises(SystemExit) as exc:
+        main(argv + ["check"])
+    assert exc.value.code == 1
+    main(argv + ["export"])
+    with pytest.raises(SystemExit) as exc:
+        main(argv + ["check"])
+    assert exc.value.code == 0
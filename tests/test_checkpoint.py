@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from flows import hardcover_probe
+from gle.checkpoint import Journal
+
+
+def test_resume_restores_keys_results_and_counters(tmp_path: Path) -> None:
+    path = tmp_path / "job.jsonl"
+    journal = Journal("job", {"n": 3}, path=path, batch_size=2)
+    journal.mark("bulk", matches=[{"isbn": "A", "book_id": np.int64(1)}])
+    journal.record("B", counters={"hits": 1}, matches=[{"isbn": "B"}])
+    journal.record("C", counters={"misses": 1})
+    journal.record("D", counters={"hits": 1})  # still buffered, lost on crash
+
+    resumed = Journal("job", {"n": 3}, path=path, resume=True)
+    assert resumed.resumed
+    assert "bulk" in resumed.marks
+    assert resumed.done == {"B", "C"}
+    assert resumed.last == "C"
+    assert resumed.counters == {"hits": 1, "misses": 1}
+    assert resumed.items("matches") == [{"isbn": "A", "book_id": 1}, {"isbn": "B"}]
+
+
+def test_torn_last_line_is_dropped(tmp_path: Path) -> None:
+    path = tmp_path / "job.jsonl"
+    journal = Journal("job", {}, path=path, batch_size=1)
+    journal.record("A")
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write('{"keys": ["B"], "resu')
+
+    resumed = Journal("job", {}, path=path, resume=True, batch_size=1)
+    assert resumed.done == {"A"}
+    resumed.record("C")
+    assert Journal("job", {}, path=path, resume=True).done == {"A", "C"}
+
+
+def test_options_must_match_and_fresh_runs_start_over(tmp_path: Path) -> None:
+    path = tmp_path / "job.jsonl"
+    Journal("job", {"threshold": 85}, path=path, batch_size=1).record("A")
+
+    with pytest.raises(RuntimeError, match="options"):
+        Journal("job", {"threshold": 90}, path=path, resume=True)
+    assert Journal("job", {"threshold": 90}, path=path).done == set()
+    assert not Journal("job", {"threshold": 90}, path=path, resume=True).done
+
+
+def test_finish_removes_the_journal(tmp_path: Path) -> None:
+    path = tmp_path / "job.jsonl"
+    journal = Journal("job", {}, path=path)
+    journal.record("A")
+    journal.finish()
+    assert not path.exists()
+    assert not Journal("job", {}, path=path, resume=True).resumed
+
+
+def test_probe_resumes_after_a_crash(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hardcover_probe, "HC_DIR", tmp_path / "hc")
+    isbns = [f"97800000000{i:02d}" for i in range(6)]
+    looked_up = []
+
+    def crash_on_fourth(isbn):
+        if len(looked_up) == 3:
+            raise KeyboardInterrupt
+        looked_up.append(isbn)
+        return None
+
+    monkeypatch.setattr(hardcover_probe, "query_hardcover", crash_on_fourth)
+    with pytest.raises(KeyboardInterrupt):
+        hardcover_probe.probe(10, isbns=isbns, checkpoint_every=2)
+
+    # the first batch of two reached the journal, the third lookup did not
+    monkeypatch.setattr(hardcover_probe, "query_hardcover", looked_up.append)
+    hardcover_probe.probe(10, isbns=isbns, resume=True, checkpoint_every=2)
+    assert looked_up == isbns[:3] + isbns[2:]
+    assert not (tmp_path / "data/interim/checkpoints/hardcover_probe.jsonl").exists()
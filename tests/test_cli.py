@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from gle.cli import COMMANDS, Command, build_parser, main
+
+HEAVY_MODULES = ("pandas", "rapidfuzz", "prefect", "pyarrow")
+
+# Cumulative import time budgets in microseconds as reported by -X importtime
+HELP_IMPORT_BUDGET_US = 250_000
+GATE0_IMPORT_BUDGET_US = 500_000
+
+
+def _run_python(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+
+def _cumulative_import_us(stderr: str, module: str) -> int:
+    for line in stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} missing from import time report")
+
+
+def test_every_flow_has_a_subcommand() -> None:
+    help_text = build_parser().format_help()
+    for command in COMMANDS:
+        assert command.name in help_text
+
+
+def test_help_does_not_import_heavy_dependencies() -> None:
+    code = (
+        "import sys, gle.cli\n"
+        "gle.cli.build_parser().format_help()\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = _run_python(code)
+    assert result.stdout.strip() == ""
+    assert _cumulative_import_us(result.stderr, "gle.cli") < HELP_IMPORT_BUDGET_US
+
+
+def test_gate0_does_not_import_heavy_dependencies() -> None:
+    code = (
+        "import sys, gle.gate0_check\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = _run_python(code)
+    assert result.stdout.strip() == ""
+    assert (
+        _cumulative_import_us(result.stderr, "gle.gate0_check") < GATE0_IMPORT_BUDGET_US
+    )
+
+
+def test_main_forwards_remaining_args(tmp_path: Path, monkeypatch) -> None:
+    (tmp_path / "fake_flow.py").write_text(
+        "seen = []\n" "def main(argv=None):\n" "    seen.append(argv)\n",
+        encoding="utf-8",
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr("gle.cli.COMMANDS", (Command("fake", "fake_flow:main", "x"),))
+
+    main(["fake", "--threshold", "90", "extra"])
+
+    import fake_flow
+
+    assert fake_flow.seen == [["--threshold", "90", "extra"]]
+
+
+def test_main_exits_with_integer_result(tmp_path: Path, monkeypatch) -> None:
+    (tmp_path / "failing_flow.py").write_text(
+        "def main(argv=None):\n    return 3\n", encoding="utf-8"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(
+        "gle.cli.COMMANDS", (Command("fail", "failing_flow:main", "x"),)
+    )
+
+    with pytest.raises(SystemExit) as excinfo:
+        main(["fail"])
+    assert excinfo.value.code == 3
@@ -0,0 +1,152 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from flows import fuzzy_nyt_gr
+from flows.fuzzy_nyt_gr import key_cascade
+from gle.checkpoint import Journal
+from gle.normalize import surname_keys, title_keys
+
+GOODREADS = [
+    # book_id, title, authors, average_rating, ratings_count
+    (1, "The Hunger Games (The Hunger Games, #1)", "Suzanne Collins", 4.3, 900),
+    (2, "The Hunger Games", "Suzanne Collins", 4.1, 50),
+    (3, "Educated: A Memoir", "Tara Westover", 4.5, 300),
+    (4, "Beach Read", "Emily Henry", 4.0, 100),
+    (5, "Beach Read", "Someone Else", 3.0, 10),
+    (6, "The Covenant of Water and Other Stories", "Abraham Verghese", 4.6, 80),
+    (7, "Unrated Book", "Nobody", None, None),
+]
+
+NYT = [
+    # isbn13, title, author
+    ("A", "THE HUNGER GAMES", "Suzanne Collins"),  # exact, most ratings wins
+    ("B", "EDUCATED", "Westover, Tara"),  # unique title only
+    ("C", "BEACH READ", "Jane Doe"),  # ambiguous title, falls through
+    ("D", "THE COVENANT OF WATER", "Abraham Verghese"),  # prefix
+    ("E", "UNRATED BOOK", "Nobody"),  # unrated rows are not candidates
+]
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute(
+        """
+        create table goodreads (
+            book_id integer, isbn13 varchar, title varchar, authors varchar,
+            series varchar, average_rating double, ratings_count integer
+        )
+        """
+    )
+    con.executemany(
+        "insert into goodreads values (?, ?, ?, ?, '', ?, ?)",
+        [(b, f"97800000000{b:02d}", t, a, r, c) for b, t, a, r, c in GOODREADS],
+    )
+    yield con
+    con.close()
+
+
+def _nyt() -> pd.DataFrame:
+    nyt = pd.DataFrame(NYT, columns=["isbn13", "title", "author"])
+    nyt["t_key"] = title_keys(nyt["title"])
+    nyt["s_key"] = surname_keys(nyt["author"])
+    return nyt
+
+
+def test_candidates_are_most_rated_first(con) -> None:
+    con.executemany(
+        "insert into goodreads values (?, ?, 'Catching Fire', 'Suzanne Collins', '', 4.2, ?)",
+        [(b, f"97800000001{b:02d}", c) for b, c in ((9, 50), (8, 900), (10, 0))],
+    )
+    fuzzy_nyt_gr.install_macros(con)
+    full = fuzzy_nyt_gr.fetch_candidates(con, "collins", False, 10)
+    assert full["book_id"].tolist() == [1, 8, 2, 9, 10]
+    # a smaller limit keeps exactly the head of a larger one
+    head = fuzzy_nyt_gr.fetch_candidates(con, "collins", False, 3)
+    assert head["book_id"].tolist() == [1, 8, 2]
+
+
+def test_cascade_tiers(con) -> None:
+    hits = key_cascade(con, _nyt()).sort_values("nyt_isbn13")
+    assert hits[["nyt_isbn13", "book_id", "stage"]].values.tolist() == [
+        ["A", 1, "exact"],
+        ["B", 3, "title_key"],
+        ["D", 6, "prefix"],
+    ]
+    assert set(hits["score"]) == {100}
+
+
+def test_cascade_prefers_stored_keys(con) -> None:
+    con.execute("alter table goodreads add column title_key varchar")
+    con.execute("alter table goodreads add column author_key varchar")
+    con.execute("update goodreads set title_key = 'x', author_key = 'y'")
+    con.execute(
+        "update goodreads set title_key = 'beach read', author_key = 'doe' "
+        "where book_id = 5"
+    )
+    hits = key_cascade(con, _nyt())
+    assert hits[["nyt_isbn13", "book_id"]].values.tolist() == [["C", 5]]
+
+
+def test_main_resumes_from_the_journal(tmp_path, monkeypatch) -> None:
+    db = tmp_path / "gl.duckdb"
+    con = duckdb.connect(str(db))
+    con.execute("create schema green_light")
+    con.execute(
+        "create table green_light.nyt_raw (isbn13 varchar, title varchar, author varchar)"
+    )
+    con.executemany("insert into green_light.nyt_raw values (?, ?, ?)", NYT)
+    con.execute(
+        """
+        create table goodreads (
+            book_id integer, isbn13 varchar primary key, title varchar,
+            authors varchar, series varchar, average_rating double,
+            ratings_count integer
+        )
+        """
+    )
+    con.executemany(
+        "insert into goodreads values (?, ?, ?, ?, '', ?, ?)",
+        [(b, f"97800000000{b:02d}", t, a, r, c) for b, t, a, r, c in GOODREADS],
+    )
+    con.close()
+    monkeypatch.setattr(fuzzy_nyt_gr, "DB", db)
+    monkeypatch.chdir(tmp_path)
+
+    # an interrupted run already finished the bulk tiers and scored C
+    args = fuzzy_nyt_gr.build_parser().parse_args([])
+    options = {
+        k: getattr(args, k)
+        for k in ("threshold", "title_threshold", "max_cands", "use_series")
+    }
+    journal = Journal("fuzzy", {**options, "changed_only": False}, batch_size=1)
+    journal.mark("bulk", matches=[])
+    journal.record(
+        "surname:C",
+        matches=[
+            dict(
+                nyt_isbn13="C",
+                book_id=4,
+                avg_rating=4.0,
+                ratings_count=100,
+                score=90,
+                stage="surname",
+            )
+        ],
+    )
+    scored = []
+    monkeypatch.setattr(
+        fuzzy_nyt_gr,
+        "fetch_candidates",
+        lambda con, sname, *a: scored.append(sname) or None,
+    )
+
+    fuzzy_nyt_gr.main(["--resume"])
+
+    assert "doe" not in scored
+    con = duckdb.connect(str(db))
+    assert con.execute(
+        "select book_id from goodreads where isbn13 = 'C'"
+    ).fetchall() == [(4,)]
+    assert not journal.path.exists()
@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+from flows.fuzzy_tune import build_cache, evaluate, load_gold, predict, sweep
+from gle.work_index import write_work_table
+
+
+def _stage1() -> pd.DataFrame:
+    return pd.DataFrame(
+        [
+            ("A", 0, 10, 70.0),
+            ("A", 1, 11, 92.0),
+            ("A", 2, 12, 92.0),
+            ("B", 0, 20, 60.0),
+            ("B", 1, 21, 88.0),
+        ],
+        columns=["nyt_isbn13", "pos", "book_id", "score"],
+    )
+
+
+def _stage2() -> pd.DataFrame:
+    return pd.DataFrame(
+        [("A", 19, 99.0), ("B", 29, 95.0), ("C", 30, 96.0)],
+        columns=["nyt_isbn13", "book_id", "score"],
+    )
+
+
+def test_predict_keeps_first_best_candidate() -> None:
+    pred = predict(_stage1(), _stage2(), 85, 100, 3)
+    assert pred.to_dict() == {"A": 11, "B": 21}
+
+
+def test_predict_respects_max_cands_and_falls_back_to_title() -> None:
+    pred = predict(_stage1(), _stage2(), 85, 95, 1)
+    assert pred.to_dict() == {"A": 19, "B": 29, "C": 30}
+
+
+def test_evaluate_precision_recall(tmp_path: Path) -> None:
+    gold_csv = tmp_path / "gold.csv"
+    gold_csv.write_text("nyt_isbn13,book_id\nA,11\nB,29\nC,\n", encoding="utf-8")
+    gold = load_gold(gold_csv)
+
+    result = evaluate(_stage1(), _stage2(), gold, 85, 95, 3)
+    # A → 11 correct, B → 21 wrong, C → 30 but has no true match
+    assert result["matched"] == 3
+    assert result["correct"] == 1
+    assert result["precision"] == pytest.approx(1 / 3)
+    assert result["recall"] == pytest.approx(1 / 2)
+
+
+def test_sweep_covers_the_grid(tmp_path: Path) -> None:
+    gold = pd.DataFrame({"nyt_isbn13": ["A"], "book_id": pd.array([11], "Int64")})
+    results = sweep(_stage1(), _stage2(), gold, [80, 95], [90], [1, 3])
+    assert len(results) == 4
+    best = results.sort_values("recall", ascending=False).iloc[0]
+    assert (best.threshold, best.max_cands) == (80, 3)
+
+
+def test_predict_puts_cascade_hits_first() -> None:
+    keys = pd.DataFrame({"nyt_isbn13": ["D"], "book_id": [40]})
+    pred = predict(_stage1(), _stage2(), 85, 100, 3, keys)
+    assert pred.to_dict() == {"D": 40, "A": 11, "B": 21}
+
+
+def _tune_db() -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect()
+    con.execute("create schema green_light")
+    con.execute(
+        "create table green_light.nyt_raw (isbn13 varchar, title varchar, author varchar)"
+    )
+    con.execute(
+        "insert into green_light.nyt_raw values "
+        "('9780000000001', 'The Hobbit', 'J. R. R. Tolkien'), "
+        "('9780000000002', 'The Hobbit, or There and Back Again', 'Tolkien')"
+    )
+    con.execute(
+        """
+        create table goodreads (
+            book_id integer, isbn13 varchar, title varchar, authors varchar,
+            series varchar, average_rating double, ratings_count integer
+        )
+        """
+    )
+    con.execute(
+        """
+        insert into goodreads values
+            (1, '9781111111111', 'The Hobbit (Illustrated)', 'J.R.R. Tolkien', '', 4.3, 10),
+            (2, '9782222222222', 'The Silmarillion', 'J.R.R. Tolkien', '', 3.9, 5)
+        """
+    )
+    return con
+
+
+def test_build_cache_scores_what_the_cascade_leaves() -> None:
+    con = _tune_db()
+    keys, stage1, stage2 = build_cache(
+        con, ["9780000000001", "9780000000002"], False, 10
+    )
+
+    assert keys.values.tolist() == [["9780000000001", 1]]
+    assert set(stage1["nyt_isbn13"]) == {"9780000000002"}
+    assert stage1["book_id"].tolist() == [1, 2]
+    assert stage1.loc[0, "score"] > stage1.loc[1, "score"]
+    assert stage2["book_id"].tolist() == [1]
+
+
+def test_build_cache_runs_stage_0_first() -> None:
+    con = _tune_db()
+    # the second NYT edition shares a work with the Silmarillion row
+    write_work_table(con, {"9780000000002": 7, "9782222222222": 7})
+    keys, stage1, stage2 = build_cache(
+        con, ["9780000000001", "9780000000002"], False, 10
+    )
+    assert sorted(keys.values.tolist()) == [
+        ["9780000000001", 1],
+        ["9780000000002", 2],
+    ]
+    assert stage1.empty and stage2.empty
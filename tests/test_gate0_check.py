@@ -1,17 +1,32 @@
 from pathlib import Path
 
 from gle.gate0_check import Gate0Metrics, Gate0Thresholds, _count_nyt_weeks
+from gle.snapshot_manifest import SnapshotManifest
 
 
 def test_count_nyt_weeks_counts_unique_stems(tmp_path: Path) -> None:
     # Create fake NYT json files
     (tmp_path / "2025-01-06.json").write_text("{}", encoding="utf-8")
     (tmp_path / "2025-01-13.json").write_text("{}", encoding="utf-8")
-    # Copy with extra text in the stem counts as another entry for now
+    # Copy with extra text in the stem is not a week of its own
     (tmp_path / "2025-01-13.copy.json").write_text("{}", encoding="utf-8")
 
     weeks = _count_nyt_weeks(tmp_path)
-    assert weeks == 3
+    assert weeks == 2
+
+
+def test_count_nyt_weeks_reads_manifest(tmp_path: Path) -> None:
+    manifest = SnapshotManifest(tmp_path)
+    for monday_iso in ("2025-01-06", "2025-01-13", "2025-01-20"):
+        path = tmp_path / f"{monday_iso}.json"
+        path.write_text("{}", encoding="utf-8")
+        manifest.record_file(monday_iso, path, 200)
+
+    # Files outside the manifest or missing from disk are not counted
+    (tmp_path / "2025-01-27.json").write_text("{}", encoding="utf-8")
+    (tmp_path / "2025-01-20.json").unlink()
+
+    assert _count_nyt_weeks(tmp_path) == 2
 
 
 def test_gate0_metrics_pass_logic_all_true() -> None:
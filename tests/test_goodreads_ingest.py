@@ -0,0 +1,105 @@
+import time
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from flows.goodreads_ingest import build_parser, load_goodreads
+from gle.isbn import isbn10_to13
+from gle.resources import ResourceProfile, SpillMonitor
+
+HEADER = "Id,Name,Authors,ISBN,Rating,CountsOfReview,Series\n"
+ROWS = [
+    # same isbn13: most ratings wins
+    "1,A,Ann.,9780000000001,4.0,10,S1",
+    "2,A2,Ann,9780000000001,3.0,20,",
+    # tie on ratings: best rating wins, null rating loses
+    "3,B,Bob,9780000000002,,5,",
+    "4,B2,Bob,9780000000002,4.5,5,",
+    "5,B3,Bob,9780000000002,4.1,5,",
+    # full tie: lowest book id wins
+    "9,C,Cy,9780000000003,4.0,7,",
+    "8,C2,Cy,9780000000003,4.0,7,",
+    # null ratings_count sorts last
+    "10,D,Di,0306406152,4.0,,",
+    "11,D2,Di,9780306406157,1.0,1,",
+    # dropped: no isbn / malformed
+    "12,E,Ed,,4.0,1,",
+    "13,F,Fa,12345,4.0,1,",
+]
+
+
+@pytest.fixture
+def chunks(tmp_path: Path) -> list[str]:
+    paths = []
+    for i, part in enumerate((ROWS[:5], ROWS[5:])):
+        path = tmp_path / f"book{i}-{i}.csv"
+        path.write_text(HEADER + "\n".join(part) + "\n", encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def _load(files: list[str], **kwargs) -> list[tuple]:
+    con = duckdb.connect()
+    con.create_function("isbn10_to13", isbn10_to13)
+    load_goodreads(con, files, **kwargs)
+    rows = con.execute("SELECT * FROM goodreads ORDER BY isbn13").fetchall()
+    con.close()
+    return rows
+
+
+def test_window_dedup_rule(chunks: list[str]) -> None:
+    rows = _load(chunks)
+    assert [(r[0], r[1]) for r in rows] == [
+        (2, "9780000000001"),
+        (4, "9780000000002"),
+        (8, "9780000000003"),
+        (11, "9780306406157"),
+    ]
+
+
+@pytest.mark.parametrize("partitions", [1, 3, 16])
+def test_out_of_core_matches_window_dedup(chunks: list[str], partitions: int) -> None:
+    assert _load(chunks, out_of_core=True, partitions=partitions) == _load(chunks)
+
+
+def test_partitions_must_be_positive() -> None:
+    assert build_parser().parse_args(["--partitions", "1"]).partitions == 1
+    for bad in ("0", "-2", "x"):
+        with pytest.raises(SystemExit):
+            build_parser().parse_args(["--out-of-core", "--partitions", bad])
+
+
+def test_resource_profile_applies_settings(tmp_path: Path) -> None:
+    con = duckdb.connect()
+    ResourceProfile(
+        memory_limit="256MB", threads=2, temp_directory=tmp_path / "spill"
+    ).apply(con)
+    assert con.execute("SELECT current_setting('threads')").fetchone()[0] == 2
+    assert (tmp_path / "spill").is_dir()
+    con.close()
+
+
+def test_spill_monitor_keeps_the_peak(tmp_path: Path) -> None:
+    con = duckdb.connect()
+    ResourceProfile(temp_directory=tmp_path / "spill").apply(con)
+    with SpillMonitor(con, interval=0.01) as spill:
+        # DuckDB drops its temporary files as soon as an operator is done
+        block = tmp_path / "spill" / "duckdb_temp_block-1.block"
+        block.write_bytes(b"x" * 4096)
+        while spill.peak == 0:
+            time.sleep(0.01)
+        block.unlink()
+    assert spill.peak == 4096
+    con.close()
+
+
+def test_match_keys_are_stored(chunks: list[str]) -> None:
+    con = duckdb.connect()
+    con.create_function("isbn10_to13", isbn10_to13)
+    load_goodreads(con, chunks)
+    keys = con.execute(
+        "SELECT title_key, author_key FROM goodreads ORDER BY isbn13"
+    ).fetchall()
+    con.close()
+    assert keys[0] == ("a2", "ann")
@@ -0,0 +1,135 @@
+import json
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from gle.joined_export import export_joined, read_state
+
+
+@pytest.fixture
+def con(tmp_path: Path):
+    con = duckdb.connect()
+    con.execute(
+        """
+        create table nyt_appearances (
+            week date, list_name varchar, rank integer, isbn13 varchar,
+            title varchar, author varchar
+        )
+        """
+    )
+    con.execute(
+        """
+        insert into nyt_appearances values
+            ('2025-01-06', 'fiction', 1, '9780000000003', 'Gamma', 'C'),
+            ('2025-01-06', 'fiction', 2, '9780000000001', 'Alpha', 'A'),
+            ('2025-01-13', 'fiction', 1, '9780000000002', 'Beta', 'B'),
+            ('2025-01-13', 'nonfiction', 4, '9780000000001', 'Alpha', 'A')
+        """
+    )
+    con.execute(
+        """
+        create table goodreads (
+            book_id integer, isbn13 varchar, average_rating double,
+            ratings_count integer
+        )
+        """
+    )
+    con.execute(
+        """
+        insert into goodreads values
+            (1, '9780000000001', 4.2, 100),
+            (9, '9780000000001', 3.0, 2),
+            (2, '9780000000002', 3.8, 10)
+        """
+    )
+    hardcover = tmp_path / "hardcover"
+    hardcover.mkdir()
+    (hardcover / "9780000000003.json").write_text(
+        json.dumps({"id": 77, "title": "Gamma", "rating": 4.5, "ratings_count": 12})
+    )
+    yield con
+    con.close()
+
+
+def _export(con, tmp_path: Path, **kwargs):
+    return export_joined(con, tmp_path / "joined", tmp_path / "hardcover", **kwargs)
+
+
+def test_week_partitions_sorted_by_isbn(tmp_path: Path, con) -> None:
+    result = _export(con, tmp_path)
+    assert result.written == ["2025-01-06", "2025-01-13"]
+    assert result.rows == 4
+
+    out = tmp_path / "joined"
+    first = out / "week=2025-01-06" / "data.parquet"
+    assert [r[0] for r in con.execute(f"select isbn13 from '{first}'").fetchall()] == [
+        "9780000000001",
+        "9780000000003",
+    ]
+    rows = con.execute(
+        f"""
+        select week::varchar, isbn13, goodreads_book_id, hardcover_id
+        from read_parquet('{out}/*/*.parquet', hive_partitioning = true)
+        order by week, isbn13, list_name
+        """
+    ).fetchall()
+    assert rows == [
+        ("2025-01-06", "9780000000001", 1, None),
+        ("2025-01-06", "9780000000003", None, 77),
+        ("2025-01-13", "9780000000001", 1, None),
+        ("2025-01-13", "9780000000002", 2, None),
+    ]
+
+
+def test_isbn_statistics_and_bloom_filters(tmp_path: Path, con) -> None:
+    _export(con, tmp_path)
+    path = tmp_path / "joined" / "week=2025-01-13" / "data.parquet"
+    stats = con.execute(
+        f"""
+        select stats_min_value, stats_max_value, bloom_filter_offset
+        from parquet_metadata('{path}')
+        where path_in_schema = 'isbn13'
+        """
+    ).fetchone()
+    assert stats[:2] == ("9780000000001", "9780000000002")
+    assert stats[2] is not None
+    probe = (
+        f"select bloom_filter_excludes from parquet_bloom_probe('{path}', 'isbn13', ?)"
+    )
+    assert con.execute(probe, ["9780000000002"]).fetchone() == (False,)
+    assert con.execute(probe, ["9789999999999"]).fetchone() == (True,)
+
+
+def test_only_touched_weeks_are_rewritten(tmp_path: Path, con) -> None:
+    _export(con, tmp_path)
+    out = tmp_path / "joined"
+    before = read_state(out)
+
+    again = _export(con, tmp_path)
+    assert (again.written, again.unchanged) == ([], 2)
+
+    con.execute("update goodreads set average_rating = 4.0 where book_id = 2")
+    con.execute("delete from nyt_appearances where week = '2025-01-06'")
+    con.execute(
+        "insert into nyt_appearances values "
+        "('2025-01-20', 'fiction', 1, '9780000000002', 'Beta', 'B')"
+    )
+    result = _export(con, tmp_path)
+    assert result.written == ["2025-01-13", "2025-01-20"]
+    assert result.removed == ["2025-01-06"]
+    assert sorted(p.name for p in out.glob("week=*")) == [
+        "week=2025-01-13",
+        "week=2025-01-20",
+    ]
+    state = read_state(out)
+    assert sorted(state) == ["2025-01-13", "2025-01-20"]
+    assert state["2025-01-13"]["fingerprint"] != before["2025-01-13"]["fingerprint"]
+
+    forced = _export(con, tmp_path, force=True)
+    assert forced.written == ["2025-01-13", "2025-01-20"]
+
+
+def test_requires_appearances(tmp_path: Path) -> None:
+    with pytest.raises(RuntimeError):
+        _export(duckdb.connect(), tmp_path)
@@ -0,0 +1,217 @@
+import json
+import os
+from pathlib import Path
+
+import duckdb
+import pytest
+import requests
+
+from gle import lookup
+from gle.lookup import LookupStore, build_snapshot, load_test, rebuild_if_changed, serve
+from gle.query_cache import bump_table_versions
+
+
+@pytest.fixture
+def sources(tmp_path: Path):
+    con = duckdb.connect(str(tmp_path / "gl.duckdb"))
+    con.execute(
+        """
+        create table goodreads (
+            book_id integer, isbn13 varchar, title varchar, authors varchar,
+            average_rating double, ratings_count integer
+        )
+        """
+    )
+    con.execute(
+        """
+        insert into goodreads values
+            (1, '9780000000001', 'Alpha', 'A. Author', 4.2, 100),
+            (2, '9780000000002', 'Beta', 'B. Author', 3.8, 10)
+        """
+    )
+    con.execute(
+        """
+        create table nyt_isbn_features (
+            isbn13 varchar, as_of date, weeks_on_list integer, peak_rank integer,
+            current_rank integer, first_week date, last_week date,
+            list_count integer
+        )
+        """
+    )
+    con.execute(
+        """
+        insert into nyt_isbn_features values
+            ('9780000000001', '2025-01-06', 1, 5, 5, '2025-01-06', '2025-01-06', 1),
+            ('9780000000001', '2025-01-13', 2, 3, 3, '2025-01-06', '2025-01-13', 1),
+            ('9780000000003', '2025-01-13', 1, 9, 9, '2025-01-13', '2025-01-13', 2)
+        """
+    )
+    hardcover = tmp_path / "hardcover"
+    hardcover.mkdir()
+    (hardcover / "9780000000003.json").write_text(
+        json.dumps(
+            {
+                "id": 77,
+                "title": "Gamma",
+                "isbns": ["9780000000003"],
+                "rating": 4.5,
+                "ratings_count": 12,
+                "publication_date": "2024-05-01",
+            }
+        )
+    )
+    bump_table_versions(con, "goodreads", "nyt_isbn_features")
+    yield con, hardcover
+    con.close()
+
+
+def _build(tmp_path: Path, sources, **kwargs):
+    con, hardcover = sources
+    return build_snapshot(con, tmp_path / "lookup", hardcover, **kwargs)
+
+
+def test_snapshot_joins_all_sources(tmp_path: Path, sources) -> None:
+    manifest = _build(tmp_path, sources)
+    assert manifest.rows == 3
+    store = LookupStore(tmp_path / "lookup")
+
+    alpha = store.get("9780000000001")
+    assert alpha["goodreads"]["average_rating"] == 4.2
+    assert alpha["nyt"]["weeks_on_list"] == 2
+    assert alpha["nyt"]["last_week"] == "2025-01-13"
+    assert alpha["hardcover"] is None
+
+    gamma = store.get("978-0-00-000000-3")
+    assert gamma["goodreads"] is None
+    assert gamma["hardcover"] == {
+        "id": 77,
+        "title": "Gamma",
+        "rating": 4.5,
+        "ratings_count": 12,
+        "publication_date": "2024-05-01",
+    }
+    assert store.get("9789999999999") is None
+    assert store.get("not an isbn") is None
+
+
+def test_batch_lookup_and_cache(tmp_path: Path, sources) -> None:
+    _build(tmp_path, sources)
+    store = LookupStore(tmp_path / "lookup", cache_size=2)
+
+    found = store.get_many(["9780000000002", "9789999999999", "9780000000002"])
+    assert found["9780000000002"]["goodreads"]["title"] == "Beta"
+    assert found["9789999999999"] is None
+    assert store.stats()["misses"] == 3
+
+    store.get("9780000000002")
+    store.get("9780000000001")
+    store.get("9780000000003")
+    stats = store.stats()
+    assert stats["hits"] == 1
+    assert stats["cached"] == 2
+
+
+def test_reload_when_snapshot_changes(tmp_path: Path, sources, monkeypatch) -> None:
+    first = _build(tmp_path, sources)
+    store = LookupStore(tmp_path / "lookup", check_interval=0)
+    assert store.get("9780000000004") is None
+
+    assert _build(tmp_path, sources).version == first.version
+    con, _ = sources
+    # rows the fuzzy matcher adds, without a new Goodreads ingest
+    con.execute(
+        "insert into goodreads values (4, '9780000000004', 'Delta', 'D', 4.0, 1)"
+    )
+    bump_table_versions(con, "goodreads")
+    second = _build(tmp_path, sources)
+    assert second.version != first.version
+    os.utime(tmp_path / "lookup" / "manifest.json", ns=(1, 1))
+
+    assert store.get("9780000000004")["goodreads"]["title"] == "Delta"
+    assert store.stats()["reloads"] == 1
+
+    # the replaced file stays one generation for readers of the old manifest
+    def files():
+        return sorted(p.name for p in (tmp_path / "lookup").glob("*.arrow"))
+
+    assert files() == sorted([first.file, second.file])
+    con.execute(
+        "insert into goodreads values (5, '9780000000005', 'Echo', 'E', 3.0, 1)"
+    )
+    bump_table_versions(con, "goodreads")
+    third = _build(tmp_path, sources)
+    assert files() == sorted([second.file, third.file])
+
+    # one that read it before two rebuilds retries with the current manifest
+    stale = iter([first])
+    current = lookup.read_lookup_manifest
+    monkeypatch.setattr(
+        lookup, "read_lookup_manifest", lambda d: next(stale, None) or current(d)
+    )
+    assert LookupStore(tmp_path / "lookup").manifest.version == third.version
+
+
+def test_http_service_and_load_test(tmp_path: Path, sources) -> None:
+    _build(tmp_path, sources)
+    store = LookupStore(tmp_path / "lookup")
+    server = serve(store, port=0)
+    try:
+        one = requests.get(f"{server.url}/isbn/9780000000001", timeout=5)
+        assert one.json()["nyt"]["peak_rank"] == 3
+        assert requests.get(f"{server.url}/isbn/123", timeout=5).status_code == 404
+        batch = requests.post(
+            f"{server.url}/isbn/batch",
+            json={"isbns": ["9780000000002", "9780000000003"]},
+            timeout=5,
+        ).json()["results"]
+        assert batch["9780000000003"]["nyt"]["list_count"] == 2
+
+        result = load_test(store, server.url, requests_total=50, workers=2)
+        assert result["errors"] == 0
+        assert result["p99_ms"] >= result["p50_ms"] > 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    local = load_test(store, requests_total=100, workers=2, batch_size=4)
+    assert local["requests"] == 100
+    assert local["isbns_per_s"] > local["qps"]
+
+
+def test_rebuild_on_any_source_change(tmp_path: Path, sources) -> None:
+    _build(tmp_path, sources)
+    store = LookupStore(tmp_path / "lookup")
+    con, hardcover = sources
+    db = tmp_path / "gl.duckdb"
+    con.close()
+
+    def rebuild():
+        return rebuild_if_changed(store, db, hardcover)
+
+    assert rebuild() is None
+
+    # reloading a week that was already loaded keeps every row count
+    con = duckdb.connect(str(db))
+    con.execute(
+        "update nyt_isbn_features set peak_rank = 1 where isbn13 = '9780000000003'"
+    )
+    bump_table_versions(con, "nyt_isbn_features")
+    con.close()
+    assert rebuild() is not None
+    assert store.get("9780000000003")["nyt"]["peak_rank"] == 1
+    assert rebuild() is None
+
+    doc = hardcover / "9780000000003.json"
+    doc.write_text(doc.read_text().replace("Gamma", "Gamma!"))
+    os.utime(doc, ns=(1, 1))
+    assert rebuild() is not None
+    assert store.get("9780000000003")["hardcover"]["title"] == "Gamma!"
+
+    # a writer still holding the database postpones the rebuild
+    (hardcover / "9780000000002.json").write_text(json.dumps({"id": 1}))
+    writer = duckdb.connect(str(db))
+    try:
+        assert rebuild() is None
+    finally:
+        writer.close()
+    assert rebuild() is not None
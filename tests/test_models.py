@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+
+from flows.models import (
+    BookDoc,
+    SlimBookDoc,
+    decode_books,
+    decode_documents,
+    load_book_files,
+)
+
+DOC = {
+    "id": 7,
+    "title": "Fourth Wing",
+    "isbns": ["9781649374042", "1649374046"],
+    "rating": 4.2,
+    "ratings_count": 1234,
+    "publication_date": "2023-05-02",
+    "description": "A very long blurb " * 50,
+    "image": {"url": "https://example.invalid/c.jpg"},
+}
+
+
+def test_decode_books_slim_drops_unused_fields() -> None:
+    [book] = decode_books(json.dumps([DOC]))
+    assert isinstance(book, SlimBookDoc)
+    assert book.model_extra in (None, {})
+    assert set(json.loads(book.model_dump_json())) == {
+        "id",
+        "title",
+        "isbns",
+        "rating",
+        "ratings_count",
+        "publication_date",
+    }
+
+
+def test_decode_books_full_matches_per_object_path() -> None:
+    [book] = decode_books(json.dumps([DOC]), slim=False)
+    assert book == BookDoc(**DOC)
+    assert book.model_extra["image"] == DOC["image"]
+
+
+def test_decode_documents_validates_parsed_hits() -> None:
+    books = decode_documents([DOC, {**DOC, "id": 8}])
+    assert [b.id for b in books] == [7, 8]
+
+
+def test_load_book_files_decodes_directory(tmp_path: Path) -> None:
+    for i in range(3):
+        (tmp_path / f"{i}.json").write_text(json.dumps({**DOC, "id": i}))
+    books = load_book_files(sorted(tmp_path.glob("*.json")))
+    assert [b.id for b in books] == [0, 1, 2]
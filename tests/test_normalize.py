@@ -0,0 +1,57 @@
+import duckdb
+import pytest
+
+from gle.normalize import install_macros, surname_keys, title_keys
+
+
+@pytest.mark.parametrize(
+    "title, key",
+    [
+        ("The Hunger Games (The Hunger Games, #1)", "hunger games"),
+        ("THE HUNGER GAMES", "hunger games"),
+        ("Les Misérables: Volume 2", "les miserables"),
+        ("Dune Messiah, Book 2", "dune messiah"),
+        ("The Way of Kings #1", "way of kings"),
+        ("Pride & Prejudice", "pride and prejudice"),
+        (
+            "Harry Potter and the Sorcerer’s Stone",
+            "harry potter and the sorcerers stone",
+        ),
+        ("A", "a"),
+        (None, ""),
+    ],
+)
+def test_title_key(title, key) -> None:
+    assert title_keys([title]) == [key]
+
+
+@pytest.mark.parametrize(
+    "author, key",
+    [
+        ("J. R. R. Tolkien", "tolkien"),
+        ("J.K. Rowling/Mary GrandPré", "rowling"),
+        ("Martin Luther King, Jr.", "king"),
+        ("Stephen King and Owen King", "king"),
+        ("John le Carré", "carre"),
+        ("Patrick O'Brian", "obrian"),
+        (None, ""),
+    ],
+)
+def test_surname_key(author, key) -> None:
+    assert surname_keys([author]) == [key]
+
+
+def test_keys_keep_input_order() -> None:
+    titles = [f"The Title {i} (Series, #{i})" for i in range(5_000)]
+    assert title_keys(titles) == [f"title {i}" for i in range(5_000)]
+
+
+def test_macros_work_on_a_read_only_connection(tmp_path) -> None:
+    path = tmp_path / "ro.duckdb"
+    duckdb.connect(str(path)).close()
+    con = duckdb.connect(str(path), read_only=True)
+    install_macros(con)
+    assert con.execute("select surname_key('Ursula K. Le Guin')").fetchone() == (
+        "guin",
+    )
+    con.close()
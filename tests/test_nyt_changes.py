@@ -0,0 +1,118 @@
+import duckdb
+import pytest
+
+from gle.nyt_changes import (
+    advance_watermark,
+    pending_changes,
+    pending_isbns,
+    sync_changes,
+    watermark,
+)
+from gle.nyt_features import flatten_snapshot, update_week
+
+
+def _payload(lists: dict) -> dict:
+    return {
+        "results": {
+            "lists": [
+                {
+                    "list_name_encoded": name,
+                    "books": [
+                        {"rank": rank, "primary_isbn13": isbn}
+                        for rank, isbn in enumerate(isbns, 1)
+                    ],
+                }
+                for name, isbns in lists.items()
+            ]
+        }
+    }
+
+
+WEEKS = {
+    "2025-01-06": _payload({"fiction": ["A", "B"], "ebook": ["B"]}),
+    "2025-01-13": _payload({"fiction": ["B", "A"], "audio": ["C"]}),
+    "2025-01-20": _payload({"fiction": ["C", "A"]}),
+}
+
+EXPECTED = {
+    ("2025-01-06", "entered", "fiction", "A", None, 1),
+    ("2025-01-06", "entered", "fiction", "B", None, 2),
+    ("2025-01-06", "entered", "ebook", "B", None, 1),
+    ("2025-01-06", "new", None, "A", None, 1),
+    ("2025-01-06", "new", None, "B", None, 1),
+    ("2025-01-13", "rank_changed", "fiction", "A", 1, 2),
+    ("2025-01-13", "rank_changed", "fiction", "B", 2, 1),
+    ("2025-01-13", "exited", "ebook", "B", 1, None),
+    ("2025-01-13", "entered", "audio", "C", None, 1),
+    ("2025-01-13", "new", None, "C", None, 1),
+    ("2025-01-20", "entered", "fiction", "C", None, 1),
+    ("2025-01-20", "exited", "fiction", "B", 1, None),
+    ("2025-01-20", "exited", "audio", "C", 1, None),
+}
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    yield con
+    con.close()
+
+
+def _load(con, weeks) -> None:
+    for week in weeks:
+        update_week(con, week, flatten_snapshot(week, WEEKS[week]))
+
+
+def _changes(con) -> set:
+    rows = con.execute(
+        """
+        select strftime(week, '%Y-%m-%d'), change, list_name, isbn13, prev_rank, rank
+        from nyt_changes
+        """
+    ).fetchall()
+    return set(rows)
+
+
+def test_week_over_week_changes(con) -> None:
+    _load(con, sorted(WEEKS))
+    assert _changes(con) == EXPECTED
+
+
+def test_out_of_order_weeks_give_the_same_changes(con) -> None:
+    _load(con, ["2025-01-20", "2025-01-06", "2025-01-13"])
+    assert _changes(con) == EXPECTED
+
+
+def test_consumer_only_sees_its_unconsumed_delta(con) -> None:
+    _load(con, ["2025-01-06", "2025-01-13"])
+    new = pending_changes(con, "hardcover_probe", kinds=["new"])
+    assert pending_isbns(new) == ["A", "B", "C"]
+    advance_watermark(con, "hardcover_probe")
+
+    # reloading an unchanged week hands out nothing again
+    _load(con, ["2025-01-13"])
+    assert pending_changes(con, "hardcover_probe") == []
+
+    _load(con, ["2025-01-20"])
+    delta = pending_changes(con, "hardcover_probe")
+    assert {c.week for c in delta} == {"2025-01-20"}
+    assert pending_changes(con, "hardcover_probe", kinds=["new"]) == []
+
+    # other consumers keep their own position
+    assert len(pending_changes(con, "fuzzy")) == len(EXPECTED)
+
+
+def test_watermark_never_moves_backwards(con) -> None:
+    _load(con, ["2025-01-06"])
+    top = advance_watermark(con, "gate0")
+    assert advance_watermark(con, "gate0", 1) == top
+    assert watermark(con, "gate0") == top
+
+
+def test_sync_backfills_weeks_loaded_without_changes(con) -> None:
+    _load(con, sorted(WEEKS))
+    con.execute("delete from nyt_changes")
+    con.execute("delete from nyt_change_weeks")
+    assert sync_changes(con) == sorted(WEEKS)
+    assert _changes(con) == EXPECTED
+    assert sync_changes(con) == []
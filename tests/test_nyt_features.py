@@ -0,0 +1,141 @@
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from gle.nyt_features import (
+    export_partitions,
+    features_as_of,
+    flatten_snapshot,
+    sync_features,
+    update_week,
+)
+from gle.snapshot_manifest import SnapshotManifest
+
+
+def _payload(lists: dict) -> dict:
+    return {
+        "results": {
+            "lists": [
+                {
+                    "list_name_encoded": name,
+                    "books": [
+                        {"rank": rank, "primary_isbn13": isbn, "title": isbn}
+                        for rank, isbn in enumerate(isbns, 1)
+                    ],
+                }
+                for name, isbns in lists.items()
+            ]
+        }
+    }
+
+
+WEEKS = {
+    "2025-01-06": _payload({"fiction": ["A", "B"], "ebook": ["B"]}),
+    "2025-01-13": _payload({"fiction": ["B", "A"], "audio": ["C"]}),
+    "2025-01-20": _payload({"fiction": ["C", "A"]}),
+}
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    yield con
+    con.close()
+
+
+def _load(con, weeks) -> None:
+    for week in weeks:
+        update_week(con, week, flatten_snapshot(week, WEEKS[week]))
+
+
+def _features(con) -> dict:
+    rows = con.execute(
+        """
+        select isbn13, strftime(as_of, '%Y-%m-%d'), weeks_on_list, peak_rank,
+               current_rank, list_count, rank_trajectory
+        from nyt_isbn_features
+        """
+    ).fetchall()
+    return {(r[0], r[1]): r[2:] for r in rows}
+
+
+def test_flatten_snapshot_skips_missing_isbn() -> None:
+    payload = _payload({"fiction": ["A", ""]})
+    rows = flatten_snapshot("2025-01-06", payload)
+    assert [(r.list_name, r.rank, r.isbn13) for r in rows] == [("fiction", 1, "A")]
+
+
+def test_update_week_accumulates_features(con) -> None:
+    _load(con, ["2025-01-06", "2025-01-13", "2025-01-20"])
+    features = _features(con)
+
+    assert features[("A", "2025-01-20")] == (3, 1, 2, 1, [1, 2, 2])
+    assert features[("B", "2025-01-13")] == (2, 1, 1, 2, [1, 1])
+    assert features[("C", "2025-01-20")] == (2, 1, 1, 2, [1, 1])
+    # B did not appear in the last week, so it has no row for it
+    assert ("B", "2025-01-20") not in features
+
+
+def test_out_of_order_week_matches_in_order_load(con) -> None:
+    _load(con, ["2025-01-06", "2025-01-13", "2025-01-20"])
+    expected = _features(con)
+
+    other = duckdb.connect()
+    _load(other, ["2025-01-20", "2025-01-06", "2025-01-13"])
+    assert _features(other) == expected
+
+    # Reloading a week is a no op
+    _load(other, ["2025-01-13"])
+    assert _features(other) == expected
+    other.close()
+
+
+def test_update_week_touches_only_isbns_of_that_week(con) -> None:
+    _load(con, ["2025-01-06", "2025-01-13"])
+    touched = update_week(
+        con, "2025-01-20", flatten_snapshot("2025-01-20", WEEKS["2025-01-20"])
+    )
+    assert touched == 2
+
+
+def test_features_as_of_returns_latest_known_row(con) -> None:
+    _load(con, ["2025-01-06", "2025-01-13", "2025-01-20"])
+    rows = dict(
+        features_as_of(con, "2025-01-20")
+        .select("isbn13, strftime(as_of, '%Y-%m-%d')")
+        .fetchall()
+    )
+    assert rows == {"A": "2025-01-20", "B": "2025-01-13", "C": "2025-01-20"}
+
+
+def test_export_partitions_writes_hive_layout(con, tmp_path: Path) -> None:
+    _load(con, ["2025-01-06", "2025-01-13"])
+    written = export_partitions(con, ["2025-01-13"], tmp_path)
+
+    assert written == [tmp_path / "as_of=2025-01-13" / "data.parquet"]
+    count = con.execute(
+        f"select count(*) from read_parquet('{tmp_path.as_posix()}/*/*.parquet', "
+        "hive_partitioning = true) where as_of = '2025-01-13'"
+    ).fetchone()[0]
+    assert count == 3
+
+
+def test_sync_features_loads_new_manifest_weeks(con, tmp_path: Path) -> None:
+    import json
+
+    raw_dir = tmp_path / "nyt"
+    manifest = SnapshotManifest(raw_dir)
+    raw_dir.mkdir()
+    for week in ("2025-01-06", "2025-01-13"):
+        path = raw_dir / f"{week}.json"
+        path.write_text(json.dumps(WEEKS[week]), encoding="utf-8")
+        manifest.record_file(week, path, 200)
+
+    export_dir = tmp_path / "processed"
+    assert sync_features(con, raw_dir, export_dir) == ["2025-01-06", "2025-01-13"]
+    assert sync_features(con, raw_dir, export_dir) == []
+    assert sorted(p.name for p in export_dir.iterdir()) == [
+        "as_of=2025-01-06",
+        "as_of=2025-01-13",
+    ]
@@ -0,0 +1,229 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from flows import hardcover_probe
+from flows.hardcover_client import HardcoverAuthError
+from gle.probe_schedule import ProbePriority, rank_pending, record_probes
+
+APPEARANCES = [
+    # week, list, rank, isbn13
+    ("2025-01-06", "fiction", 1, "OLD_TOP"),
+    ("2025-01-06", "fiction", 2, "OLD_TWO"),
+    ("2025-03-03", "fiction", 15, "NEW_LOW"),
+    ("2025-03-03", "fiction", 1, "NEW_TOP"),
+    ("2025-03-03", "nonfiction", 3, "NEW_MATCHED"),
+    ("2025-02-24", "fiction", 9, "NEW_TOP"),
+]
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute(
+        """
+        create table nyt_appearances (
+            week date, list_name varchar, rank integer, isbn13 varchar,
+            title varchar, author varchar
+        )
+        """
+    )
+    con.executemany(
+        "insert into nyt_appearances values (?, ?, ?, ?, null, null)", APPEARANCES
+    )
+    con.execute("create table goodreads (isbn13 varchar, average_rating double)")
+    con.execute("insert into goodreads values ('NEW_MATCHED', 4.0)")
+    yield con
+    con.close()
+
+
+def test_recent_high_ranked_unmatched_first(con) -> None:
+    ranked = rank_pending(con)
+    assert [s.isbn13 for s in ranked] == [
+        "NEW_TOP",
+        "NEW_MATCHED",
+        "NEW_LOW",
+        "OLD_TOP",
+        "OLD_TWO",
+    ]
+    top = ranked[0]
+    assert (top.last_week, top.last_rank, top.weeks_on_list) == ("2025-03-03", 1, 2)
+    assert ranked[1].matched and not ranked[0].matched
+
+
+def test_weights_are_configurable(con) -> None:
+    rank_only = ProbePriority(recency=0, unmatched=0)
+    assert [s.isbn13 for s in rank_pending(con, rank_only)][:2] == [
+        "NEW_TOP",
+        "OLD_TOP",
+    ]
+    assert [s.isbn13 for s in rank_pending(con, only=["OLD_TWO", "NEW_LOW"])] == [
+        "NEW_LOW",
+        "OLD_TWO",
+    ]
+
+
+def test_probed_isbns_drop_out_and_misses_return(con) -> None:
+    record_probes(con, {"NEW_TOP": True, "NEW_LOW": False})
+    assert {s.isbn13 for s in rank_pending(con)} == {
+        "NEW_MATCHED",
+        "OLD_TOP",
+        "OLD_TWO",
+    }
+
+    con.execute(
+        "update hardcover_probe_log set probed_at = probed_at - interval 40 day"
+    )
+    retried = {s.isbn13: s for s in rank_pending(con)}
+    assert "NEW_TOP" not in retried
+    assert retried["NEW_LOW"].retry
+
+    record_probes(con, {"NEW_LOW": False})
+    assert con.execute(
+        "select attempts from hardcover_probe_log where isbn13 = 'NEW_LOW'"
+    ).fetchone() == (2,)
+
+
+def _probe_db(tmp_path: Path) -> Path:
+    db = tmp_path / "gl.duckdb"
+    con = duckdb.connect(str(db))
+    con.execute(
+        """
+        create table nyt_appearances (
+            week date, list_name varchar, rank integer, isbn13 varchar,
+            title varchar, author varchar
+        )
+        """
+    )
+    con.executemany(
+        "insert into nyt_appearances values (?, ?, ?, ?, null, null)", APPEARANCES
+    )
+    con.close()
+    return db
+
+
+def test_probe_spends_the_budget_on_the_top(tmp_path: Path, monkeypatch) -> None:
+    db = _probe_db(tmp_path)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hardcover_probe, "HC_DIR", tmp_path / "hc")
+    asked = []
+    monkeypatch.setattr(
+        hardcover_probe, "query_hardcover", lambda isbn: asked.append(isbn)
+    )
+
+    hardcover_probe.main(["--n", "2", "--duckdb", str(db)])
+    assert asked == ["NEW_TOP", "NEW_MATCHED"]
+
+    hardcover_probe.main(["--n", "2", "--duckdb", str(db)])
+    assert asked[2:] == ["NEW_LOW", "OLD_TOP"]
+    con = duckdb.connect(str(db))
+    assert con.execute("select count(*) from hardcover_probe_log").fetchone() == (4,)
+
+
+def test_failed_lookups_are_not_misses(tmp_path: Path, monkeypatch) -> None:
+    db = _probe_db(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hardcover_probe, "HC_DIR", tmp_path / "hc")
+
+    def flaky(isbn):
+        # the database is free while the probe waits on Hardcover
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                f"import duckdb; duckdb.connect({str(db)!r}).close()",
+            ],
+            check=True,
+        )
+        if isbn == "NEW_TOP":
+            raise ConnectionError("timed out")
+
+    monkeypatch.setattr(hardcover_probe, "query_hardcover", flaky)
+    hardcover_probe.main(["--n", "2", "--duckdb", str(db)])
+
+    con = duckdb.connect(str(db))
+    assert con.execute("select isbn13, hit from hardcover_probe_log").fetchall() == [
+        ("NEW_MATCHED", False)
+    ]
+    assert rank_pending(con)[0].isbn13 == "NEW_TOP"
+    con.close()
+
+
+def test_missing_token_aborts_the_run(tmp_path: Path, monkeypatch) -> None:
+    db = _probe_db(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hardcover_probe, "HC_DIR", tmp_path / "hc")
+
+    def no_token(isbn):
+        raise HardcoverAuthError("HARDCOVER_AUTH_TOKEN is required but not set")
+
+    monkeypatch.setattr(hardcover_probe, "query_hardcover", no_token)
+    with pytest.raises(HardcoverAuthError):
+        hardcover_probe.main(["--n", "2", "--duckdb", str(db)])
+    con = duckdb.connect(str(db))
+    assert con.execute("select count(*) from hardcover_probe_log").fetchone() == (0,)
+    con.close()
+
+
+class _Hit:
+    def json(self) -> str:
+        return "{}"
+
+
+def test_resume_stays_inside_the_budget(tmp_path: Path, monkeypatch) -> None:
+    db = _probe_db(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hardcover_probe, "HC_DIR", tmp_path / "hc")
+    asked = []
+
+    def crash_on_third(isbn):
+        asked.append(isbn)
+        if len(asked) == 3:
+            raise KeyboardInterrupt
+        return _Hit() if isbn == "NEW_TOP" else None
+
+    monkeypatch.setattr(hardcover_probe, "query_hardcover", crash_on_third)
+    argv = ["--n", "3", "--checkpoint-every", "1", "--duckdb", str(db)]
+    with pytest.raises(KeyboardInterrupt):
+        hardcover_probe.main(argv)
+    assert asked == ["NEW_TOP", "NEW_MATCHED", "NEW_LOW"]
+
+    # the hit now has its file, it still counts against the budget
+    hardcover_probe.main(argv + ["--resume"])
+    assert asked[3:] == ["NEW_LOW"]
+    con = duckdb.connect(str(db))
+    assert con.execute("select count(*) from hardcover_probe_log").fetchone() == (3,)
+    con.close()
+
+
+def test_changed_only_date_order_works_through_the_feed(
+    tmp_path: Path, monkeypatch
+) -> None:
+    db = _probe_db(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hardcover_probe, "HC_DIR", tmp_path / "hc")
+    feed = ["NEW_LOW", "NEW_TOP", "OLD_TWO"]
+    monkeypatch.setattr(hardcover_probe, "latest_seq", lambda con: 7)
+    monkeypatch.setattr(hardcover_probe, "pending_changes", lambda *a: feed)
+    monkeypatch.setattr(hardcover_probe, "pending_isbns", list)
+    advanced = []
+    monkeypatch.setattr(
+        hardcover_probe, "advance_watermark", lambda con, c, top: advanced.append(top)
+    )
+    asked = []
+    monkeypatch.setattr(
+        hardcover_probe,
+        "query_hardcover",
+        lambda isbn: asked.append(isbn) or (_Hit() if isbn == "NEW_LOW" else None),
+    )
+
+    argv = ["--changed-only", "--order", "date", "--n", "2", "--duckdb", str(db)]
+    hardcover_probe.main(argv)
+    assert asked == ["NEW_LOW", "NEW_TOP"] and advanced == []
+    # the next run moves on to the rest instead of the same first two
+    hardcover_probe.main(argv)
+    assert asked[2:] == ["OLD_TWO"] and advanced == [7]
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from gle.cli import Command, main
+from gle.profiling import Profiler, profiled
+
+
+def _workload(con) -> None:
+    con.execute("create table t as select i, i % 7 as g from range(200000) t(i)")
+    con.execute("select count(*) from t")
+    assert con.fetchone() == (200000,)
+    assert len(con.sql("select g, sum(i) from t group by g").fetchall()) == 7
+    sum(i * i for i in range(200_000))
+
+
+def test_run_writes_stacks_plans_and_summary(tmp_path: Path) -> None:
+    original = duckdb.DuckDBPyConnection.execute
+    con = duckdb.connect()
+    with Profiler("unit", tmp_path, interval=0.001, keep_plans=2) as profiler:
+        _workload(con)
+    assert duckdb.DuckDBPyConnection.execute is original
+    assert con.execute("select current_setting('enable_profiling')").fetchone()[0] in (
+        None,
+        "no_output",
+    )
+
+    run = profiler.run_dir
+    assert run.parent == tmp_path and run.name.startswith("unit-")
+    lines = (run / "stacks.folded").read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(
+        "_workload (tests/test_profiling.py" in line and line.startswith("MainThread;")
+        for line in lines
+    )
+
+    rows = [line.split("\t") for line in (run / "queries.tsv").read_text().splitlines()]
+    assert rows[0] == ["seq", "latency_s", "rows", "query"]
+    assert len(rows) == 4
+    # the aggregate read with fetchone still has its profile
+    assert rows[2][1] and rows[2][2] == "1"
+    # only the slowest plans are kept, every statement stays in queries.tsv
+    assert len(list((run / "plans").glob("*.json"))) == 2
+
+    summary = (run / "summary.txt").read_text()
+    assert "statements  3 (3 profiled)" in summary
+    assert "CREATE_TABLE_AS" in summary
+
+
+def test_profiled_main_takes_the_options_out(tmp_path: Path) -> None:
+    seen = []
+
+    @profiled
+    def fake_main(argv=None):
+        seen.append(argv)
+        con = duckdb.connect()
+        con.execute("select 42").fetchall()
+        con.close()
+
+    fake_main(["--threshold", "90"])
+    fake_main(["--profile", "--threshold", "90", "--profile-dir", str(tmp_path)])
+    assert seen == [["--threshold", "90"], ["--threshold", "90"]]
+
+    (run,) = tmp_path.iterdir()
+    assert run.name.startswith("test_profiling-")
+    assert len(list((run / "plans").glob("*.json"))) == 1
+    plan = json.loads(next((run / "plans").glob("*.json")).read_text())
+    assert plan["query_name"] == "select 42"
+
+
+def test_gle_profile_option(tmp_path: Path, monkeypatch) -> None:
+    (tmp_path / "slow_flow.py").write_text(
+        "from gle.profiling import profiled\n"
+        "seen = []\n"
+        "@profiled\n"
+        "def main(argv=None):\n"
+        "    seen.append(argv)\n",
+        encoding="utf-8",
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr("gle.cli.COMMANDS", (Command("slow", "slow_flow:main", "x"),))
+    out = tmp_path / "profiles"
+
+    main(["--profile", "--profile-dir", str(out), "slow", "--n", "5"])
+    # after the subcommand the target's own wrapper picks the option up
+    main(["slow", "--profile", "--profile-dir", str(out)])
+
+    import slow_flow
+
+    assert slow_flow.seen == [["--n", "5"], []]
+    assert sorted(p.name.split("-")[0] for p in out.iterdir()) == [
+        "slow",
+        "slow_flow",
+    ]
+
+
+def test_interval_must_be_a_number() -> None:
+    with pytest.raises(SystemExit):
+        profiled(lambda argv=None: None)(["--profile", "--profile-interval", "x"])
@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from gle.gate0_check import Gate0Config, measure_gate0
+from gle.query_cache import QueryCache, bump_table_versions, normalize_sql
+
+AGG = "select count(*) as n, avg(average_rating) as r from goodreads"
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("create table goodreads (isbn13 varchar, average_rating double)")
+    con.execute(
+        "insert into goodreads values ('9780000000001', 4.0), ('9780000000002', 3.0)"
+    )
+    bump_table_versions(con, "goodreads")
+    yield con
+    con.close()
+
+
+def test_normalized_sql() -> None:
+    assert normalize_sql(
+        "SELECT  Count(*)  -- total\nFROM Goodreads WHERE title = 'It''s';"
+    ) == normalize_sql("select count(*) from goodreads where title='It''s'")
+    assert normalize_sql("select 'A'") != normalize_sql("select 'a'")
+    assert normalize_sql('select "A" from t') != normalize_sql('select "a" from t')
+
+
+def test_hit_until_a_table_version_is_bumped(tmp_path: Path, con) -> None:
+    cache = QueryCache(con, tmp_path)
+    assert cache.fetchall(AGG) == [(2, 3.5)]
+    assert cache.fetchall(AGG.upper()) == [(2, 3.5)]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(list(tmp_path.glob("*.parquet"))) == 1
+
+    # an in place update keeps the row count, only the bump tells
+    con.execute("update goodreads set average_rating = 5.0")
+    bump_table_versions(con, "goodreads")
+    assert cache.fetchall(AGG) == [(2, 5.0)]
+    assert cache.misses == 2
+    # the result for the old version is dropped right away
+    assert cache.stats()["entries"] == 1
+    assert len(list(tmp_path.glob("*.parquet"))) == 1
+
+    # a writer that forgets to bump still changes the row count
+    con.execute("insert into goodreads values ('9780000000003', 2.0)")
+    assert cache.fetchall(AGG)[0][0] == 3
+    con.execute("delete from goodreads where isbn13 = '9780000000003'")
+    assert cache.fetchall(AGG)[0][0] == 2
+
+    # another process sharing the directory reuses the result
+    other = QueryCache(con, tmp_path)
+    assert other.fetchall(AGG)[0][0] == 2
+    assert other.hits == 1
+
+
+def test_parameters_views_and_bypass(tmp_path: Path, con) -> None:
+    cache = QueryCache(con, tmp_path)
+    sql = "select isbn13 from goodreads where average_rating >= ? order by 1"
+    assert cache.fetchall(sql, [3.5]) == [("9780000000001",)]
+    assert cache.fetchall(sql, [2.5]) == [("9780000000001",), ("9780000000002",)]
+    assert cache.misses == 2
+
+    con.execute("create view good as select * from goodreads where average_rating > 3")
+    assert cache.fetchall("select count(*) from good") == [(1,)]
+    con.execute("insert into goodreads values ('9780000000003', 4.5)")
+    bump_table_versions(con, "goodreads")
+    assert cache.fetchall("select count(*) from good") == [(2,)]
+
+    con.execute("create table scratch as select 1 as x")
+    for sql in (
+        "select count(*) from scratch",  # never bumped
+        "select now(), count(*) from goodreads",
+        "select 42",
+    ):
+        cache.query(sql)
+    assert cache.bypassed == 3
+    assert cache.stats()["entries"] == 3
+
+
+def test_lru_eviction_by_size(tmp_path: Path, con) -> None:
+    con.execute(
+        "create table wide as select i, repeat('x', 200) || i as s from range(2000) t(i)"
+    )
+    bump_table_versions(con, "wide")
+    ticks = iter(range(100))
+    cache = QueryCache(con, tmp_path, max_bytes=10**9, clock=lambda: next(ticks))
+    for lo in (0, 500, 1000):
+        cache.query(f"select * from wide where i >= {lo}")
+    sizes = sorted(p.stat().st_size for p in tmp_path.glob("*.parquet"))
+    cache.query("select * from wide where i >= 0")  # most recently used
+
+    cache.max_bytes = sum(sizes) - 1
+    cache.query("select * from wide where i >= 1500")
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    kept = cache.stats()["entries"]
+    assert 1 < kept < 4
+    cache.query("select * from wide where i >= 0")
+    assert cache.hits == 2
+    assert cache.clear() == kept
+    assert list(tmp_path.glob("*.parquet")) == []
+
+
+def test_gate0_reuses_results(tmp_path: Path) -> None:
+    db = tmp_path / "gl.duckdb"
+    con = duckdb.connect(str(db))
+    con.execute(
+        "create table goodreads as "
+        "select '978000000000' || i as isbn13, 2000 as publication_year, "
+        "'S' as series from range(5) t(i)"
+    )
+    con.execute("create table nyt_titles as select isbn13 from goodreads")
+    bump_table_versions(con, "goodreads", "nyt_titles")
+    con.close()
+
+    config = Gate0Config(
+        nyt_raw_dir=tmp_path / "nyt", duckdb_path=db, cache_dir=tmp_path / "cache"
+    )
+    first = measure_gate0(config)
+    assert first.join_rate == 1.0 and first.goodreads_year_coverage == 1.0
+    assert len(list((tmp_path / "cache").glob("*.parquet"))) == 2
+    assert measure_gate0(config) == first
+
+    # an index that cannot be opened falls back to running the queries
+    broken = tmp_path / "broken"
+    (broken / "index.sqlite").mkdir(parents=True)
+    config = Gate0Config(nyt_raw_dir=tmp_path / "nyt", duckdb_path=db, cache_dir=broken)
+    assert measure_gate0(config) == first
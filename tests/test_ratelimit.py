@@ -0,0 +1,117 @@
+import multiprocessing
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from gle.ratelimit import Quota, RateLimiter, key_id, limiter_for, parse_quotas
+from gle.standin import StandInConfig, serve
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _limiter(path: Path, quotas, clock: FakeClock, key: str = "k") -> RateLimiter:
+    return RateLimiter(key, quotas, path, clock=clock, sleep=clock.sleep)
+
+
+def test_parse_quotas() -> None:
+    assert parse_quotas("1/12, 500/86400") == [Quota(1, 12.0), Quota(500, 86400.0)]
+    assert parse_quotas("off") == []
+    with pytest.raises(ValueError):
+        parse_quotas("0/10")
+
+
+def test_burst_then_spaced_slots(tmp_path: Path) -> None:
+    clock = FakeClock()
+    limiter = _limiter(tmp_path / "rl.sqlite", [Quota(3, 3.0)], clock)
+
+    waits = [limiter.reserve() for _ in range(5)]
+    assert waits == pytest.approx([0, 0, 0, 1, 2])
+
+
+def test_state_is_shared_between_limiters_of_one_key(tmp_path: Path) -> None:
+    clock = FakeClock()
+    path = tmp_path / "rl.sqlite"
+    first = _limiter(path, [Quota(1, 10.0)], clock)
+    second = _limiter(path, [Quota(1, 10.0)], clock)
+    other_key = _limiter(path, [Quota(1, 10.0)], clock, key="other")
+
+    assert first.acquire() == 0
+    assert second.acquire() == pytest.approx(10)
+    assert other_key.acquire() == 0
+
+
+def test_tightest_quota_wins_and_max_wait(tmp_path: Path) -> None:
+    clock = FakeClock()
+    limiter = _limiter(tmp_path / "rl.sqlite", [Quota(10, 1.0), Quota(2, 60.0)], clock)
+
+    assert [limiter.reserve() for _ in range(2)] == [0, 0]
+    with pytest.raises(RuntimeError, match="max wait"):
+        limiter.reserve(max_wait=5)
+    assert limiter.reserve() == pytest.approx(30)
+
+
+def test_backoff_pauses_every_caller(tmp_path: Path) -> None:
+    clock = FakeClock()
+    limiter = _limiter(tmp_path / "rl.sqlite", [Quota(5, 1.0)], clock)
+    limiter.backoff(7)
+    assert limiter.reserve() == pytest.approx(7)
+
+
+def test_key_id_hides_the_key() -> None:
+    assert key_id("nyt", "secret").startswith("nyt:")
+    assert "secret" not in key_id("nyt", "secret")
+
+
+def _worker(path: str, count: int, out) -> None:
+    limiter = RateLimiter("shared", [Quota(1, 0.05)], Path(path))
+    for _ in range(count):
+        limiter.acquire()
+        out.put(time.time())
+
+
+def test_processes_share_one_budget(tmp_path: Path) -> None:
+    path = str(tmp_path / "rl.sqlite")
+    RateLimiter("shared", [Quota(1, 0.05)], Path(path)).reserve(max_wait=0)
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, 4, out)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    stamps = sorted(out.get(timeout=30) for _ in range(12))
+    for p in procs:
+        p.join(timeout=30)
+
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    assert min(gaps) > 0.03
+    assert stamps[-1] - stamps[0] >= 11 * 0.05 * 0.9
+
+
+def test_call_retries_after_429(tmp_path: Path, monkeypatch) -> None:
+    server = serve(
+        StandInConfig(cassette_dir=tmp_path, rate_limit=0.001, retry_after=0.2), port=0
+    )
+    try:
+        monkeypatch.setenv("GLE_RATELIMIT_DB", str(tmp_path / "rl.sqlite"))
+        monkeypatch.setenv("NYT_RATE_LIMIT", "100/1")
+        limiter = limiter_for("nyt", "k")
+        url = f"{server.url}/svc/books/v3/lists/full-overview.json"
+
+        assert limiter.call(lambda: requests.get(url, timeout=5)).status_code == 200
+        t0 = time.monotonic()
+        response = limiter.call(lambda: requests.get(url, timeout=5), retries=2)
+        assert response.status_code == 429
+        assert time.monotonic() - t0 >= 0.4
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,89 @@
+import duckdb
+import pytest
+
+from gle.rating_history import (
+    list_versions,
+    rating_delta,
+    ratings_as_of,
+    record_version,
+)
+
+DUMP_1 = [
+    ("9780000000001", 1, 4.0, 100),
+    ("9780000000002", 2, 3.5, 10),
+    ("9780000000003", 3, 4.2, 50),
+]
+DUMP_2 = [
+    ("9780000000001", 1, 4.0, 130),
+    ("9780000000002", 2, 3.5, 10),
+    ("9780000000004", 4, 3.9, 5),
+]
+DUMP_3 = [
+    ("9780000000001", 1, 4.1, 160),
+    ("9780000000002", 2, 3.5, 10),
+    ("9780000000004", 4, 3.9, 5),
+]
+
+
+def _load(con: duckdb.DuckDBPyConnection, rows) -> None:
+    con.execute(
+        """
+        create or replace table goodreads (
+            isbn13 varchar, book_id integer, average_rating double,
+            ratings_count integer
+        )
+        """
+    )
+    con.executemany("insert into goodreads values (?, ?, ?, ?)", rows)
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    for i, (dump, day) in enumerate(
+        ((DUMP_1, "2025-01-01"), (DUMP_2, "2025-01-11"), (DUMP_3, "2025-01-21"))
+    ):
+        _load(con, dump)
+        record_version(con, day, f"ingest{i}")
+    yield con
+    con.close()
+
+
+def test_only_changed_rows_are_stored(con) -> None:
+    assert [(v.version, v.rows, v.changed, v.removed) for v in list_versions(con)] == [
+        (1, 3, 3, 0),
+        (2, 3, 2, 1),
+        (3, 3, 1, 0),
+    ]
+    stored = con.execute("select count(*) from goodreads_rating_history").fetchone()
+    assert stored == (6,)
+
+
+def test_as_of_reconstructs_each_dump(con) -> None:
+    for version, dump in enumerate((DUMP_1, DUMP_2, DUMP_3), start=1):
+        rows = ratings_as_of(con, version).order("isbn13").fetchall()
+        assert rows == dump
+    mid = ratings_as_of(con, on="2025-01-15").order("isbn13").fetchall()
+    assert [r[0] for r in mid] == [r[0] for r in DUMP_2]
+    with pytest.raises(RuntimeError):
+        ratings_as_of(con, on="2024-12-31")
+
+
+def test_delta_and_velocity(con) -> None:
+    delta = rating_delta(con, 1, 3).fetchall()
+    assert [(r[0], r[1], r[4], r[7]) for r in delta] == [
+        ("9780000000001", "changed", 60, 3.0),
+        ("9780000000003", "removed", None, None),
+        ("9780000000004", "added", None, None),
+    ]
+    # a change that is undone in a later dump is no change at all
+    _load(con, DUMP_1)
+    record_version(con, "2025-01-31", "ingest3")
+    assert rating_delta(con, 1, 4).fetchall() == []
+
+
+def test_same_ingest_is_not_recorded_twice(con) -> None:
+    _load(con, DUMP_1)
+    assert record_version(con, "2025-02-01", "ingest2").version == 3
+    with pytest.raises(RuntimeError):
+        record_version(con, "2024-01-01", "older")
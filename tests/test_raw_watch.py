@@ -0,0 +1,187 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from flows.raw_watch import RawWatcher
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _nyt(raw: Path, week: str, isbns: list[str]) -> None:
+    books = [{"primary_isbn13": i, "rank": r} for r, i in enumerate(isbns, 1)]
+    payload = {"results": {"lists": [{"list_name_encoded": "fiction", "books": books}]}}
+    (raw / "nyt").mkdir(parents=True, exist_ok=True)
+    (raw / "nyt" / f"{week}.json").write_text(json.dumps(payload))
+
+
+def _hardcover(raw: Path, isbn: str, rating: float) -> Path:
+    (raw / "hardcover").mkdir(parents=True, exist_ok=True)
+    path = raw / "hardcover" / f"{isbn}.json"
+    path.write_text(json.dumps({"id": 1, "title": "T", "rating": rating}))
+    return path
+
+
+@pytest.fixture
+def watch(tmp_path: Path):
+    raw = tmp_path / "raw"
+    clock = Clock()
+
+    def make(**kwargs) -> RawWatcher:
+        return RawWatcher(
+            db_file=tmp_path / "gl.duckdb",
+            raw_dir=raw,
+            debounce=2.0,
+            max_delay=10.0,
+            export_dir=None,
+            goodreads_manifest=tmp_path / "ingest_manifest.json",
+            status_file=tmp_path / "status.json",
+            clock=clock,
+            **kwargs,
+        )
+
+    return raw, clock, make
+
+
+def _query(tmp_path: Path, sql: str):
+    con = duckdb.connect(str(tmp_path / "gl.duckdb"), read_only=True)
+    try:
+        return con.execute(sql).fetchall()
+    finally:
+        con.close()
+
+
+def test_burst_is_debounced_into_one_batch(tmp_path: Path, watch) -> None:
+    raw, clock, make = watch
+    watcher = make()
+    _nyt(raw, "2025-01-06", ["9780000000001", "9780000000002"])
+    _hardcover(raw, "9780000000001", 4.0)
+    assert watcher.scan() == 2
+
+    clock.now += 1
+    _hardcover(raw, "9780000000002", 3.0)
+    assert watcher.scan() == 1
+    clock.now += 1.5
+    assert not watcher.due()
+    clock.now += 1
+    assert watcher.due()
+    assert watcher.status()["queue_depth"] == 3
+
+    batch = watcher.flush()
+    assert batch["files"] == {"nyt": 1, "hardcover": 2, "goodreads": 0}
+    assert batch["errors"] == [] and batch["lag_max_s"] is not None
+    assert _query(tmp_path, "select count(*) from nyt_appearances") == [(2,)]
+    assert _query(
+        tmp_path, "select isbn13, rating from hardcover_books order by 1"
+    ) == [("9780000000001", 4.0), ("9780000000002", 3.0)]
+
+    watcher.write_status()
+    status = json.loads((tmp_path / "status.json").read_text())
+    assert (status["queue_depth"], status["batches"], status["files"]) == (0, 1, 3)
+    assert watcher.scan() == 0
+
+
+def test_changes_reload_and_restart_resumes(tmp_path: Path, watch) -> None:
+    raw, _, make = watch
+    path = _hardcover(raw, "9780000000001", 4.0)
+    make().run(once=True)
+
+    path.write_text(json.dumps({"id": 1, "title": "T", "rating": 4.5}) + " ")
+    _nyt(raw, "2025-01-13", ["9780000000003"])
+    restarted = make()
+    assert restarted.scan() == 2
+    restarted.run(once=True)
+    assert _query(tmp_path, "select rating from hardcover_books") == [(4.5,)]
+    assert _query(tmp_path, "select distinct week::varchar from nyt_appearances") == [
+        ("2025-01-13",)
+    ]
+    assert make().scan() == 0
+
+
+def test_steady_stream_flushes_after_max_delay(watch) -> None:
+    raw, clock, make = watch
+    watcher = make()
+    for i in range(6):
+        _hardcover(raw, f"978000000000{i}", 4.0)
+        watcher.scan()
+        if watcher.due():
+            break
+        clock.now += 1.9
+    assert i == 5 and watcher.status()["queue_depth"] == 6
+
+
+def test_bad_file_is_skipped_until_it_changes(tmp_path: Path, watch) -> None:
+    raw, clock, make = watch
+    watcher = make()
+    bad = raw / "hardcover" / "9780000000009.json"
+    bad.parent.mkdir(parents=True)
+    bad.write_text('{"id": 1, "title"')
+    watcher.scan()
+    assert watcher.flush()["errors"]
+    assert watcher.scan() == 0
+    assert watcher.status()["failed"] == 1
+
+    bad.write_text(json.dumps({"id": 1, "title": "Fixed", "rating": 3.0}))
+    os.utime(bad, ns=(1, 10**9))
+    assert watcher.scan() == 1
+    assert watcher.flush()["errors"] == []
+    assert watcher.status()["failed"] == 0
+
+
+def test_goodreads_chunks_reload_as_rating_versions(tmp_path: Path, watch) -> None:
+    raw, clock, make = watch
+    chunk = raw / "goodreads" / "book1-100.csv"
+    chunk.parent.mkdir(parents=True)
+    header = "Id,Name,Authors,ISBN,Rating,CountsOfReview\n"
+    chunk.write_text(header + "1,A,Ann,9780000000001,4.0,10\n")
+    make(snapshot=True).run(once=True)
+
+    chunk.write_text(header + "1,A,Ann,9780000000001,4.0,25\n")
+    make(snapshot=True).run(once=True)
+    assert _query(tmp_path, "select ratings_count from goodreads") == [(25,)]
+    assert _query(
+        tmp_path, "select version, changed from goodreads_rating_versions"
+    ) == [(1, 1), (2, 1)]
+
+
+def test_busy_database_keeps_the_batch_queued(tmp_path: Path, watch) -> None:
+    raw, _, make = watch
+    watcher = make()
+    db = tmp_path / "gl.duckdb"
+    duckdb.connect(str(db)).close()
+    _hardcover(raw, "9780000000001", 4.0)
+    watcher.scan()
+
+    # another process holding even a read only connection locks the file
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            f"import duckdb, sys; con = duckdb.connect({str(db)!r}, read_only=True); "
+            "print('open', flush=True); sys.stdin.read()",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "open"
+        watcher.run(once=True)
+        assert watcher.status()["queue_depth"] == 1
+        assert watcher.status()["busy"] == 1
+    finally:
+        holder.communicate("")
+
+    watcher.run(once=True)
+    assert watcher.status()["queue_depth"] == 0
+    assert _query(tmp_path, "select rating from hardcover_books") == [(4.0,)]
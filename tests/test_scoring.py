@@ -0,0 +1,130 @@
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pytest
+
+from gle.scoring import (
+    BASELINE_MODEL,
+    WORST_RANK,
+    FeatureMatrix,
+    LinearModel,
+    build_feature_matrix,
+    load_model,
+    score_isbn,
+    score_matrix,
+    write_scores,
+)
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute(
+        """
+        create table goodreads as
+        select * from (values
+            ('9780000000002', 4.5, 1000),
+            ('9780000000001', 3.0, 10),
+            ('9780000000003', null, null)
+        ) t(isbn13, average_rating, ratings_count)
+        """
+    )
+    con.execute(
+        """
+        create table nyt_isbn_features as
+        select * from (values
+            ('9780000000001', '2025-01-06'::date, 1, 5, 5, 1),
+            ('9780000000001', '2025-01-13'::date, 2, 2, 2, 2),
+            ('9780000000009', '2025-01-13'::date, 1, 1, 1, 1)
+        ) t(isbn13, as_of, weeks_on_list, peak_rank, current_rank, list_count)
+        """
+    )
+    yield con
+    con.close()
+
+
+@pytest.fixture
+def matrix(con, tmp_path: Path) -> FeatureMatrix:
+    build_feature_matrix(con, tmp_path / "matrix")
+    return FeatureMatrix(tmp_path / "matrix")
+
+
+def test_build_feature_matrix_unions_sources_sorted(matrix: FeatureMatrix) -> None:
+    assert [i.decode() for i in matrix.isbns] == [
+        "9780000000001",
+        "9780000000002",
+        "9780000000003",
+        "9780000000009",
+    ]
+    assert isinstance(matrix.column("peak_rank"), np.memmap)
+    np.testing.assert_array_equal(
+        matrix.column("weeks_on_list"), [2, np.nan, np.nan, 1]
+    )
+
+
+def test_build_feature_matrix_as_of(con, tmp_path: Path) -> None:
+    build_feature_matrix(con, tmp_path / "m", as_of="2025-01-06")
+    matrix = FeatureMatrix(tmp_path / "m")
+    assert matrix.lookup("9780000000001", ["peak_rank"]).tolist() == [[5.0]]
+    # Charted only after the as of week and unknown to Goodreads
+    assert matrix.row_index("9780000000009") is None
+
+
+def test_lookup_missing_isbn(matrix: FeatureMatrix) -> None:
+    assert matrix.row_index("9780000000000") is None
+    assert matrix.row_index("9999999999999") is None
+    # would match 9780000000001 once cut to the index width
+    assert matrix.row_index("97800000000019") is None
+    assert score_isbn(matrix, BASELINE_MODEL, "9780000000000") is None
+
+
+def test_batch_and_single_scores_agree(matrix: FeatureMatrix) -> None:
+    scores = score_matrix(matrix, BASELINE_MODEL, batch_size=3)
+    assert scores.shape == (4,)
+    for idx, isbn in enumerate(matrix.isbns):
+        single = score_isbn(matrix, BASELINE_MODEL, isbn.decode())
+        assert single == pytest.approx(float(scores[idx]))
+
+
+def test_linear_model_ignores_missing_values() -> None:
+    model = LinearModel({"a": 1.0, "b": 2.0})
+    features = np.array([[0.0, 0.0], [np.nan, 0.0]], dtype=np.float32)
+    np.testing.assert_allclose(model.predict(features), [0.5, 0.5])
+
+
+def test_linear_model_fills_missing_values() -> None:
+    model = LinearModel({"peak_rank": -1.0}, fill={"peak_rank": WORST_RANK})
+    features = np.array([[np.nan], [1.0], [WORST_RANK]], dtype=np.float32)
+    never, top, worst = model.predict(features)
+    assert never == worst < top
+
+
+def test_build_rejects_keys_longer_than_an_isbn13(con, tmp_path: Path) -> None:
+    con.execute("insert into goodreads values ('97800000000019', 4.0, 5)")
+    with pytest.raises(RuntimeError, match="longer than 13"):
+        build_feature_matrix(con, tmp_path / "m")
+    assert not (tmp_path / "m").exists()
+
+
+def test_load_model_accepts_instance_or_factory() -> None:
+    assert load_model(None) is BASELINE_MODEL
+    assert load_model("gle.scoring:BASELINE_MODEL") is BASELINE_MODEL
+
+
+def test_write_scores_ranks_best_first(con, matrix: FeatureMatrix) -> None:
+    model = LinearModel({"log_ratings_count": 1.0})
+    write_scores(con, matrix.isbns, score_matrix(matrix, model), "scores")
+    rows = con.execute("select isbn13, rank from scores order by rank").fetchall()
+    assert rows[0] == ("9780000000002", 1)
+    assert len(rows) == 4
+
+
+def test_write_scores_dense_ranks_ties(con) -> None:
+    isbns = np.array([b"a", b"b", b"c", b"d"], dtype="S13")
+    scores = np.array([0.2, 0.9, 0.2, 0.1], dtype=np.float32)
+    write_scores(con, isbns, scores, "scores")
+    rows = con.execute("select isbn13, rank from scores order by rank, 1").fetchall()
+    assert rows == [("b", 1), ("a", 2), ("c", 2), ("d", 3)]
+    write_scores(con, isbns[:0], scores[:0], "scores")
+    assert con.execute("select count(*) from scores").fetchone() == (0,)
@@ -0,0 +1,105 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from gle import ingest_nyt
+from gle.ingest_nyt import NytIngestConfig, ingest_range
+from gle.snapshot_manifest import (
+    MANIFEST_NAME,
+    SnapshotManifest,
+    rebuild_manifest,
+    sha256_file,
+    snapshot_paths,
+)
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, monday_iso: str) -> None:
+        self._monday_iso = monday_iso
+
+    def json(self) -> dict:
+        return {"results": {"published_date": self._monday_iso, "lists": []}}
+
+
+@pytest.fixture
+def fetched(monkeypatch) -> list:
+    calls = []
+
+    def fake_get_overview(config, monday_iso):
+        calls.append(monday_iso)
+        return _FakeResponse(monday_iso)
+
+    monkeypatch.setattr(ingest_nyt, "_get_overview", fake_get_overview)
+    return calls
+
+
+def test_ingest_range_records_manifest(tmp_path: Path, fetched: list) -> None:
+    config = NytIngestConfig(api_key="k", raw_dir=tmp_path)
+    ingest_range(config, "2025-01-06", "2025-01-13")
+
+    manifest = SnapshotManifest(tmp_path)
+    record = manifest.get("2025-01-13")
+    path = tmp_path / "2025-01-13.json"
+
+    assert fetched == ["2025-01-06", "2025-01-13"]
+    assert record.file_name == "2025-01-13.json"
+    assert record.size == path.stat().st_size
+    assert record.sha256 == sha256_file(path)
+    assert record.http_status == 200
+
+
+def test_ingest_range_skips_valid_weeks(tmp_path: Path, fetched: list) -> None:
+    config = NytIngestConfig(api_key="k", raw_dir=tmp_path)
+    ingest_range(config, "2025-01-06", "2025-01-13")
+    fetched.clear()
+
+    ingest_range(config, "2025-01-06", "2025-01-27")
+    assert fetched == ["2025-01-20", "2025-01-27"]
+
+    fetched.clear()
+    ingest_range(config, "2025-01-06", "2025-01-06", force=True)
+    assert fetched == ["2025-01-06"]
+
+
+def test_ingest_range_refetches_corrupted_week(tmp_path: Path, fetched: list) -> None:
+    config = NytIngestConfig(api_key="k", raw_dir=tmp_path)
+    ingest_range(config, "2025-01-06", "2025-01-13")
+    fetched.clear()
+
+    path = tmp_path / "2025-01-13.json"
+    text = path.read_text(encoding="utf-8")
+    path.write_text(text.replace("2025-01-13", "2025-01-99"), encoding="utf-8")
+
+    ingest_range(config, "2025-01-06", "2025-01-13")
+    assert fetched == ["2025-01-13"]
+    assert SnapshotManifest(tmp_path).is_valid("2025-01-13")
+
+
+def test_manifest_ignores_torn_last_line(tmp_path: Path) -> None:
+    path = tmp_path / "2025-01-06.json"
+    path.write_text("{}", encoding="utf-8")
+    SnapshotManifest(tmp_path).record_file("2025-01-06", path, 200)
+
+    with (tmp_path / MANIFEST_NAME).open("a", encoding="utf-8") as handle:
+        handle.write('{"date": "2025-01-13", "file_')
+
+    manifest = SnapshotManifest(tmp_path)
+    assert [r.date for r in manifest.records()] == ["2025-01-06"]
+
+
+def test_rebuild_manifest_adopts_dated_files_only(tmp_path: Path) -> None:
+    for name in ("2025-01-06.json", "2025-01-13.json", "2025-01-13.copy.json"):
+        (tmp_path / name).write_text(json.dumps({"name": name}), encoding="utf-8")
+
+    adopted = rebuild_manifest(tmp_path)
+
+    assert [r.date for r in adopted] == ["2025-01-06", "2025-01-13"]
+    assert all(r.http_status is None for r in adopted)
+    assert rebuild_manifest(tmp_path) == []
+    assert [p.name for p in snapshot_paths(tmp_path)] == [
+        "2025-01-06.json",
+        "2025-01-13.json",
+    ]
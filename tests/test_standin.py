@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+import pytest
+import requests
+
+from flows import hardcover_client
+from gle.ingest_nyt import NytIngestConfig, fetch_one_overview
+from gle.standin import StandInConfig, serve
+
+
+@pytest.fixture(autouse=True)
+def no_client_throttle(monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("GLE_RATELIMIT_DB", str(tmp_path / "ratelimit.sqlite"))
+    monkeypatch.setenv("NYT_RATE_LIMIT", "off")
+    monkeypatch.setenv("HARDCOVER_RATE_LIMIT", "off")
+
+
+@pytest.fixture
+def standin(request, tmp_path: Path):
+    options = getattr(request, "param", {})
+    server = serve(StandInConfig(cassette_dir=tmp_path, seed=0, **options), port=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _stats(server) -> dict:
+    return requests.get(f"{server.url}/_stats", timeout=5).json()
+
+
+def test_nyt_replays_cassette_then_synthesizes(standin, tmp_path: Path) -> None:
+    recorded = {"results": {"lists": [{"books": [{"primary_isbn13": "9781"}]}]}}
+    (tmp_path / "nyt").mkdir()
+    (tmp_path / "nyt" / "2025-01-06.json").write_text(json.dumps(recorded))
+
+    config = NytIngestConfig(api_key="k", base_url=f"{standin.url}/svc/books/v3")
+    assert fetch_one_overview(config, "2025-01-06") == recorded
+
+    synthetic = fetch_one_overview(config, "2025-01-13")
+    assert synthetic == fetch_one_overview(config, "2025-01-13")
+    assert len(synthetic["results"]["lists"][0]["books"]) == 15
+    assert _stats(standin)["misses"] == 2
+
+
+def test_base_url_from_environment(monkeypatch) -> None:
+    monkeypatch.setenv("NYT_BASE_URL", "http://127.0.0.1:1/v3")
+    assert NytIngestConfig(api_key="k").base_url == "http://127.0.0.1:1/v3"
+
+
+def test_hardcover_client_against_standin(standin, monkeypatch) -> None:
+    monkeypatch.setenv("HARDCOVER_URL", f"{standin.url}/v1/graphql")
+    monkeypatch.setenv("HARDCOVER_AUTH_TOKEN", "t")
+    hardcover_client.auth_headers.cache_clear()
+
+    doc = hardcover_client.fetch_document("9780000000001")
+    assert doc["isbns"] == ["9780000000001"]
+    hardcover_client.auth_headers.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "standin", [{"rate_limit": 0.001, "burst": 2, "retry_after": 7}], indirect=True
+)
+def test_rate_limit_answers_429(standin) -> None:
+    url = f"{standin.url}/svc/books/v3/lists/full-overview.json"
+    codes = [requests.get(url, timeout=5).status_code for _ in range(4)]
+    assert codes == [200, 200, 429, 429]
+    response = requests.get(url, timeout=5)
+    assert response.headers["Retry-After"] == "7"
+    assert _stats(standin)["throttled"] == 3
+
+
+@pytest.mark.parametrize("standin", [{"error_rate": 1.0}], indirect=True)
+def test_injected_errors(standin) -> None:
+    config = NytIngestConfig(api_key="k", base_url=standin.url)
+    with pytest.raises(requests.HTTPError):
+        fetch_one_overview(config, "2025-01-06")
+
+
+def test_cassette_names_are_validated(standin, tmp_path: Path) -> None:
+    (tmp_path / "secret.json").write_text('{"secret": true}')
+    (tmp_path / "nyt").mkdir()
+    url = f"{standin.url}/svc/books/v3/lists/full-overview.json"
+    for week in ("../secret", "2025-01-06/../../secret", "x"):
+        response = requests.get(url, params={"published_date": week}, timeout=5)
+        assert response.status_code == 400
+        assert "secret" not in response.text
+
+    graphql = f"{standin.url}/v1/graphql"
+    for body in ({"variables": {"isbn": "../secret"}}, {"variables": {}}, [1]):
+        assert requests.post(graphql, json=body, timeout=5).status_code == 400
+    found = requests.post(
+        graphql, json={"variables": {"isbn": "080442957X"}}, timeout=5
+    )
+    assert found.status_code == 200
+    assert _stats(standin)["requests"] == 1
@@ -0,0 +1,107 @@
+import json
+from pathlib import Path
+
+import duckdb
+
+from gle.gate0_check import _join_rate
+from gle.isbn import isbn10_to13, normalize_isbn
+from gle.work_index import (
+    WORK_MATCH_SQL,
+    UnionFind,
+    build_work_ids,
+    iter_hardcover_groups,
+    iter_nyt_groups,
+    write_work_table,
+)
+
+
+def test_normalize_isbn_accepts_isbn10_and_hyphens() -> None:
+    assert isbn10_to13("0-306-40615-2") == "9780306406157"
+    assert normalize_isbn("0306406152") == "9780306406157"
+    assert normalize_isbn("978-0-306-40615-7") == "9780306406157"
+    assert normalize_isbn("12345") is None
+    assert normalize_isbn(None) is None
+
+
+def test_union_find_work_id_is_order_independent() -> None:
+    groups = [["3", "2"], ["5", "4"], ["4", "1"], ["2", "5"]]
+    forward = build_work_ids(groups)
+    backward = build_work_ids(reversed(groups))
+    assert forward == backward
+    assert set(forward.values()) == {1}
+
+
+def test_union_find_keeps_separate_works_apart() -> None:
+    uf = UnionFind()
+    uf.add_group(["9780000000002", "9780000000001"])
+    uf.add_group(["9780000000009"])
+    assert uf.work_ids() == {
+        "9780000000002": 9780000000001,
+        "9780000000001": 9780000000001,
+        "9780000000009": 9780000000009,
+    }
+
+
+def test_groups_from_nyt_and_hardcover(tmp_path: Path) -> None:
+    nyt_dir = tmp_path / "nyt"
+    nyt_dir.mkdir()
+    book = {
+        "primary_isbn13": "9780306406157",
+        "isbns": [{"isbn10": "0306406152", "isbn13": "9780306406157"}],
+    }
+    other = {"primary_isbn13": "9781111111111", "isbns": [{"isbn13": "9782222222222"}]}
+    payload = {"results": {"lists": [{"books": [book, other]}]}}
+    (nyt_dir / "2025-01-06.json").write_text(json.dumps(payload))
+
+    hc_dir = tmp_path / "hardcover"
+    hc_dir.mkdir()
+    (hc_dir / "x.json").write_text(
+        json.dumps({"isbns": ["9782222222222", "0306406152"]})
+    )
+
+    groups = list(iter_nyt_groups(nyt_dir)) + list(iter_hardcover_groups(hc_dir))
+    assert groups[0] == ["9780306406157"]
+    assert len(set(build_work_ids(groups).values())) == 1
+
+
+def _con_with_work_index() -> duckdb.DuckDBPyConnection:
+    con = duckdb.connect()
+    con.execute(
+        """
+        create table goodreads as select * from (values
+            (1, '9780000000001', 4.0, 10),
+            (2, '9780000000002', 4.5, 500)
+        ) t(book_id, isbn13, average_rating, ratings_count)
+        """
+    )
+    con.execute(
+        """
+        create table nyt_raw as select * from (values
+            ('9780000000003'), ('9780000000001'), ('9780000000099')
+        ) t(isbn13)
+        """
+    )
+    write_work_table(
+        con,
+        build_work_ids([["9780000000001", "9780000000002", "9780000000003"]]),
+    )
+    return con
+
+
+def test_work_match_picks_most_rated_edition() -> None:
+    con = _con_with_work_index()
+    rows = con.execute(
+        WORK_MATCH_SQL.format(source="nyt_raw") + " order by nyt_isbn13"
+    ).fetchall()
+    assert [(r[0], r[1], r[5]) for r in rows] == [
+        ("9780000000001", 2, "work"),
+        ("9780000000003", 2, "work"),
+    ]
+
+
+def test_join_rate_counts_other_editions() -> None:
+    con = _con_with_work_index()
+    assert _join_rate(con, 100) == 2 / 3
+
+    con.execute("drop table isbn_work")
+    assert _join_rate(con, 100) == 1 / 3